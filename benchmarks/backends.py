@@ -0,0 +1,99 @@
+#!/usr/bin/python
+
+"""Benchmark conmax_by_pso and the CEESA objective on the numba backend
+against numpy, for the default swarm of 25 particles. Swarms run on numba
+with the update kernel only, and with the whole iteration fused with the
+compiled fitness and constraints of the problem, see kernels.fused_step.
+
+Run from the repository root as
+    > python -m benchmarks.backends
+"""
+
+from timeit import repeat
+
+import numpy as np
+
+from source import cdhs, ceesa
+from source.pso import conmax_by_pso, kernels
+from source.utils import jit
+
+
+NPART = 25
+PSO_PARAMS = dict(friction=.6, learnrate1=.8, learnrate2=.2, max_velocity=1.)
+PLANET = (1.99, 1.06, 6.334, 2.05, 3.529)               # 55 Cnc e.
+
+
+def best_of(fn, number, rounds=5):
+    """Best time per call in microseconds."""
+    return min(repeat(fn, number=number, repeat=rounds)) / number * 1e6
+
+
+def problem(module, constraint, backend):
+    """Return the fitness and constraint functions of PLANET."""
+    if module is ceesa:
+        return (ceesa.construct_fitness(*PLANET, constraint, backend=backend),
+                ceesa.get_constraint_fn(constraint, backend=backend))
+    return (cdhs.construct_fitness(*PLANET[:2], constraint),
+            cdhs.get_constraint_fn(constraint))
+
+
+def run_swarm(module, constraint, backend, fused=False):
+    """Return a function running one swarm from a fixed seed, with the point
+    kernels of PLANET if fused."""
+    fitness, check = problem(module, constraint, backend)
+    coeffs = PLANET if module is ceesa else PLANET[:2]
+    kernels = module.get_point_kernels(constraint, coeffs) if fused else None
+
+    def run():
+        rng = np.random.default_rng(0)
+        start = module.initialize_points(NPART, constraint, rng=rng)
+        return conmax_by_pso(fitness, start, check, rng=rng, backend=backend,
+                             fused=kernels, **PSO_PARAMS)
+    return run
+
+
+def main():
+    if jit(kernels.fused_update) is None:
+        print('numba is not installed, nothing to compare.')
+        return
+
+    row = '{:26}{:>14}{:>14}{:>10}'
+    swarm_row = '{:26}{:>14}{:>14}{:>10}{:>14}{:>10}'
+    print(swarm_row.format('Case', 'NumPy (us)', 'Numba (us)', 'Gain',
+                           'Fused (us)', 'Gain'))
+    print('-' * 88)
+
+    for module in (cdhs, ceesa):
+        name = module.__name__.split('.')[-1]
+        for constraint in ('crs', 'drs'):
+            label = '{}-{}'.format(name, constraint)
+            points = module.initialize_points(NPART, constraint)
+
+            if module is ceesa:
+                for kind, idx in (('fitness', 0), ('constraints', 1)):
+                    old = problem(module, constraint, 'numpy')[idx]
+                    new = problem(module, constraint, 'numba')[idx]
+                    if not np.allclose(old(points), new(points), rtol=1e-12):
+                        raise AssertionError('mismatch for ' + label)
+                    new(points)                             # Compile.
+                    t_old = best_of(lambda: old(points), 2000)
+                    t_new = best_of(lambda: new(points), 2000)
+                    print(row.format(kind + '/' + label, '%.1f' % t_old,
+                                     '%.1f' % t_new,
+                                     '%.1fx' % (t_old / t_new)))
+
+            old = run_swarm(module, constraint, 'numpy')
+            new = run_swarm(module, constraint, 'numba')
+            fused = run_swarm(module, constraint, 'numba', fused=True)
+            new(), fused()                                  # Compile.
+            t_old = best_of(old, 10, rounds=3)
+            t_new = best_of(new, 10, rounds=3)
+            t_fused = best_of(fused, 10, rounds=3)
+            print(swarm_row.format(
+                'conmax_by_pso/' + label, '%.0f' % t_old, '%.0f' % t_new,
+                '%.1fx' % (t_old / t_new), '%.0f' % t_fused,
+                '%.1fx' % (t_old / t_fused)))
+
+
+if __name__ == '__main__':
+    main()
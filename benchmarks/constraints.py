@@ -0,0 +1,109 @@
+#!/usr/bin/python
+
+"""Benchmark the vectorized constraint kernels against the original per-row
+np.apply_along_axis construction.
+
+Run from the repository root as
+    > python -m benchmarks.constraints
+"""
+
+from timeit import repeat
+
+import numpy as np
+
+from source import cdhs, ceesa
+
+
+ERR, THR = 1e-6, 1e-7
+SWARM_SIZES = (25, 250, 2500)
+BATCH_SHAPE = (1700, 25)                    # Whole catalog, default swarm.
+
+
+# Reference implementations, as they were before vectorization.
+def legacy_cdhs(constraint, err=ERR, thr=THR):
+    if constraint == 'crs':
+        return lambda points: np.apply_along_axis(lambda x: np.array((
+            np.max((err - x[0], 0)), np.max((err + x[0] - 1, 0)),
+            np.max((err - x[1], 0)), np.max((err + x[1] - 1, 0)),
+            np.max((x[0] + x[1] - thr - 1, 0)),
+            np.max((1 - thr - x[0] - x[1], 0)),
+        )), axis=1, arr=points)
+    return lambda points: np.apply_along_axis(lambda x: np.array((
+        np.max((err - x[0], 0)), np.max((err + x[0] - 1, 0)),
+        np.max((err - x[1], 0)), np.max((err + x[1] - 1, 0)),
+        np.max((err + x[0] + x[1] - 1, 0)),
+    )), axis=1, arr=points)
+
+
+def legacy_ceesa(constraint, err=ERR, thr=THR):
+    if constraint == 'crs':
+        return lambda points: np.apply_along_axis(lambda x: np.max(
+            np.hstack((np.concatenate((
+                -x[:5], x[:5] - 1,
+                np.array((err - x[5], x[5] - 1,)),
+                np.array((np.sum(x[:5]) - 1 - thr,
+                          1 - thr - np.sum(x[:5]))),
+            ))[:, None], np.zeros((14, 1))
+            )), axis=1), axis=1, arr=points)
+    return lambda points: np.apply_along_axis(lambda x: np.max(
+        np.hstack((np.concatenate((
+            -x[:5], x[:5] - 1,
+            err - x[5:],
+            np.array((x[5] - 1, x[6] - 1 + err)),
+            np.array((np.sum(x[:5]) - 1 - thr,
+                      1 - thr - np.sum(x[:5]))),
+        ))[:, None], np.zeros((16, 1))
+        )), axis=1), axis=1, arr=points)
+
+
+def best_of(fn, number, rounds=5):
+    """Best time per call in microseconds."""
+    return min(repeat(fn, number=number, repeat=rounds)) / number * 1e6
+
+
+def perturb(points):
+    """Push some particles off the feasible region so every branch is hit."""
+    return points + np.random.normal(0, .2, points.shape)
+
+
+def main():
+    np.random.seed(0)
+    row = '{:12}{:>14}{:>14}{:>14}{:>10}'
+    print(row.format('Kernel', 'Shape', 'Legacy (us)', 'Vector (us)', 'Gain'))
+    print('-' * 64)
+
+    for module, legacy in ((cdhs, legacy_cdhs), (ceesa, legacy_ceesa)):
+        name = module.__name__.split('.')[-1]
+        for constraint in ('crs', 'drs'):
+            old = legacy(constraint)
+            new = module.get_constraint_fn(constraint)
+            label = '{}-{}'.format(name, constraint)
+
+            for npart in SWARM_SIZES:
+                points = perturb(module.initialize_points(npart, constraint))
+                if not np.array_equal(old(points), new(points)):
+                    raise AssertionError('mismatch for ' + label)
+
+                number = max(1, 2500 // npart)
+                t_old = best_of(lambda: old(points), number, rounds=3)
+                t_new = best_of(lambda: new(points), number * 20)
+                print(row.format(label, str(points.shape), '%.1f' % t_old,
+                                 '%.1f' % t_new, '%.0fx' % (t_old / t_new)))
+
+            # Whole catalog as one batch vs. one call per planet.
+            nplanet, npart = BATCH_SHAPE
+            batch = perturb(np.stack([
+                module.initialize_points(npart, constraint)
+                for _ in range(nplanet)]))
+            if not np.array_equal(np.stack([old(b) for b in batch]),
+                                  new(batch)):
+                raise AssertionError('batch mismatch for ' + label)
+
+            t_old = best_of(lambda: [old(b) for b in batch], 1, rounds=1)
+            t_new = best_of(lambda: new(batch), 5)
+            print(row.format(label, str(batch.shape), '%.0f' % t_old,
+                             '%.0f' % t_new, '%.0fx' % (t_old / t_new)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/python
+
+"""Benchmark the startup time of the package and the scripts, each in a
+fresh interpreter.
+
+Run from the repository root as
+    > python -m benchmarks.startup [--rounds <n>] [--budget <ms>]
+
+Every case reports its best import time over the rounds. The exit status is
+1 if a light case loads one of its forbidden heavy modules, or takes longer
+than the budget, so that eager imports do not creep back in.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ROUNDS = 5
+BUDGET = 400.                                           # Milliseconds.
+HEAVY = ('pandas', 'scipy')
+
+# Cases: (name, code run in the new interpreter, forbidden modules).
+CASES = [
+    ('import source', 'import source', HEAVY + ('source.pso',)),
+    ('conmax_by_pso', 'from source import conmax_by_pso', HEAVY),
+    ('cdhs', 'from source import cdhs', HEAVY),
+    ('ceesa', 'from source import ceesa', HEAVY),
+    ('generate_values --help',
+     'import runpy, sys\n'
+     'sys.argv = ["generate_values.py", "--help"]\n'
+     'try:\n'
+     '    runpy.run_path("generate_values.py", run_name="__main__")\n'
+     'except SystemExit:\n'
+     '    pass', HEAVY),
+    ('exoplanets', 'from source import exoplanets', None),
+]
+
+PROBE = """
+import io, json, sys, time
+from contextlib import redirect_stdout
+start = time.perf_counter()
+with redirect_stdout(io.StringIO()):
+    exec(compile({code!r}, '<case>', 'exec'))
+elapsed = time.perf_counter() - start
+print(json.dumps({{'elapsed': elapsed, 'modules': sorted(sys.modules)}}))
+"""
+
+
+def probe(code):
+    """Run code in a new interpreter, return (seconds, loaded modules)."""
+    out = subprocess.run([sys.executable, '-c', PROBE.format(code=code)],
+                         cwd=ROOT, check=True, capture_output=True, text=True)
+    result = json.loads(out.stdout.splitlines()[-1])
+    return result['elapsed'], set(result['modules'])
+
+
+def main(args):
+    rounds, budget = ROUNDS, BUDGET
+    while args:
+        argname = args.pop(0)
+        if argname == '--rounds':
+            rounds = int(args.pop(0))
+        elif argname == '--budget':
+            budget = float(args.pop(0))
+        else:
+            print(__doc__)
+            return 2
+
+    failed = False
+    row = '{:26}{:>12}  {}'
+    print(row.format('Case', 'Time (ms)', 'Status'))
+    print('-' * 64)
+
+    for name, code, forbidden in CASES:
+        runs = [probe(code) for _ in range(rounds)]
+        elapsed = min(run[0] for run in runs) * 1e3
+        status = 'ok'
+
+        if forbidden is not None:
+            loaded = sorted(mod for mod in forbidden
+                            if any(mod in run[1] for run in runs))
+            if loaded:
+                status = 'loads ' + ', '.join(loaded)
+            elif elapsed > budget:
+                status = 'over budget'
+            failed |= status != 'ok'
+        else:
+            status = 'reference'
+        print(row.format(name, '%.1f' % elapsed, status))
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
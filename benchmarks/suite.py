@@ -0,0 +1,244 @@
+#!/usr/bin/python
+
+"""Benchmark suite for the PSO engine, the objectives and end-to-end scoring.
+
+Run from the repository root as
+    > python -m benchmarks.suite [--quick] [--sizes 10,100,1000]
+                                 [--output <json>] [--baseline <json>]
+                                 [--save-baseline] [--tolerance <frac>]
+
+Every case records its wall time (best of several rounds), the iterations
+and fitness evaluations where they apply, and the peak memory traced by
+tracemalloc during one extra round. The results are written as JSON and
+compared with a saved baseline; the exit status is 1 if any case regressed
+by more than the tolerance.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from functools import partial
+from timeit import default_timer
+
+import numpy as np
+
+import source
+from source import cdhs, ceesa
+from source.problems import engine
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+OUTPUT = os.path.join(HERE, 'latest.json')
+BASELINE = os.path.join(HERE, 'baseline.json')
+
+SIZES = (10, 100, 1000)
+TOLERANCE = .25
+SEED = 0
+PSO_PARAMS = dict(friction=.6, learnrate1=.8, learnrate2=.2, max_velocity=1.)
+
+# Coefficients of a typical planet (55 Cnc e), for the microbenchmarks.
+PLANET = (1.99, 1.06, 6.334, 2.05, 3.529)
+
+_counters = {'iterations': 0, 'nfev': 0}
+
+
+# Microbenchmarks.
+def micro_cases():
+    """Yield (name, function, rounds, number) for every microbenchmark."""
+    for mod, coeff in ((cdhs, PLANET[:2]), (ceesa, PLANET)):
+        name = mod.__name__.split('.')[-1]
+        for constraint in ('crs', 'drs'):
+            label = '{}-{}'.format(name, constraint)
+            fitness = mod.construct_fitness(*coeff, constraint)
+            check = mod.get_constraint_fn(constraint)
+            swarm = mod.initialize_points(25, constraint,
+                                          rng=np.random.default_rng(SEED))
+
+            yield ('initialize_points/' + label,
+                   lambda m=mod, c=constraint: m.initialize_points(25, c),
+                   5, 200)
+            yield ('construct_fitness/' + label,
+                   lambda f=fitness, s=swarm: f(s), 5, 2000)
+            yield ('get_constraint_fn/' + label,
+                   lambda f=check, s=swarm: f(s), 5, 2000)
+            yield ('conmax_by_pso/' + label,
+                   lambda f=fitness, k=check, m=mod, c=constraint:
+                       run_pso(f, k, m, c), 3, 5)
+            if mod is ceesa:
+                repair = ceesa.get_repair_fn(constraint)
+                yield ('conmax_by_pso-repair/' + label,
+                       lambda f=fitness, k=check, c=constraint, r=repair:
+                           run_pso(f, k, ceesa, c, repair=r), 3, 5)
+
+
+def run_pso(fitness, check, mod, constraint, **kwargs):
+    """Run conmax_by_pso from a fixed seed and count its work."""
+    rng = np.random.default_rng(SEED)
+    start = mod.initialize_points(25, constraint, rng=rng)
+    _, it, info = source.conmax_by_pso(fitness, start, check, rng=rng,
+                                       full_output=True, **PSO_PARAMS,
+                                       **kwargs)
+    _counters['iterations'] += it + 1
+    _counters['nfev'] += info['nfev']
+
+
+# End-to-end benchmarks.
+def e2e_cases(sizes):
+    """Yield (name, function, rounds, number) scoring catalog samples."""
+    for size in sizes:
+        sample = source.exoplanets.sample(
+            min(size, len(source.exoplanets)), random_state=SEED)
+        sample = sample.reset_index(drop=True)
+        for name, evaluate in (
+                ('cdhs', source.evaluate_cdhs_values),
+                ('cdhs-exact', partial(source.evaluate_cdhs_values,
+                                       method='exact')),
+                ('ceesa', source.evaluate_ceesa_values)):
+            yield ('evaluate/{}/{}'.format(name, size),
+                   lambda e=evaluate, s=sample: run_evaluator(e, s), 1, 1)
+
+
+def run_evaluator(evaluate, sample):
+    """Score the sample into a scratch directory, counting the work of every
+    swarm through a wrapper around conmax_by_pso."""
+    with tempfile.TemporaryDirectory() as tmpdir, counting_pso():
+        evaluate(sample, fname=os.path.join(tmpdir, 'bench_{0}.csv'),
+                 verbose=False, seed=SEED, npart=25, **PSO_PARAMS)
+
+
+@contextmanager
+def counting_pso():
+    """Temporarily route the conmax_by_pso of the engine every score runs
+    on, see source.problems, through a counter."""
+    original = source.conmax_by_pso
+
+    def counted(*args, full_output=False, **kwargs):
+        try:
+            gbest, it, info = original(*args, full_output=True, **kwargs)
+        except source.SwarmConvergeError:
+            _counters['iterations'] += kwargs.get('max_iter', 1000)
+            raise
+        _counters['iterations'] += it + 1
+        _counters['nfev'] += info['nfev']
+        return (gbest, it, info) if full_output else (gbest, it)
+
+    engine.conmax_by_pso = counted
+    try:
+        yield
+    finally:
+        engine.conmax_by_pso = original
+
+
+# Measurement.
+def measure(fn, rounds, number):
+    """Return the record of one case: best seconds per call over the rounds,
+    counters per call and peak traced memory in bytes."""
+    best = float('inf')
+    for _ in range(rounds):
+        _counters.update(iterations=0, nfev=0)
+        tic = default_timer()
+        for _ in range(number):
+            fn()
+        best = min(best, (default_timer() - tic) / number)
+    counts = {key: val // number for key, val in _counters.items()}
+
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    record = {'seconds': best, 'peak_bytes': peak}
+    if counts['iterations']:
+        record.update(counts)
+    return record
+
+
+def compare(results, baseline, tolerance):
+    """Print the comparison with the baseline and return the regressions."""
+    regressions = []
+    row = '{:34}{:>12}{:>12}{:>9}{:>12}{:>10}'
+    print(row.format('Case', 'Time (ms)', 'Base (ms)', 'Ratio',
+                     'Peak (KiB)', 'Status'))
+    print('-' * 89)
+
+    for name, record in results.items():
+        base = baseline.get(name)
+        status, ratio, base_ms = 'new', '', ''
+        if base is not None:
+            ratio = record['seconds'] / base['seconds']
+            base_ms = '%.3f' % (base['seconds'] * 1e3)
+            slower = ratio > 1 + tolerance
+            more_work = record.get('nfev', 0) > \
+                base.get('nfev', 0) * (1 + tolerance) > 0
+            status = 'SLOWER' if slower else 'MORE WORK' if more_work \
+                else 'ok'
+            if slower or more_work:
+                regressions.append(name)
+            ratio = '%.2f' % ratio
+        print(row.format(name, '%.3f' % (record['seconds'] * 1e3), base_ms,
+                         ratio, record['peak_bytes'] // 1024, status))
+    return regressions
+
+
+def main(args):
+    sizes, output, baseline = SIZES, OUTPUT, BASELINE
+    save, tolerance = False, TOLERANCE
+    while args:
+        arg = args.pop(0)
+        if arg == '--quick':
+            sizes = SIZES[:2]
+        elif arg == '--sizes':
+            sizes = tuple(int(size) for size in args.pop(0).split(','))
+        elif arg == '--output':
+            output = args.pop(0)
+        elif arg == '--baseline':
+            baseline = args.pop(0)
+        elif arg == '--save-baseline':
+            save = True
+        elif arg == '--tolerance':
+            tolerance = float(args.pop(0))
+        else:
+            print(__doc__)
+            return 0 if arg in ('-h', '--help') else -1
+
+    np.random.seed(SEED)
+    results = {}
+    for name, fn, rounds, number in (*micro_cases(), *e2e_cases(sizes)):
+        print('Running {:60}'.format(name), end='\r')
+        results[name] = measure(fn, rounds, number)
+    print(' ' * 70, end='\r')
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'cases': results,
+    }
+    with open(output, 'w') as ofile:
+        json.dump(report, ofile, indent=1)
+
+    previous = {}
+    if os.path.isfile(baseline):
+        with open(baseline) as bfile:
+            previous = json.load(bfile)['cases']
+    regressions = compare(results, previous, tolerance)
+
+    if save:
+        with open(baseline, 'w') as bfile:
+            json.dump(report, bfile, indent=1)
+        print('\nBaseline saved to ' + baseline)
+    elif regressions:
+        print('\n{} case(s) regressed beyond {:.0%}.'.format(
+            len(regressions), tolerance))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -2,7 +2,8 @@ import sys
 import matplotlib.pyplot as plt
 import numpy as np
 from os import path
-import pandas as pd
+
+from source.utils import TrajectoryStore, load_results
 
 
 PRECISION = 1e-5
@@ -45,11 +46,13 @@ COLORS = {
 
 def extract_range(planets, constraint):
     hab_intervals = []
+    store = TrajectoryStore(path.join('temp', 'ceesa_' + constraint))
+    results = load_results('ceesa_' + constraint, ['Name', 'Iter'])
+    settled = results.set_index('Name')['Iter']
 
     for planet in planets:
-        fname = path.join(
-            'temp', constraint, '{0}-{1}.txt'.format(planet, constraint))
-        hab_range = np.genfromtxt(fname)[:-99]
+        # Drop the tail recorded after the swarm settled.
+        hab_range = store[planet][:settled[planet] + 1]
         if hab_range.shape[0] > 50:
             hab_range = hab_range[-50:]
         hab_intervals.append([hab_range.min(), hab_range.max()])
@@ -57,19 +60,23 @@ def extract_range(planets, constraint):
     return np.array(hab_intervals)
 
 
-def write_range(hab_interval, constraint):
-    df = pd.read_csv(path.join('results', 'ceesa_{}.csv'.format(constraint)))
-    df['ScoreMin'] = hab_intervals[:, 0]
-    df['ScoreMax'] = hab_intervals[:, 1]
+def write_range(hab_intervals, constraint):
+    df = load_results('ceesa_' + constraint)
+    if hab_intervals is not None:
+        df['ScoreMin'] = hab_intervals[:, 0]
+        df['ScoreMax'] = hab_intervals[:, 1]
     df.to_csv('results/ceesa_{}_app.csv'.format(constraint), index=False)
 
 
 if __name__ == '__main__':
 
     # First row has headers, first column is planet name.
-    planets = np.genfromtxt(
-        'results/ceesa_crs.csv', dtype=str, delimiter=',')[1:, 0]
+    planets = load_results('ceesa_crs', ['Name'], as_frame=False)['Name']
 
     for constraint in ('crs', 'drs'):
-        hab_intervals = extract_range(planets, constraint)
+        # Tables scored with --intervals already hold the ranges.
+        hab_intervals = None
+        if 'ScoreMin' not in load_results('ceesa_' + constraint,
+                                          as_frame=False):
+            hab_intervals = extract_range(planets, constraint)
         write_range(hab_intervals, constraint)
\ No newline at end of file
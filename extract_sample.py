@@ -1,16 +1,17 @@
 #!/usr/bin/python
 
 import numpy as np
-import pandas as pd
+
+from source.utils import load_results
 
 cdhs = {
-        'crs': pd.read_csv('results/cdhs_crs.csv'),
-        'drs': pd.read_csv('results/cdhs_drs.csv')
+        'crs': load_results('cdhs_crs'),
+        'drs': load_results('cdhs_drs')
         }
 
 ceesa = {
-        'crs': pd.read_csv('results/ceesa_crs.csv'),
-        'drs': pd.read_csv('results/ceesa_drs.csv')
+        'crs': load_results('ceesa_crs'),
+        'drs': load_results('ceesa_drs')
         }
 
 planets = [
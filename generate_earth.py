@@ -1,28 +1,29 @@
 import numpy as np
-from source import conmax_by_pso, SwarmConvergeError
-from source.ceesa import construct_fitness
-from source.ceesa import get_constraint_fn
-from source.ceesa import initialize_points
+from source.cdhs import replicate_cdhs
+from source.ceesa import replicate_ceesa
 
 
-print('Earth CEESA Score averaged over 50 iterations:')
+REPLICATES = 50
+PSO_PARAMS = dict(friction=.6, learnrate1=.8, learnrate2=.2, max_velocity=1.)
 
-for constraint in ('crs', 'drs'):
-    npart = 25
+# Replicate function and Earth parameters in EU of every score.
+SCORES = (
+    ('CDHS', replicate_cdhs, (1, 1, 1, 1)),
+    ('CEESA', replicate_ceesa, (1, 1, 1, 1, 0.0167)),
+)
 
-    check = get_constraint_fn(constraint)
-    ceesa = construct_fitness(1, 1, 1, 1, 0.0167, constraint)
-    start = initialize_points(npart, constraint)
 
-    score = 0
-    iter_ = 0
-    for ii in range(50):
-        gbest, it = conmax_by_pso(
-            ceesa, start, check, friction=.6, learnrate1=.8,
-            learnrate2=.2, max_velocity=1.)
-        score += gbest
-        iter_ += it
-    score /= 50
-    iter_ /= 50
+for scorename, replicate, earth in SCORES:
+    print('Earth %s Score over %d replicate swarms:' % (scorename, REPLICATES))
 
-    print('\t', constraint.upper(), ':', np.round(ceesa(score), 4), iter_)
+    for constraint in ('crs', 'drs'):
+        score, weights, count, info = replicate(
+            *earth, constraint, replicates=REPLICATES, npart=25,
+            full_output=True, **PSO_PARAMS)
+        iter_ = np.mean(info['settled'][info['converged']])
+
+        print('\t', constraint.upper(), ':', np.round(score.mean[0], 4),
+              '+-', np.round(score.std[0], 4),
+              '95%% CI [%.4f, %.4f]' % (score.low[0], score.high[0]),
+              'range [%.4f, %.4f]' % (score.min[0], score.max[0]),
+              '(%d converged,' % count[0], iter_, 'iterations)')
@@ -2,10 +2,11 @@
 
 # import matplotlib as mpl
 from matplotlib import pyplot as plt
-import pandas as pd
 from shutil import copyfile
 import sys
 
+from source.utils import load_results
+
 
 help_text = """
 USAGE: ./generate_plots.py [-h] [--help] [-n] [--nodisplay] [-s] [--save]
@@ -28,18 +29,21 @@ OPTIONAL ARGUMENTS:
 invalid = 'Invalid usage.\n' + help_text
 
 
-scores = {
-    'CDHS': {
-        'CRS': pd.read_csv('results/cdhs_crs.csv'),
-        'DRS': pd.read_csv('results/cdhs_drs.csv'),
-    },
-    'CEESA': {
-        'CRS': pd.read_csv('results/ceesa_crs.csv'),
-        'DRS': pd.read_csv('results/ceesa_drs.csv'),
-    }
+# Columns of the results used by the plots, per score.
+COLUMNS = {
+    'CDHS': ['CDHS', 'Inn', 'Sur'],
+    'CEESA': ['CEESA', 'Iter'],
 }
 
 
+def load_scores():
+    """Load the columns of every result table used by the plots."""
+    return {sc: {cn: load_results('{}_{}'.format(sc.lower(), cn.lower()),
+                                  columns)
+                 for cn in ('CRS', 'DRS')}
+            for sc, columns in COLUMNS.items()}
+
+
 # Score distributions.
 def plot_score_distributions(scores, display=True, save=False, dpi=400):
     for sc in scores:
@@ -121,5 +125,6 @@ if __name__ == '__main__':
     if not plots:
         plots = [plot_score_distributions, plot_iter_distributions]
 
+    scores = load_scores()
     for p in plots:
         p(scores, disp, save, dpi)
@@ -3,9 +3,14 @@
 from functools import partial
 import sys
 
-from source import exoplanets
+import numpy as np
+
+import source
 from source import evaluate_cdhs_values
 from source import evaluate_ceesa_values
+from source.sweep import parameter_grid, parameter_samples, run_sweep
+from source.sweep.sweep import PARAMS
+from source.utils import SAMPLERS, ResumeError
 
 
 # Parameters for the swarm.
@@ -21,8 +26,16 @@ pso_params = {
 # Help text for the script.
 help_text = """
 USAGE: ./generate_values.py [-h] [--help] [-q] [--quiet] [--debug <it>]
-                            [--score <scorename>]
+                            [-d] [--dump] [--score <scorename>]
                             [--multiple <param> <start> <stop> [<step>]]
+                            [--grid <param>=<values> ...]
+                            [--random <n> <param>=<low>:<high> ...]
+                            [--workers <n>] [--seed <seed>] [--resume]
+                            [--incremental] [--intervals] [--repair]
+                            [--sampler <sampler>]
+                            [--exact] [--stopping <rule>]
+                            [--restarts <n> [grow|reseed]] [--numba]
+                            [--replicates <n>]
 Generate the CDHS and CEESA score for exoplanets from the PHL-EC dataset.
 
 OPTIONAL ARGUMENTS:
@@ -34,16 +47,97 @@ OPTIONAL ARGUMENTS:
         Generate the scores over multiple iterations by varying the parameter
         specified by <param> from <start> to <stop> by <step>. <step> is 1 by
         default. <param> may be "npart", "friction", "learnrate1", "learnrate2"
-        or "max_velocity".
+        or "max_velocity", and the bounds may be floats.
+    --grid <param>=<values> [<param>=<values> ...]
+        Sweep every combination of the given parameter values, where <values>
+        is either a list "0.4,0.6,0.8" or a range "<start>:<stop>:<step>".
+        The (configuration x planet shard) tasks are scheduled across the
+        --workers pool and the results written to one table,
+        results/sweep_<scorename>.csv, keyed by configuration. --sampler,
+        --restarts, --repair and --intervals apply to every configuration;
+        --resume, --incremental, --exact, --dump, --multiple and --replicates
+        cannot be combined with a sweep.
+    --random <n> <param>=<low>:<high> [<param>=<low>:<high> ...]
+        As --grid, but sweep <n> configurations drawn uniformly at random.
+        Drawn with --seed if given.
     --debug <it>
         Run everything on <it> random exoplanets. (Could include nan that will
         be removed.)
     -q --quiet
         If specified, nothing will be printed to STDOUT.
     -d --dump
-        Generates dump files of gbest values for every planet.
+        Records the gbest values of every iteration for every planet in the
+        trajectory store temp/<scorename>_<constraint>.bin.
+    --workers <n>
+        Split the catalog across <n> processes. 1 by default.
+    --seed <seed>
+        Root seed for the per-planet random streams. With a seed, the results
+        are identical for any number of workers, and those of a planet do not
+        depend on the rest of the catalog.
+    --resume
+        Continue an interrupted run, skipping the planets already written to
+        the result files under the same parameters. Stops, leaving the files
+        as they are, if they were written under other parameters.
+    --incremental
+        Only score the planets that were added or changed since the last
+        complete run with the same parameters, and carry the results of the
+        others forward, as a full run with --seed would give them. Prints how
+        many planets are new, changed, unchanged and removed.
+    --intervals
+        Keep the range of every CEESA score over the last 50 iterations of
+        its swarm, written as the ScoreMin and ScoreMax columns of the result
+        files, so that coalesce_results.py needs no --dump.
+    --repair
+        Project the CEESA particles back onto the constraints after every
+        move, so that no move is wasted on an infeasible position. Most
+        swarms settle in fewer iterations.
+    --sampler <sampler>
+        How to draw the starting points of the swarms: "random" (the
+        default), or the low-discrepancy sequences "sobol" or "halton".
+    --exact
+        Solve the CDHS in closed form instead of running the swarms. Takes
+        milliseconds for the whole catalog.
+    --stopping <rule>
+        Rule deciding when a swarm has converged: "stable" (the default,
+        gbest unchanged for 100 iterations), "radius", "improvement",
+        "patience" or "combined". See source/pso/stopping.py.
+    --restarts <n> [grow|reseed]
+        Start a swarm that does not converge over up to <n> times, with a
+        swarm twice as large ("grow", the default) or around its last gbest
+        ("reseed"), instead of leaving the planet out. The result files get
+        a Restarts column.
+    --numba
+        Run every swarm iteration, with the CDHS or CEESA objective and
+        constraints, as one compiled kernel. Requires numba, falls back to
+        numpy without it.
+    --replicates <n>
+        Also solve every planet with <n> independent swarms, run as one batch
+        per planet, and write the mean and standard deviation of its score
+        over them and the 95% confidence interval of the mean as the
+        ScoreMean, ScoreStd, ScoreLow and ScoreHigh columns of the result
+        files. Cannot be combined with --exact or --numba.
 """
 
+
+def parse_range(start, stop, step=1):
+    """Return the values from start to stop, both included, by step."""
+    count = int(np.floor((stop - start) / step + 1e-9)) + 1
+    return [round(start + ii * step, 10) for ii in range(count)]
+
+
+def parse_spec(args):
+    """Pop the <param>=<values> arguments following a sweep option."""
+    spec = {}
+    while args and not args[0].startswith('-'):
+        param, values = args.pop(0).split('=')
+        if param not in PARAMS:
+            raise ValueError('invalid parameter: ' + param)
+        spec[param] = values
+    if not spec:
+        raise ValueError('no parameters to sweep')
+    return spec
+
+
 evaluate = {
     'cdhs': evaluate_cdhs_values,
     'ceesa': evaluate_ceesa_values,
@@ -53,10 +147,16 @@ evaluate = {
 # Handle arguments.
 args = sys.argv[1:]
 single = True
+sweep = None
 verbose = True
 gendump = False
+exact = False
+intervals = False
+repair = False
+run_params = {}
 invalid = 'Invalid usage.\n' + help_text
 debug = ''
+sample = None
 
 try:
     while args:
@@ -77,12 +177,31 @@ try:
         elif argname == '--multiple':
             single = False
             param = args.pop(0)
-            start = int(args.pop(0))
-            stop = int(args.pop(0))
+            if param not in PARAMS:
+                raise ValueError('invalid parameter: ' + param)
+            start = float(args.pop(0))
+            stop = float(args.pop(0))
             if args and not args[0].startswith('-'):
-                step = int(args.pop(0))
+                step = float(args.pop(0))
             else:
                 step = 1
+            values = [PARAMS[param](value)
+                      for value in parse_range(start, stop, step)]
+
+        # --grid <param>=<values> ...
+        elif argname == '--grid':
+            spec = parse_spec(args)
+            sweep = parameter_grid({
+                pm: parse_range(*map(float, vl.split(':'))) if ':' in vl
+                else [float(val) for val in vl.split(',')]
+                for pm, vl in spec.items()})
+
+        # --random <n> <param>=<low>:<high> ...
+        elif argname == '--random':
+            count = int(args.pop(0))
+            spec = parse_spec(args)
+            sweep = (count, {pm: tuple(map(float, vl.split(':')))
+                             for pm, vl in spec.items()})
 
         # --help or -h
         elif argname in ['--help', '-h']:
@@ -95,32 +214,125 @@ try:
 
         # --debug
         elif argname == '--debug':
-            exoplanets = exoplanets.sample(int(args.pop(0)))
-            exoplanets.reset_index(drop=True, inplace=True)
+            sample = int(args.pop(0))
             debug = '_sample'
 
         elif argname in ['--dump', '-d']:
             gendump = True
 
+        # --workers <n>
+        elif argname == '--workers':
+            run_params['workers'] = int(args.pop(0))
+
+        # --seed <seed>
+        elif argname == '--seed':
+            run_params['seed'] = int(args.pop(0))
+
+        # --resume
+        elif argname == '--resume':
+            run_params['resume'] = True
+
+        # --incremental
+        elif argname == '--incremental':
+            run_params['incremental'] = True
+
+        # --intervals
+        elif argname == '--intervals':
+            intervals = True
+
+        # --repair
+        elif argname == '--repair':
+            repair = True
+
+        # --sampler <sampler>
+        elif argname == '--sampler':
+            run_params['sampler'] = args.pop(0)
+            if run_params['sampler'] not in SAMPLERS:
+                raise ValueError('invalid sampler')
+
+        # --exact
+        elif argname == '--exact':
+            exact = True
+
+        # --stopping <rule>
+        elif argname == '--stopping':
+            pso_params['stopping'] = args.pop(0)
+
+        # --numba
+        elif argname == '--numba':
+            pso_params['backend'] = 'numba'
+
+        # --restarts <n> [grow|reseed]
+        elif argname == '--restarts':
+            run_params['restarts'] = int(args.pop(0))
+            if args and args[0] in ('grow', 'reseed'):
+                run_params['restart_policy'] = args.pop(0)
+
+        # --replicates <n>
+        elif argname == '--replicates':
+            run_params['replicates'] = int(args.pop(0))
+
         else:
             print(invalid)
             sys.exit(-1)
 
+    # Sweeps write a single table without checkpoints and run the swarms.
+    if sweep is not None and (gendump or exact or not single or
+                              run_params.get('resume') or
+                              run_params.get('incremental') or
+                              run_params.get('replicates')):
+        raise ValueError('option not supported by sweeps')
+
+    # Replicates run batches of swarms, without compiled kernels.
+    if run_params.get('replicates') and (exact or 'backend' in pso_params):
+        raise ValueError('option not supported with replicates')
+
 except (IndexError, ValueError):
     print(invalid)
     sys.exit(-1)
 
 
+# The catalog is only loaded once the arguments are valid.
+exoplanets = source.exoplanets
+if sample is not None:
+    exoplanets = exoplanets.sample(sample)
+    exoplanets.reset_index(drop=True, inplace=True)
+
 try:
+    if isinstance(sweep, tuple):
+        sweep = parameter_samples(sweep[1], sweep[0],
+                                  seed=run_params.get('seed'))
+
     for score, fn in evaluate.items():
-        fn = partial(fn, exoplanets, verbose=verbose, gendump=gendump)
+        if sweep is not None:
+            extra = {}
+            if repair and score == 'ceesa':
+                extra['repair'] = True
+            if intervals and score == 'ceesa':
+                extra['intervals'] = True
+            run_sweep(exoplanets, score, sweep, base=pso_params,
+                      verbose=verbose, **run_params, **extra,
+                      fname='results/sweep_{}{}.csv'.format(score, debug))
+            continue
+
+        fn = partial(fn, exoplanets, verbose=verbose, gendump=gendump,
+                     **run_params)
+        if exact and score == 'cdhs':
+            fn = partial(fn, method='exact')
+        if intervals and score == 'ceesa':
+            fn = partial(fn, intervals=True)
+        if repair and score == 'ceesa':
+            fn = partial(fn, repair=True)
         if single:                                              # Aww...
             fname = '{sc}_{{0}}{db}.csv'.format(sc=score, db=debug)
             fn(fname=fname, **pso_params)
         else:
-            for pso_params[param] in range(start, stop+step, step):
+            for pso_params[param] in values:
                 fname = '{sc}_{{0}}_{pm}_{vl}{db}.csv'.format(
                         sc=score, pm=param, vl=pso_params[param], db=debug)
                 fn(fname=fname, **pso_params)
 except KeyboardInterrupt:
-    print('\nGood bye!')
+    print('\nGood bye! Run again with --resume to continue.')
+except ResumeError as err:
+    print('{}. Run again without --resume to start over.'.format(err))
+    sys.exit(-1)
@@ -1,13 +1,14 @@
 import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
 import seaborn as sns
 
+from source.utils import load_results
+
 plt.rc('xtick',labelsize=2)
 plt.rc('ytick',labelsize=8)
 
-df = pd.read_csv('results/ceesa_crs.csv')
-df.CEESA[df.CEESA > 15] = 15
+df = load_results('ceesa_crs', ['Name', 'Cls', 'CEESA'])
+df['CEESA'] = df['CEESA'].clip(upper=15)
 
 barlist = plt.bar(
     np.arange(len(df['Name'])), df['CEESA'])
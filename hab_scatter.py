@@ -1,15 +1,16 @@
 import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
 import seaborn as sns
 
+from source.utils import load_results
+
 plt.rc('xtick',labelsize=8)
 plt.rc('ytick',labelsize=8)
 
 colors = [0, 'r', 'b', 'g', 'm', 'y']
 
-df = pd.read_csv('results/ceesa_crs.csv')
-df.CEESA[df.CEESA > 15] = 15
+df = load_results('ceesa_crs', ['Name', 'Cls', 'CEESA'])
+df['CEESA'] = df['CEESA'].clip(upper=15)
 
 xaxis = df['Cls'].copy()
 xaxis[xaxis == 'non-habitable'] = 1
@@ -1,8 +1,45 @@
-from .exoplanets import exoplanets
-from .pso import conmax_by_pso, SwarmConvergeError
+"""Habitability scores of exoplanets: CDHS, CEESA, the problems they are
+defined as and the swarm optimizer computing them.
 
-from . import cdhs
-from . import ceesa
+Submodules and their heavy dependencies (pandas, scipy) are imported on
+first access of the attributes below, so that scripts only pay for what
+they use.
+"""
 
-from .cdhs import evaluate_cdhs_values
-from .ceesa import evaluate_ceesa_values
+from importlib import import_module as _import_module
+
+
+# Attributes loaded on first access: name -> (module, attribute or None).
+_LAZY = {
+    'exoplanets': ('.catalog', 'exoplanets'),
+    'cdhs': ('.cdhs', None),
+    'ceesa': ('.ceesa', None),
+    'conmax_by_pso': ('.pso', 'conmax_by_pso'),
+    'conmax_by_pso_batch': ('.pso', 'conmax_by_pso_batch'),
+    'SwarmConvergeError': ('.pso', 'SwarmConvergeError'),
+    'evaluate_cdhs_values': ('.cdhs', 'evaluate_cdhs_values'),
+    'evaluate_ceesa_values': ('.ceesa', 'evaluate_ceesa_values'),
+    'problems': ('.problems', None),
+    'get_problem': ('.problems', 'get_problem'),
+    'score_problem': ('.problems', 'score_problem'),
+    'evaluate_values': ('.problems', 'evaluate_values'),
+}
+
+__all__ = list(_LAZY)
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(
+            'module {!r} has no attribute {!r}'.format(__name__, name))
+
+    module, attr = _LAZY[name]
+    value = _import_module(module, __name__)
+    if attr is not None:
+        value = getattr(value, attr)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
@@ -0,0 +1,10 @@
+from .load_data import load_exoplanets
+
+
+def __getattr__(name):
+    # The catalog is loaded on first access, and kept.
+    if name == 'exoplanets':
+        globals()['exoplanets'] = load_exoplanets()
+        return globals()['exoplanets']
+    raise AttributeError(
+        'module {!r} has no attribute {!r}'.format(__name__, name))
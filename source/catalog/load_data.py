@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+from ..utils import _round
+
+
+__location__ = os.path.realpath(
+    os.path.join(os.getcwd(), os.path.dirname(__file__)))
+
+CATALOG = os.path.join(__location__, 'exoplanets.csv')
+CACHE_DIR = os.path.join(__location__, 'cache')
+
+# Bump whenever the preprocessing below changes, to invalidate the caches.
+PREPROCESS_VERSION = 1
+
+# PHL-EC columns used, and their names in the catalog.
+COLUMNS = {
+    'P. Name': 'Name',
+    'P. Radius (EU)': 'Radius',
+    'P. Density (EU)': 'Density',
+    'P. Ts Mean (K)': 'STemp',
+    'P. Esc Vel (EU)': 'Escape',
+    'P. Eccentricity': 'Eccentricity',
+    'P. Habitable Class': 'Habitable',
+}
+
+
+def load_exoplanets(fpath=CATALOG, cache_dir=CACHE_DIR):
+    """Return the cleaned exoplanet catalog as a pandas.DataFrame.
+
+    The first load parses the CSV and stores every cleaned column as a .npy
+    file under cache_dir, in a directory keyed on the hash of the CSV and
+    PREPROCESS_VERSION. Later loads memory-map those columns instead of
+    parsing the CSV again. If the cache cannot be written, the catalog is
+    still returned.
+
+    Arguments:
+        fpath: str, default CATALOG
+            The PHL-EC catalog.
+        cache_dir: str or None, default CACHE_DIR
+            Directory of the cache. None always parses the CSV.
+    Returns:
+        pandas.DataFrame with columns Name, Radius, Density, STemp, Escape,
+        Eccentricity and Habitable, in Earth units.
+    """
+    import pandas as pd
+
+    if cache_dir is None:
+        return _parse(fpath)
+
+    with open(fpath, 'rb') as cfile:
+        digest = hashlib.sha1(cfile.read()).hexdigest()[:16]
+    key = '{}-v{}'.format(digest, PREPROCESS_VERSION)
+    cpath = os.path.join(cache_dir, key)
+
+    try:
+        with open(os.path.join(cpath, 'meta.json')) as mfile:
+            names = json.load(mfile)['columns']
+        return pd.DataFrame({
+            name: np.load(os.path.join(cpath, name + '.npy'), mmap_mode='r')
+            for name in names})
+    except (OSError, ValueError, KeyError):
+        pass
+
+    exoplanets = _parse(fpath)
+    try:
+        _store(exoplanets, cache_dir, key)
+    except OSError:
+        pass
+    return exoplanets
+
+
+def _parse(fpath):
+    """Parse and clean the catalog CSV."""
+    import pandas as pd
+
+    exoplanets = pd.read_csv(fpath)
+    exoplanets = exoplanets[list(COLUMNS)]
+    exoplanets.rename(columns=COLUMNS, inplace=True)
+    exoplanets.dropna(how='any', inplace=True)
+    exoplanets.reset_index(drop=True, inplace=True)
+    exoplanets['STemp'] /= 288
+    exoplanets['Eccentricity'] /= 0.017
+    return _round(exoplanets)
+
+
+def _store(exoplanets, cache_dir, key):
+    """Write the columns of the catalog to cache_dir/key atomically, and
+    drop the caches of other versions."""
+    os.makedirs(cache_dir, exist_ok=True)
+    tmpdir = os.path.join(cache_dir, '.tmp-{}-{}'.format(key, os.getpid()))
+    os.makedirs(tmpdir, exist_ok=True)
+
+    for name in exoplanets.columns:
+        column = exoplanets[name].to_numpy()
+        if column.dtype == object:
+            column = column.astype(str)
+        np.save(os.path.join(tmpdir, name + '.npy'), column)
+    with open(os.path.join(tmpdir, 'meta.json'), 'w') as mfile:
+        json.dump({'columns': list(exoplanets.columns),
+                   'version': PREPROCESS_VERSION}, mfile)
+
+    try:
+        os.replace(tmpdir, os.path.join(cache_dir, key))
+    except OSError:
+        shutil.rmtree(tmpdir, ignore_errors=True)       # Lost a race.
+
+    for entry in os.listdir(cache_dir):
+        if entry != key and not entry.startswith('.tmp-'):
+            shutil.rmtree(os.path.join(cache_dir, entry), ignore_errors=True)
@@ -1,4 +1,10 @@
 from .cdhs_fn import construct_fitness
 from .cdhs_fn import get_constraint_fn
+from .cdhs_fn import get_batch_fitness
 from .cdhs_fn import initialize_points
+from .cdhs_fn import get_point_kernels
+from .cdhs_fn import solve_exact
 from .cdhs import evaluate_cdhs_values
+from .cdhs import score_cdhs
+from .cdhs import replicate_cdhs
+from .problem import CDHSProblem
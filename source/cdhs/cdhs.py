@@ -1,11 +1,12 @@
-import csv
 import numpy as np
+from functools import partial
 from os import path
 
-from .cdhs_fn import construct_fitness
-from .cdhs_fn import get_constraint_fn
-from .cdhs_fn import initialize_points
-from ..pso import conmax_by_pso, SwarmConvergeError
+from .cdhs_fn import get_batch_fitness
+from .cdhs_fn import solve_exact
+from ..problems import REPLICATE_HEADERS, Table, check_options
+from ..problems import evaluate_table, replicate_problem
+from ..problems import solve_problem
 
 
 # Miscellaneous Consts.
@@ -17,34 +18,32 @@ HEADERS = ('Name', 'Cls', 'A', 'B', 'CDHSi',
            'G', 'D', 'CDHSs', 'CDHS', 'Inn', 'Sur')
 ERR_CDHSi = '** CDHSi convergence failed. **'
 ERR_CDHSs = '** CDHSs convergence failed. **'
+COLUMNS = ['Name', 'Habitable', 'Radius', 'Density', 'STemp', 'Escape']
 TOTAL_CHAR = 108
-PROGRESS_BAR = '[{:' + str(TOTAL_CHAR - 10) + '}]  ({:>3}%)'
 
+# Layout of the output table.
+TABLE = Table(TITLE, MESSAGE, ERROR, TOTAL_CHAR)
 
-# Print functions.
-def print_header(constraint, headers):
-    """Print the header of the output table."""
-    spaces = (TOTAL_CHAR//2 - len(constraint)//2) * ' '
-    print('\n' + spaces + constraint.upper())
-    print(spaces + '-'*len(constraint) + '\n')
-    print(TITLE.format(*headers), '-' * TOTAL_CHAR, sep='\n')
 
+# Fields of the structured array returned by score_cdhs. Failed exoplanets
+# have NaN values and -1 iterations.
+RESULT_DTYPE = np.dtype([
+    ('A', 'f8'), ('B', 'f8'), ('CDHSi', 'f8'),
+    ('G', 'f8'), ('D', 'f8'), ('CDHSs', 'f8'), ('CDHS', 'f8'),
+    ('Inn', 'i8'), ('Sur', 'i8'), ('Restarts', 'i8'), ('Status', 'i1'),
+])
 
-def print_error(name, err):
-    """Print the error for exoplanet name when convergence fails."""
-    print(ERROR.format(name, err))
-
-
-def print_results(it, total, values):
-    """Print the results of the estimation for the current planet."""
-    print(MESSAGE.format(*values))
-    prog = (it * (TOTAL_CHAR - 10)) // total
-    print(PROGRESS_BAR.format('='*prog, (it*100)//total), end='\r')
+# Message of every Status code: converged, interior or surface failed.
+STATUS = ('', ERR_CDHSi, ERR_CDHSs)
 
 
 # Function to evaluate CDHS values.
 def evaluate_cdhs_values(exoplanets, fname='cdhs_{0}.csv', verbose=True,
-                         gendump=False, npart=25, **kwargs):
+                         gendump=False, npart=25, batch=False, workers=1,
+                         seed=None, resume=False, method='pso', restarts=0,
+                         restart_policy='grow', max_nfev=None,
+                         incremental=False, replicates=0, confidence=.95,
+                         **kwargs):
     """Evaluates the CDHS values of each exoplanet and stores it in the
     indicated file.
 
@@ -61,77 +60,308 @@ def evaluate_cdhs_values(exoplanets, fname='cdhs_{0}.csv', verbose=True,
         verbose: bool, default True
             Whether to print output to stdout.
         gendump: bool, default False
-            Whether to generate dump files of gbest score.
+            Whether to record the gbest score of every iteration. They are
+            appended to the trajectory store temp/cdhs_<constraint>, see
+            utils.TrajectoryStore, keyed by exoplanet name plus ':i' for
+            the interior and ':s' for the surface score.
+        npart, batch, workers, seed, method, restarts, restart_policy,
+        max_nfev, kwargs:
+            How to score the exoplanets, see score_cdhs.
+        resume: bool, default False
+            Whether to continue an interrupted run. Exoplanets already written
+            to the result file by a run with the same parameters are skipped.
+            Rows are always written as soon as they are available, along with
+            a checkpoint manifest, see utils.ResultWriter. Once complete,
+            the table is also stored as a columnar dataset, see
+            utils.save_results, with the key of every row, see
+            utils.row_keys.
+        incremental: bool, default False
+            Whether to only score the exoplanets that are new or changed
+            since the last complete run with the same parameters. The rows
+            of the others are carried forward from its dataset, see
+            utils.carry_forward.
+        replicates: int, default 0
+            Number of independent interior and surface swarms per
+            exoplanet whose CDHS statistics, see replicate_cdhs, end the
+            rows as the columns ScoreMean, ScoreStd, ScoreLow and ScoreHigh.
+            None if 0. Not supported by the exact method.
+        confidence: float, default .95
+            Confidence level of the ScoreLow to ScoreHigh interval.
+    Returns:
+        dict with the counts of utils.carry_forward by constraint if
+        incremental, else None.
+    """
+    _check_method(method, gendump)
+    check_options(batch, workers, restarts, gendump, kwargs, replicates)
+    if method == 'exact' and replicates:
+        raise ValueError('replicates is not supported by the exact method')
+
+    headers = HEADERS
+    if restarts and method == 'pso':
+        headers = HEADERS + ('Restarts',)
+        restart = dict(restarts=restarts, policy=restart_policy,
+                       max_nfev=max_nfev)
+    else:
+        restart = None
+    if replicates:
+        headers = headers + REPLICATE_HEADERS
+
+    reports = {} if incremental else None
+    for constraint in ('crs', 'drs'):
+        params = dict(kwargs, score='cdhs', constraint=constraint,
+                      npart=npart, batch=batch, seed=seed, method=method,
+                      restart=restart)
+        if replicates:
+            params['replicates'] = dict(replicates=replicates,
+                                        confidence=confidence)
+        score_fn = partial(
+            score_cdhs, constraint=constraint, npart=npart, method=method,
+            batch=batch, workers=workers, seed=seed, restarts=restarts,
+            restart_policy=restart_policy, max_nfev=max_nfev, **kwargs)
+        replicate_fn = None
+        if replicates:
+            # One exoplanet at a time, see evaluate_table, in this process
+            # while the workers go on scoring.
+            replicate_fn = partial(
+                replicate_cdhs, constraint=constraint, replicates=replicates,
+                npart=npart, confidence=confidence, seed=seed, **kwargs)
+
+        report = evaluate_table(
+            exoplanets, COLUMNS, headers, params, score_fn,
+            path.join('results', fname.format(constraint)), TABLE,
+            constraint, verbose=verbose,
+            dump=path.join('temp', 'cdhs_' + constraint) if gendump
+            else None, resume=resume, incremental=incremental,
+            replicate_fn=replicate_fn)
+        if incremental:
+            reports[constraint] = report
+
+    if verbose:
+        print('')
+    return reports
+
+
+def score_cdhs(radius, density, stemp, escape, constraint='crs', names=None,
+               classes=None, npart=25, method='pso', batch=False, workers=1,
+               seed=None, restarts=0, restart_policy='grow', max_nfev=None,
+               sampler='random', progress=None, sink=None, store=None,
+               **kwargs):
+    """Estimate the CDHS of every exoplanet given as columns of its
+    parameters, without any text output.
+
+    Arguments:
+        radius, density, stemp, escape: array_like of shape (P,)
+            Radius, density, surface temperature and escape velocity of the
+            exoplanets in EU (Earth Units), in the order of score_ceesa.
+        constraint: 'crs' or 'drs', default 'crs'
+            Returns to scale of the CDHPF.
+        names, classes: array_like of shape (P,) or None, default None
+            Name and habitability class of every exoplanet, as used in the
+            rows passed to sink and in the keys of store. Names default to
+            the position in the columns. The random stream of an exoplanet
+            is derived from its name, so scoring a subset gives the same
+            results as scoring the whole catalog.
         npart: int, default 25
             Number of particles.
+        method: 'pso' or 'exact', default 'pso'
+            How to maximize the CDHPF. 'exact' solves every exoplanet at once
+            in closed form, see cdhs_fn.solve_exact; the swarm parameters are
+            then ignored and the iterations are 0. 'pso' runs the swarms,
+            e.g. to cross-check the exact solution.
+        batch: bool, default False
+            Whether to optimize every exoplanet at once with
+            conmax_by_pso_batch instead of one swarm at a time. Dump files are
+            not supported in batch mode.
+        workers: int, default 1
+            Number of processes to split the exoplanets across. Not supported
+            in batch mode.
+        seed: int or None, default None
+            Root seed from which every exoplanet gets an independent random
+            stream. For a given seed the results do not depend on workers.
+            If None and workers is 1, the global numpy.random state is used.
+        restarts: int, default 0
+            Number of times a swarm that does not converge is started over
+            before the exoplanet is given up, see pso.conmax_with_restarts.
+            Not supported in batch mode.
+        restart_policy: 'grow' or 'reseed', default 'grow'
+            Whether to restart with a larger swarm or around the last gbest.
+        max_nfev: int or None, default None
+            Budget of fitness evaluations per exoplanet over all restarts.
+            The surface swarm gets what the interior swarm left over.
+        sampler: 'random', 'sobol' or 'halton', default 'random'
+            How to draw the starting points of the swarms, see
+            cdhs_fn.initialize_points.
+        progress: utils.Progress or None, default None
+            Updated once per exoplanet scored.
+        sink: function or None, default None
+            Called as sink(name, values, err) for every exoplanet as soon as
+            it is scored, in order, where values is its row of results as in
+            the CSV files of evaluate_cdhs_values, or None if it failed with
+            the message err.
+        store: utils.TrajectoryStore or None, default None
+            Where to append the gbest score of every iteration, keyed by
+            exoplanet name plus ':i' for the interior and ':s' for the
+            surface score.
         kwargs:
-            The parameters for the Swarm.
+            The parameters for the Swarm, including backend='numba' for
+            the compiled kernels of conmax_by_pso.
+    Returns:
+        numpy structured array of shape (P,) and dtype RESULT_DTYPE, where
+        Status indexes STATUS.
     """
-    total = len(exoplanets)
+    _check_method(method, store is not None)
+    check_options(batch, workers, restarts, store is not None, kwargs)
+    radius, density, stemp, escape = (
+        np.asarray(col, dtype=float).ravel()
+        for col in (radius, density, stemp, escape))
 
-    for constraint in ('crs', 'drs'):
-        results = [HEADERS]
-        check = get_constraint_fn(constraint)
+    nplanet = len(radius)
+    if names is None:
+        names = np.arange(nplanet).astype(str)
+    if classes is None:
+        classes = np.full(nplanet, '')
 
-        if verbose:
-            print_header(constraint, results[-1])
+    # Rows end with the number of restarts used, if any may be.
+    restart = bool(restarts) and method == 'pso'
 
-        for _, row in exoplanets.iterrows():
-            name = row['Name']
-            habc = row['Habitable']
+    result = np.zeros(nplanet, dtype=RESULT_DTYPE)
+    if nplanet == 0:
+        return result
 
-            rad = row['Radius']
-            den = row['Density']
-            vel = row['Escape']
-            tem = row['STemp']
+    cidx = ('crs', 'drs').index(constraint)
+    inner = np.column_stack((radius, density))
+    surface = np.column_stack((escape, stemp))
 
-            # CDHS interior.
-            cdhpf = construct_fitness(rad, den, constraint)
-            start = initialize_points(npart, constraint)
+    if method == 'exact':
+        outcomes = _exact_outcomes(names, classes,
+                                   np.vstack((inner, surface)), constraint)
+    else:
+        solved = solve_problem(
+            'cdhs-' + constraint, np.stack((inner, surface), axis=1),
+            names=names, keys=[[name + ':i', name + ':s'] for name in names],
+            npart=npart, batch=batch, workers=workers, seed=seed,
+            stream_key=(cidx,), restarts=restarts,
+            restart_policy=restart_policy, max_nfev=max_nfev,
+            sampler=sampler, gendump=store is not None, **kwargs)
+        outcomes = (_planet_outcome(name, habc, solutions, dumps, restart)
+                    for name, habc, (solutions, dumps)
+                    in zip(names, classes, solved))
 
-            if gendump:
-                dumpdir = path.join('temp', constraint)
-                if not path.isdir(dumpdir):
-                    mkdir(dumpdir)
+    for ii, (name, values, err, dumps) in enumerate(outcomes):
+        for key, trajectory in (dumps or {}).items():
+            store.append(key, trajectory)
 
-                kwargs['dumpfile'] = path.join(
-                    dumpdir, '{0}-{1}.txt'.format(name, constraint))
+        if err is None:
+            result[ii] = (*values[2:11], values[11] if restart else 0, 0)
+        else:
+            result[ii] = (*[np.nan] * 7, -1, -1, -1, STATUS.index(err))
 
-            try:
-                gbest, it_i = conmax_by_pso(cdhpf, start, check, **kwargs)
-            except SwarmConvergeError:
-                print_error(name, ERR_CDHSi)
-                continue
+        if sink is not None:
+            sink(name, values, err)
+        if progress is not None:
+            progress.update()
 
-            A, B = np.round(gbest, 4)
-            cdhs_i = np.round(cdhpf(gbest), 4)
+    return result
 
-            # CDHS surface.
-            cdhpf = construct_fitness(vel, tem, constraint)
-            start = initialize_points(npart, constraint)
 
-            try:
-                gbest, it_s = conmax_by_pso(cdhpf, start, check, **kwargs)
-            except SwarmConvergeError:
-                print_error(name, ERR_CDHSs)
-                continue
+def replicate_cdhs(radius, density, stemp, escape, constraint='crs',
+                   replicates=50, names=None, npart=25, confidence=.95,
+                   seed=None, full_output=False, sampler='random', workers=1,
+                   **kwargs):
+    """Estimate the CDHS of every exoplanet with R independent interior and
+    surface swarms and return the spread of their results, see
+    problems.replicate_problem.
 
-            G, D = np.round(gbest, 4)
-            cdhs_s = np.round(cdhpf(gbest), 4)
+    Arguments:
+        radius, density, stemp, escape: array_like of shape (P,)
+            Parameters of the exoplanets in EU (Earth Units), as for
+            score_cdhs.
+        constraint: 'crs' or 'drs', default 'crs'
+            Returns to scale of the CDHPF.
+        replicates: int, default 50
+            Number R of interior and surface swarms per exoplanet, each from
+            its own start. The CDHS of a replicate weighs its CDHSi and
+            CDHSs as score_cdhs does.
+        names: array_like of shape (P,) or None, default None
+            Name of every exoplanet, from which the random stream of its
+            replicates is derived, as for score_cdhs.
+        npart: int, default 25
+            Number of particles of every swarm.
+        confidence: float, default .95
+            Confidence level of the intervals of the mean.
+        seed: int or None, default None
+            Root seed of the replicates. None uses the global numpy.random
+            state.
+        full_output: bool, default False
+            Whether to also return the raw results of every replicate.
+        sampler, workers:
+            see score_cdhs.
+        kwargs:
+            The parameters for conmax_by_pso_batch.
+    Returns:
+        see problems.replicate_problem: the ReplicateStats of the CDHS, of
+        shape (P,), and of the weights (A, B, G, D), of shape (P, 4), and
+        the number of replicates that converged per exoplanet.
+    """
+    radius, density, stemp, escape = (
+        np.asarray(col, dtype=float).ravel()
+        for col in (radius, density, stemp, escape))
+    coeffs = np.stack((np.column_stack((radius, density)),
+                       np.column_stack((escape, stemp))), axis=1)
 
-            cdhs = np.round(cdhs_i*.99 + cdhs_s*.01, 4)
-            results.append((name, habc, A, B, cdhs_i, G, D, cdhs_s, cdhs,
-                            it_i-99, it_s-99))
+    return replicate_problem(
+        'cdhs-' + constraint, coeffs, replicates=replicates,
+        row_weights=(.99, .01), names=names, confidence=confidence,
+        full_output=full_output, npart=npart, workers=workers, seed=seed,
+        stream_key=(('crs', 'drs').index(constraint),), sampler=sampler,
+        **kwargs)
 
-            if verbose:
-                print_results(_+1, total, results[-1])
 
-        if verbose:
-            print('-' * TOTAL_CHAR + '\n')
+def _check_method(method, gendump):
+    """Raise ValueError for a method that does not exist or does not work
+    with gendump."""
+    if method not in ('pso', 'exact'):
+        raise ValueError('invalid method: ' + method)
+    if method == 'exact' and gendump:
+        raise ValueError('gendump is not supported by the exact method')
 
-        fpath = path.join('results', fname.format(constraint))
-        with open(fpath, 'w', newline='') as resfile:
-            csv.writer(resfile).writerows(results)
 
-    if verbose:
-        print('')
+def _planet_outcome(name, habc, solutions, dumps, restart):
+    """Return the 4-tuple (name, values, err, dumps) of one exoplanet from
+    the Solution of its interior and surface swarms and their dumps, see
+    problems.solve_problem, where err is None when both swarms converged.
+    With restart, values end with the number of restarts used."""
+    if len(solutions) < 2:
+        return (name, None, STATUS[len(solutions) + 1], dumps)
+    inner, surface = solutions
+
+    A, B = np.round(inner.gbest, 4)
+    cdhs_i = np.round(inner.score, 4)
+    G, D = np.round(surface.gbest, 4)
+    cdhs_s = np.round(surface.score, 4)
+
+    cdhs = np.round(cdhs_i*.99 + cdhs_s*.01, 4)
+    values = (name, habc, A, B, cdhs_i, G, D, cdhs_s, cdhs,
+              inner.settled, surface.settled)
+    if restart:
+        values += (inner.restarts + surface.restarts,)
+    return (name, values, None, dumps)
+
+
+def _exact_outcomes(names, classes, coeffs, constraint):
+    """Solve the interior and surface scores of every exoplanet in closed
+    form and return the same 4-tuples as _planet_outcome."""
+    nplanet = len(names)
+    gbest = solve_exact(coeffs, constraint)
+    scores = np.round(get_batch_fitness(constraint)(gbest[:, None], coeffs),
+                      4)[:, 0]
+    weights = np.round(gbest, 4)
+
+    outcomes = []
+    for ii, (name, habc) in enumerate(zip(names, classes)):
+        jj = ii + nplanet
+        cdhs = np.round(scores[ii]*.99 + scores[jj]*.01, 4)
+        outcomes.append((name, (name, habc, *weights[ii], scores[ii],
+                                *weights[jj], scores[jj], cdhs, 0, 0),
+                         None, None))
+    return outcomes
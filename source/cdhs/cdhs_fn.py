@@ -1,8 +1,10 @@
 import numpy as np
-from numpy.random import uniform
 
+from ..utils import jit, unit_samples
 
-def initialize_points(npoints, constraint):
+
+def initialize_points(npoints, constraint, rng=None, sampler='random',
+                      nswarms=None):
     """Initialize the points from where the Particle Swarm Optimization
     begins converging for CDHS.
 
@@ -11,27 +13,39 @@ def initialize_points(npoints, constraint):
             Number of points to initialize.
         constraint: 'crs' or 'drs'
             Constraint to satisfy.
+        rng: numpy.random.Generator or None, default None
+            Source of randomness. None uses the global numpy.random state.
+        sampler: 'random', 'sobol' or 'halton', default 'random'
+            How to draw the points, see utils.unit_samples.
+        nswarms: int or None, default None
+            Number of swarms of npoints points to initialize at once, e.g.
+            one per exoplanet for conmax_by_pso_batch.
     Returns:
-        numpy.ndarray of dim (npoints, 2) that satisfy the constraint.
+        numpy.ndarray of dim (npoints, 2), or (nswarms, npoints, 2) if
+        nswarms is given, that satisfy the constraint.
+
+    Notes:
+        The points are mapped from the unit square directly, without
+        rejection. For 'crs', x[0] = 1 - u and x[1] = 1 - x[0]. For 'drs', a
+        point (u, v) outside the triangle u + v < 1 is reflected to
+        (1 - u, 1 - v), which keeps it uniform over the triangle.
     """
     if constraint == 'crs':
-        xvals = uniform(0, 1, (npoints, 1))
-        condn = (xvals == 0)
-        while condn.any():
-            xvals[condn] = uniform(0, 1, xvals[condn].shape)
-            condn = (xvals == 0)
-        points = np.hstack((xvals, 1-xvals))
-
+        ndim = 1
     elif constraint == 'drs':
-        points = uniform(0, 1, (npoints, 2))
-        condn = (points.sum(axis=1) >= 1)
-        while condn.any():
-            points[condn] = uniform(0, 1, points[condn].shape)
-            condn = (points.sum(axis=1) >= 1)
-
+        ndim = 2
     else:
         raise ValueError('invalid constraint: ' + constraint)
 
+    samples = unit_samples(npoints, ndim, rng, sampler, nswarms)
+
+    if constraint == 'crs':
+        xvals = 1 - samples
+        points = np.concatenate((xvals, 1-xvals), axis=-1)
+    else:
+        outside = (samples.sum(axis=-1) >= 1)
+        samples[outside] = 1 - samples[outside]
+        points = samples
     return points
 
 
@@ -49,10 +63,122 @@ def construct_fitness(exo_param1, exo_param2, constraint):
     """
     def cdhpf(points):
         """Return the CDHPF value for each point in the Swarm."""
-        return (exo_param1 ** points.T[0]) * (exo_param1 ** points.T[1])
+        return (exo_param1 ** points.T[0]) * (exo_param2 ** points.T[1])
     return cdhpf
 
 
+def get_point_kernels(constraint, coeffs, err=1e-6, thr=1e-7):
+    """Return the compiled CDHPF of one exoplanet and its constraints for a
+    single point, as conmax_by_pso takes them for fused=, or None if numba
+    is not installed.
+
+    Arguments:
+        constraint: 'crs' or 'drs'
+            Constraint to satisfy.
+        coeffs: array_like of shape (2,)
+            The coefficients for the CDHPF.
+        err, thr: float, default 1e-6 and 1e-7
+            See get_constraint_fn.
+    Returns:
+        tuple (score, coeffs, violation, limits), where score(point, coeffs)
+        is the CDHPF of the point and violation(point, limits) the sum of
+        its row of the constraint matrix.
+    """
+    if constraint == 'crs':
+        violation = jit(_crs_violation)
+    elif constraint == 'drs':
+        violation = jit(_drs_violation)
+    else:
+        raise ValueError('invalid constraint: ' + constraint)
+
+    score = jit(_cdhpf_point)
+    if score is None or violation is None:
+        return None
+    return (score, np.array(coeffs, dtype=float), violation,
+            np.array([err, thr]))
+
+
+def _cdhpf_point(point, coeffs):
+    """Compiled form of the CDHPF for a single point."""
+    return (coeffs[0] ** point[0]) * (coeffs[1] ** point[1])
+
+
+def _crs_violation(point, limits):
+    """Sum of the CRS row of _constraint_matrix of a single point."""
+    err, thr = limits[0], limits[1]
+    x0, x1 = point[0], point[1]
+    violation = max(err - x0, 0.) + max(err + x0 - 1, 0.) + \
+        max(err - x1, 0.) + max(err + x1 - 1, 0.)
+    return violation + max(x0 + x1 - thr - 1, 0.) + \
+        max(1 - thr - x0 - x1, 0.)
+
+
+def _drs_violation(point, limits):
+    """Sum of the DRS row of _constraint_matrix of a single point."""
+    err = limits[0]
+    x0, x1 = point[0], point[1]
+    violation = max(err - x0, 0.) + max(err + x0 - 1, 0.) + \
+        max(err - x1, 0.) + max(err + x1 - 1, 0.)
+    return violation + max(err + x0 + x1 - 1, 0.)
+
+
+def get_batch_fitness(constraint):
+    """Return the CDHS function for a batch of exoplanets. Unlike
+    construct_fitness, the exoplanet parameters are not bound in a closure
+    but passed as an array broadcast against the swarms.
+
+    Arguments:
+        constraint: 'crs' or 'drs'
+            Constraint to satisfy.
+    Returns:
+        function cdhpf(points, coeffs) -> fitness values for each point.
+            points -- ndarray of shape (P, N, 2), a swarm per exoplanet.
+            coeffs -- ndarray of shape (P, 2), the CDHPF coefficients.
+    """
+    if constraint not in ('crs', 'drs'):
+        raise ValueError('invalid constraint: ' + constraint)
+    return _batch_cdhpf
+
+
+def _batch_cdhpf(points, coeffs):
+    """Return the CDHPF value for each point in each Swarm."""
+    coeffs = coeffs[:, None, :]
+    return (coeffs[..., 0] ** points[..., 0]) * \
+        (coeffs[..., 1] ** points[..., 1])
+
+
+def solve_exact(coeffs, constraint, err=1e-6):
+    """Maximize the CDHPF of every exoplanet directly, without a swarm.
+
+    The logarithm of the CDHPF, a*log(p1) + b*log(p2), is linear in the
+    elasticities (a, b), so its maximum over the constraint set lies at a
+    vertex: one of the two ends of the segment a + b = 1 for 'crs', one of
+    the three corners of the triangle a + b <= 1 for 'drs', both shrunk by
+    err as in get_constraint_fn.
+
+    Arguments:
+        coeffs: ndarray of shape (P, 2)
+            The CDHPF coefficients of each exoplanet.
+        constraint: 'crs' or 'drs'
+            Constraint to satisfy.
+        err: float, default 1e-6
+            Acceptable error in converting strict inequality to non-strict.
+    Returns:
+        ndarray of shape (P, 2), the optimal elasticities of each exoplanet.
+    """
+    if constraint == 'crs':
+        vertices = np.array([[1 - err, err], [err, 1 - err]])
+    elif constraint == 'drs':
+        vertices = np.array([[err, err], [1 - 2*err, err], [err, 1 - 2*err]])
+    else:
+        raise ValueError('invalid constraint: ' + constraint)
+
+    coeffs = np.asarray(coeffs, dtype=float)
+    points = np.broadcast_to(vertices, (len(coeffs),) + vertices.shape)
+    best = np.argmax(_batch_cdhpf(points, coeffs), axis=1)
+    return vertices[best]
+
+
 def get_constraint_fn(constraint, err=1e-6, thr=1e-7):
     """Construct the constraint matrix for CDHS.
 
@@ -65,30 +191,53 @@ def get_constraint_fn(constraint, err=1e-6, thr=1e-7):
             Threshold in converting equality constraint to inequality.
     Returns:
         function check_constraints(points) -> constraint matrix
-            points -- darray, each row is a point of size 2.
+            points -- ndarray, each row is a point of size 2. A batch of
+                      swarms of shape (P, N, 2) is evaluated at once.
     """
     if constraint == 'crs':
 
         def check_constraints(points):
             """Return the CRS constraint matrix for the points."""
-            return np.apply_along_axis(lambda x: np.array((
-                    np.max((err - x[0], 0)), np.max((err + x[0] - 1, 0)),
-                    np.max((err - x[1], 0)), np.max((err + x[1] - 1, 0)),
-                    np.max((x[0] + x[1] - thr - 1, 0)),
-                    np.max((1 - thr - x[0] - x[1], 0)),
-                )), axis=1, arr=points)
+            return _constraint_matrix(points, 'crs', err, thr)
 
     elif constraint == 'drs':
 
         def check_constraints(points):
             """Return the DRS constraint matrix for the points."""
-            return np.apply_along_axis(lambda x: np.array((
-                    np.max((err - x[0], 0)), np.max((err + x[0] - 1, 0)),
-                    np.max((err - x[1], 0)), np.max((err + x[1] - 1, 0)),
-                    np.max((err + x[0] + x[1] - 1, 0)),
-                )), axis=1, arr=points)
+            return _constraint_matrix(points, 'drs', err, thr)
 
     else:
         raise ValueError('invalid constraint: ' + constraint)
 
     return check_constraints
+
+
+def _constraint_matrix(points, constraint, err, thr):
+    """Evaluate max(g(x), 0) for every CDHS constraint g in one pass.
+
+    Arguments:
+        points: ndarray of shape (..., 2)
+            A single point, a swarm (N, 2) or a batch of swarms (P, N, 2).
+        constraint: 'crs' or 'drs'
+            Constraint to satisfy.
+        err, thr: float
+            See get_constraint_fn.
+    Returns:
+        ndarray of shape (..., 6) for 'crs' and (..., 5) for 'drs', with the
+        columns in the same order as the original per-row construction.
+    """
+    points = np.asarray(points, dtype=float)
+    x0, x1 = points[..., 0:1], points[..., 1:2]
+
+    # Interleave the bounds as err - x[0], err + x[0] - 1, err - x[1], ...
+    box = np.stack((err - points, err + points - 1), axis=-1)
+    box = box.reshape(points.shape[:-1] + (2 * points.shape[-1],))
+
+    # Same order of operations as the scalar form, so results match exactly.
+    if constraint == 'crs':
+        sums = (x0 + x1 - thr - 1, 1 - thr - x0 - x1)
+    else:
+        sums = (err + x0 + x1 - 1,)
+
+    conmatrix = np.concatenate((box,) + sums, axis=-1)
+    return np.maximum(conmatrix, 0, out=conmatrix)
@@ -0,0 +1,56 @@
+from . import cdhs_fn
+from ..problems import Problem
+
+
+class CDHSProblem(Problem):
+    """Maximization of the CDHPF of one exoplanet, for the interior or the
+    surface CDHS, registered as 'cdhs-crs' and 'cdhs-drs'.
+
+    A point holds the elasticities (a, b) and the coefficients are the two
+    exoplanet parameters they weigh. The fitness, constraints and sampler
+    are those of cdhs_fn.
+
+    Arguments:
+        constraint: 'crs' or 'drs'
+            Constraint to satisfy: a + b = 1 or a + b < 1.
+        err, thr: float, default 1e-6 and 1e-7
+            See cdhs_fn.get_constraint_fn.
+    """
+
+    ndim = 2
+    ncoeffs = 2
+
+    def __init__(self, constraint, err=1e-6, thr=1e-7):
+        if constraint == 'crs':
+            bounds = dict(A_eq=[[1, 1]], b_eq=[1])
+        elif constraint == 'drs':
+            bounds = dict(A_ub=[[1, 1]], b_ub=[1 - err])
+        else:
+            raise ValueError('invalid constraint: ' + constraint)
+
+        super().__init__([err] * 2, [1 - err] * 2, thr=thr, **bounds)
+        self.name = 'cdhs-' + constraint
+        self.constraint = constraint
+        self.err = err
+
+    def fitness(self, points, coeffs):
+        return cdhs_fn.get_batch_fitness(self.constraint)(points, coeffs)
+
+    def bind(self, coeffs, backend='numpy'):
+        return cdhs_fn.construct_fitness(*coeffs, self.constraint)
+
+    def get_constraint_fn(self, backend='numpy'):
+        return cdhs_fn.get_constraint_fn(self.constraint, self.err, self.thr)
+
+    def get_point_kernels(self, coeffs):
+        return cdhs_fn.get_point_kernels(self.constraint, coeffs, self.err,
+                                         self.thr)
+
+    def sample(self, npoints, rng=None, sampler='random', nswarms=None):
+        return cdhs_fn.initialize_points(npoints, self.constraint, rng=rng,
+                                         sampler=sampler, nswarms=nswarms)
+
+    def solve_exact(self, coeffs):
+        """Return the optimal elasticities of every row of coeffs, of shape
+        (P, 2), in closed form, see cdhs_fn.solve_exact."""
+        return cdhs_fn.solve_exact(coeffs, self.constraint, self.err)
@@ -1,4 +1,10 @@
 from .ceesa_fn import construct_fitness
 from .ceesa_fn import get_constraint_fn
+from .ceesa_fn import get_batch_fitness
 from .ceesa_fn import initialize_points
+from .ceesa_fn import get_point_kernels
+from .ceesa_fn import get_repair_fn
 from .ceesa import evaluate_ceesa_values
+from .ceesa import score_ceesa
+from .ceesa import replicate_ceesa
+from .problem import CEESAProblem
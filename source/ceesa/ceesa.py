@@ -1,11 +1,10 @@
-import csv
 import numpy as np
-from os import path, mkdir
+from functools import partial
+from os import path
 
-from .ceesa_fn import construct_fitness
-from .ceesa_fn import get_constraint_fn
-from .ceesa_fn import initialize_points
-from ..pso import conmax_by_pso, SwarmConvergeError
+from ..problems import ERR_TEXT, INTERVAL_HEADERS, REPLICATE_HEADERS
+from ..problems import Table, check_options, evaluate_table
+from ..problems import replicate_problem, solve_problem
 
 
 # Miscellaneous Consts.
@@ -15,38 +14,35 @@ TITLE = '{:25}{:>7}{:>8}{:>8}{:>8}{:>8}{:>8}{:>8}{:>8}{:>10}{:>6}'
 ERROR = '{:25}{:^79}'
 HEADERS = ('Name', 'Cls', 'r', 'd', 't', 'v', 'e',
            'Rho', 'Eta', 'CEESA', 'Iter')
-ERR_TEXT = '** Convergence failed. **'
+COLUMNS = ['Name', 'Habitable', 'Radius', 'Density', 'STemp',
+           'Escape', 'Eccentricity']
 TOTAL_CHAR = 104
-PROGRESS_BAR = '[{:' + str(TOTAL_CHAR - 10) + '}]  ({:>3}%)'
 
+# Layout of the output table.
+TABLE = Table(TITLE, MESSAGE, ERROR, TOTAL_CHAR)
 
-# Print functions.
-def print_header(constraint, headers):
-    """Print the header of the output table."""
-    spaces = (TOTAL_CHAR//2 - len(constraint)//2) * ' '
 
-    print('\n' + spaces + constraint.upper())
-    print(spaces + '-'*len(constraint) + '\n')
-    print(TITLE.format(*headers))
+# Fields of the structured array returned by score_ceesa. Failed exoplanets
+# have NaN values and -1 iterations; eta is 1 under CRS. The score range is
+# NaN unless asked for.
+RESULT_DTYPE = np.dtype([
+    ('r', 'f8'), ('d', 'f8'), ('t', 'f8'), ('v', 'f8'), ('e', 'f8'),
+    ('Rho', 'f8'), ('Eta', 'f8'), ('CEESA', 'f8'),
+    ('Iter', 'i8'), ('Restarts', 'i8'),
+    ('ScoreMin', 'f8'), ('ScoreMax', 'f8'), ('Status', 'i1'),
+])
 
-    print('-' * TOTAL_CHAR)
-
-
-def print_error(name):
-    """Print the error for exoplanet name when convergence fails."""
-    print(ERROR.format(name, ERR_TEXT))
-
-
-def print_results(it, total, values):
-    """Print the results of the estimation for the current planet."""
-    print(MESSAGE.format(*values), end='\n')
-    prog = (it * (TOTAL_CHAR - 10)) // total
-    print(PROGRESS_BAR.format('='*prog, (it*100)//total), end='\r')
+# Message of every Status code: converged or failed.
+STATUS = ('', ERR_TEXT)
 
 
 # Function to evaluate CEESA values.
 def evaluate_ceesa_values(exoplanets, fname='ceesa_{0}.csv', verbose=True,
-                          gendump=False, npart=25, **kwargs):
+                          gendump=False, npart=25, batch=False, workers=1,
+                          seed=None, resume=False, restarts=0,
+                          restart_policy='grow', max_nfev=None,
+                          incremental=False, intervals=False, repair=False,
+                          replicates=0, confidence=.95, **kwargs):
     """Evaluates the CEESA scores of each exoplanet and stores it in the
     indicated file.
 
@@ -63,60 +59,275 @@ def evaluate_ceesa_values(exoplanets, fname='ceesa_{0}.csv', verbose=True,
         verbose: bool, default True
             Whether to print output to stdout.
         gendump: bool, default False
-            Whether to generate dump files of gbest score.
+            Whether to record the gbest score of every iteration. They are
+            appended to the trajectory store temp/ceesa_<constraint>, see
+            utils.TrajectoryStore, keyed by exoplanet name.
+        npart, batch, workers, seed, restarts, restart_policy, max_nfev,
+        intervals, repair, kwargs:
+            How to score the exoplanets, see score_ceesa. With intervals,
+            the files get the ScoreMin and ScoreMax columns of the
+            ceesa_<constraint>_app.csv tables, without any dump.
+        replicates: int, default 0
+            Number of independent swarms per exoplanet whose score
+            statistics, see replicate_ceesa, end the rows as the columns
+            ScoreMean, ScoreStd, ScoreLow and ScoreHigh. None if 0.
+        confidence: float, default .95
+            Confidence level of the ScoreLow to ScoreHigh interval.
+        resume: bool, default False
+            Whether to continue an interrupted run. Exoplanets already written
+            to the result file by a run with the same parameters are skipped.
+            Rows are always written as soon as they are available, along with
+            a checkpoint manifest, see utils.ResultWriter. Once complete,
+            the table is also stored as a columnar dataset, see
+            utils.save_results, with the key of every row, see
+            utils.row_keys.
+        incremental: bool, default False
+            Whether to only score the exoplanets that are new or changed
+            since the last complete run with the same parameters. The rows
+            of the others are carried forward from its dataset, see
+            utils.carry_forward.
+    Returns:
+        dict with the counts of utils.carry_forward by constraint if
+        incremental, else None.
+    """
+    check_options(batch, workers, restarts, gendump, kwargs, replicates)
+
+    headers, restart = HEADERS, None
+    if restarts:
+        headers = HEADERS + ('Restarts',)
+        restart = dict(restarts=restarts, policy=restart_policy,
+                       max_nfev=max_nfev)
+    if intervals:
+        headers = headers + INTERVAL_HEADERS
+    if replicates:
+        headers = headers + REPLICATE_HEADERS
+
+    reports = {} if incremental else None
+    for constraint in ('crs', 'drs'):
+        params = dict(kwargs, score='ceesa', constraint=constraint,
+                      npart=npart, batch=batch, seed=seed, restart=restart)
+        if intervals:
+            params['intervals'] = True
+        if repair:
+            params['repair'] = True
+        if replicates:
+            params['replicates'] = dict(replicates=replicates,
+                                        confidence=confidence)
+        score_fn = partial(
+            score_ceesa, constraint=constraint, npart=npart, batch=batch,
+            workers=workers, seed=seed, restarts=restarts,
+            restart_policy=restart_policy, max_nfev=max_nfev,
+            intervals=intervals, repair=repair, **kwargs)
+        replicate_fn = None
+        if replicates:
+            # One exoplanet at a time, see evaluate_table, in this process
+            # while the workers go on scoring.
+            replicate_fn = partial(
+                replicate_ceesa, constraint=constraint, replicates=replicates,
+                npart=npart, confidence=confidence, seed=seed, repair=repair,
+                **kwargs)
+
+        report = evaluate_table(
+            exoplanets, COLUMNS, headers, params, score_fn,
+            path.join('results', fname.format(constraint)), TABLE,
+            constraint, verbose=verbose,
+            dump=path.join('temp', 'ceesa_' + constraint) if gendump
+            else None, resume=resume, incremental=incremental,
+            replicate_fn=replicate_fn)
+        if incremental:
+            reports[constraint] = report
+
+    if verbose:
+        print('')
+    return reports
+
+
+def score_ceesa(radius, density, stemp, escape, eccentricity,
+                constraint='crs', names=None, classes=None, npart=25,
+                batch=False, workers=1, seed=None, restarts=0,
+                restart_policy='grow', max_nfev=None, intervals=False,
+                repair=False, sampler='random', progress=None, sink=None,
+                store=None, **kwargs):
+    """Estimate the CEESA score of every exoplanet given as columns of its
+    parameters, without any text output.
+
+    Arguments:
+        radius, density, stemp, escape, eccentricity: array_like of shape (P,)
+            Radius, density, surface temperature, escape velocity and
+            eccentricity of the exoplanets in EU (Earth Units).
+        constraint: 'crs' or 'drs', default 'crs'
+            Returns to scale of the CEESA function.
+        names, classes: array_like of shape (P,) or None, default None
+            Name and habitability class of every exoplanet, as used in the
+            rows passed to sink and in the keys of store. Names default to
+            the position in the columns. The random stream of an exoplanet
+            is derived from its name, so scoring a subset gives the same
+            results as scoring the whole catalog.
         npart: int, default 25
             Number of particles.
+        batch: bool, default False
+            Whether to optimize every exoplanet at once with
+            conmax_by_pso_batch instead of one swarm at a time. Dump files are
+            not supported in batch mode.
+        workers: int, default 1
+            Number of processes to split the exoplanets across. Not supported
+            in batch mode.
+        seed: int or None, default None
+            Root seed from which every exoplanet gets an independent random
+            stream. For a given seed the results do not depend on workers.
+            If None and workers is 1, the global numpy.random state is used.
+        restarts: int, default 0
+            Number of times a swarm that does not converge is started over
+            before the exoplanet is given up, see pso.conmax_with_restarts.
+            Not supported in batch mode.
+        restart_policy: 'grow' or 'reseed', default 'grow'
+            Whether to restart with a larger swarm or around the last gbest.
+        max_nfev: int or None, default None
+            Budget of fitness evaluations per exoplanet over all restarts.
+        intervals: bool, default False
+            Whether to keep the range of the score over the last 50
+            iterations up to the one the swarm settled on, see
+            pso.RunningStats, as ScoreMin and ScoreMax, which are also
+            appended to the rows passed to sink.
+        repair: bool, default False
+            Whether to project every particle back onto the constraints
+            after each move, see get_repair_fn, instead of leaving
+            infeasible particles to drift. Most swarms then settle in fewer
+            iterations and fitness evaluations.
+        sampler: 'random', 'sobol' or 'halton', default 'random'
+            How to draw the starting points of the swarms, see
+            ceesa_fn.initialize_points.
+        progress: utils.Progress or None, default None
+            Updated once per exoplanet scored.
+        sink: function or None, default None
+            Called as sink(name, values, err) for every exoplanet as soon as
+            it is scored, in order, where values is its row of results as in
+            the CSV files of evaluate_ceesa_values, or None if it failed with
+            the message err.
+        store: utils.TrajectoryStore or None, default None
+            Where to append the gbest score of every iteration, keyed by
+            exoplanet name.
         kwargs:
-            The parameters for the Swarm.
+            The parameters for the Swarm, including backend='numba' for
+            the compiled kernels of conmax_by_pso and CEESA.
+    Returns:
+        numpy structured array of shape (P,) and dtype RESULT_DTYPE, where
+        Status indexes STATUS.
     """
-    total = len(exoplanets)
+    check_options(batch, workers, restarts, store is not None, kwargs)
+    columns = [np.asarray(col, dtype=float).ravel()
+               for col in (radius, density, stemp, escape, eccentricity)]
 
-    for constraint in ('crs', 'drs'):
-        results = [HEADERS]
-        check = get_constraint_fn(constraint)
+    nplanet = len(columns[0])
+    if names is None:
+        names = np.arange(nplanet).astype(str)
+    if classes is None:
+        classes = np.full(nplanet, '')
 
-        if verbose:
-            print_header(constraint, results[-1])
+    result = np.zeros(nplanet, dtype=RESULT_DTYPE)
+    if nplanet == 0:
+        return result
 
-        for _, row in exoplanets.iterrows():
-            name = row['Name']
-            habc = row['Habitable']
-            info = row[['Radius', 'Density', 'STemp',
-                        'Escape', 'Eccentricity']]
+    cidx = ('crs', 'drs').index(constraint)
+    solved = solve_problem(
+        'ceesa-' + constraint, np.column_stack(columns), names=names,
+        keys=[[name] for name in names], npart=npart, batch=batch,
+        workers=workers, seed=seed, stream_key=(cidx,), restarts=restarts,
+        restart_policy=restart_policy, max_nfev=max_nfev, sampler=sampler,
+        repair=repair, intervals=intervals, gendump=store is not None,
+        **kwargs)
+    restart = bool(restarts)
+    outcomes = ((name, _planet_values(name, habc, solutions, constraint,
+                                      restart, intervals), dumps)
+                for name, habc, (solutions, dumps)
+                in zip(names, classes, solved))
 
-            ceesa = construct_fitness(*info, constraint)
-            start = initialize_points(npart, constraint)
+    for ii, (name, values, dumps) in enumerate(outcomes):
+        for key, trajectory in (dumps or {}).items():
+            store.append(key, trajectory)
 
-            if gendump:
-                dumpdir = path.join('temp', constraint)
-                if not path.isdir(dumpdir):
-                    mkdir(dumpdir)
+        if values is not None:
+            result[ii] = (*values[2:11], values[11] if restart else 0,
+                          *(values[-2:] if intervals else [np.nan] * 2), 0)
+        else:
+            result[ii] = (*[np.nan] * 8, -1, -1, np.nan, np.nan, 1)
 
-                kwargs['dumpfile'] = path.join(
-                    dumpdir, '{0}-{1}.txt'.format(name, constraint))
-            try:
-                gbest, it = conmax_by_pso(ceesa, start, check, **kwargs)
+        if sink is not None:
+            sink(name, values, None if values is not None else ERR_TEXT)
+        if progress is not None:
+            progress.update()
 
-            except SwarmConvergeError:
-                print_error(name)
-                continue
+    return result
 
-            score = np.round(ceesa(gbest), 4)
-            if constraint == 'crs':
-                results.append([name, habc, *np.round(gbest, 4), 1,
-                                score, it-99])
-            else:
-                results.append([name, habc, *np.round(gbest, 4), score, it-99])
 
-            if verbose:
-                print_results(_+1, total, results[-1])
+def replicate_ceesa(radius, density, stemp, escape, eccentricity,
+                    constraint='crs', replicates=50, names=None, npart=25,
+                    confidence=.95, seed=None, full_output=False,
+                    repair=False, sampler='random', workers=1, **kwargs):
+    """Estimate the CEESA score of every exoplanet with R independent swarms
+    and return the spread of their results, see problems.replicate_problem.
 
-        if verbose:
-            print('-' * TOTAL_CHAR + '\n')
+    Arguments:
+        radius, density, stemp, escape, eccentricity: array_like of shape (P,)
+            Parameters of the exoplanets in EU (Earth Units), as for
+            score_ceesa.
+        constraint: 'crs' or 'drs', default 'crs'
+            Returns to scale of the CEESA function.
+        replicates: int, default 50
+            Number R of swarms per exoplanet, each from its own start.
+        names: array_like of shape (P,) or None, default None
+            Name of every exoplanet, from which the random stream of its
+            replicates is derived, as for score_ceesa.
+        npart: int, default 25
+            Number of particles of every swarm.
+        confidence: float, default .95
+            Confidence level of the intervals of the mean.
+        seed: int or None, default None
+            Root seed of the replicates. None uses the global numpy.random
+            state.
+        full_output: bool, default False
+            Whether to also return the raw results of every replicate.
+        repair, sampler, workers:
+            see score_ceesa.
+        kwargs:
+            The parameters for conmax_by_pso_batch.
+    Returns:
+        see problems.replicate_problem: the ReplicateStats of the score, of
+        shape (P,), and of the weights (r, d, t, v, e, rho[, eta]), of shape
+        (P, 6) for crs or (P, 7) for drs, and the number of replicates that
+        converged per exoplanet.
+    """
+    coeffs = np.column_stack([
+        np.asarray(col, dtype=float).ravel()
+        for col in (radius, density, stemp, escape, eccentricity)])
 
-        fpath = path.join('results', fname.format(constraint))
-        with open(fpath, 'w', newline='') as resfile:
-            csv.writer(resfile).writerows(results)
+    return replicate_problem(
+        'ceesa-' + constraint, coeffs, replicates=replicates, names=names,
+        confidence=confidence, full_output=full_output, npart=npart,
+        workers=workers, seed=seed,
+        stream_key=(('crs', 'drs').index(constraint),), sampler=sampler,
+        repair=repair, **kwargs)
 
-    if verbose:
-        print('')
+
+def _result_row(name, habc, gbest, score, it, constraint):
+    """Return the row of results written for one exoplanet, where it is the
+    iteration at which the swarm settled."""
+    if constraint == 'crs':
+        return [name, habc, *np.round(gbest, 4), 1, score, it]
+    return [name, habc, *np.round(gbest, 4), score, it]
+
+
+def _planet_values(name, habc, solutions, constraint, restart, intervals):
+    """Return the row of results of one exoplanet from the Solution of its
+    swarm, see problems.solve_problem, or None if it did not converge."""
+    if not solutions:
+        return None
+    sol = solutions[0]
+
+    values = _result_row(name, habc, sol.gbest, np.round(sol.score, 4),
+                         sol.settled, constraint)
+    if restart:
+        values.append(sol.restarts)
+    if intervals:
+        values.extend([sol.score_min, sol.score_max])
+    return values
@@ -1,9 +1,11 @@
 import numpy as np
-from numpy.random import uniform
 import warnings
 
+from ..utils import get_kernel, jit, unit_samples
 
-def initialize_points(npoints, constraint):
+
+def initialize_points(npoints, constraint, rng=None, sampler='random',
+                      nswarms=None):
     """Initialize the points from where the Particle Swarm Optimization
     begins converging for CEESA.
 
@@ -12,10 +14,24 @@ def initialize_points(npoints, constraint):
             Number of points to initialize.
         constraint: 'crs' or 'drs'
             Constraint to satisfy.
+        rng: numpy.random.Generator or None, default None
+            Source of randomness. None uses the global numpy.random state.
+        sampler: 'random', 'sobol' or 'halton', default 'random'
+            How to draw the points, see utils.unit_samples.
+        nswarms: int or None, default None
+            Number of swarms of npoints points to initialize at once, e.g.
+            one per exoplanet for conmax_by_pso_batch.
 
     Returns:
         numpy.ndarray of dim (npoints, 6) for 'crs' and (npoints, 7) for 'drs'
-        that satisfy the respective constraint.
+        that satisfy the respective constraint, or (nswarms, npoints, D) if
+        nswarms is given.
+
+    Notes:
+        The points are mapped from the unit hypercube directly, without
+        rejection. The elasticities x[0:5] are -log(1 - u) normalized to sum
+        to 1, which is Dirichlet(1, ..., 1), uniform over the simplex. rho
+        and eta are 1 - u, in (0, 1].
     """
     if constraint == 'crs':
         ndim = 6
@@ -24,18 +40,16 @@ def initialize_points(npoints, constraint):
     else:
         raise ValueError('invalid constraint: ' + constraint)
 
-    points = uniform(0, 1, (npoints, ndim))
-    condn = (points == 0)
-    while condn.any():
-        points[condn] = uniform(0, 1, points[condn].shape)
-        condn = (points == 0)
+    points = 1 - unit_samples(npoints, ndim, rng, sampler, nswarms)
 
-    #  Normalize the first 5 columns of each row.
-    points.T[:5] /= np.sum(points.T[:5], axis=0)
+    #  Normalize the exponential spacings of the first 5 columns.
+    elast = -np.log(points[..., :5])
+    points[..., :5] = elast / elast.sum(axis=-1, keepdims=True)
     return points
 
 
-def construct_fitness(ep0, ep1, ep2, ep3, ep4, constraint):
+def construct_fitness(ep0, ep1, ep2, ep3, ep4, constraint,
+                      backend='numpy'):
     """Construct the CEESA function for the given exoplanet parameters.
 
     Arguments:
@@ -43,6 +57,10 @@ def construct_fitness(ep0, ep1, ep2, ep3, ep4, constraint):
             The coefficients for CEESA.
         constraint: 'crs' or 'drs'
             Constraint to satisfy.
+        backend: 'numpy' or 'numba', default 'numpy'
+            'numba' evaluates the swarm in one compiled loop, see
+            _ceesa_kernel. Results agree with numpy up to the rounding of
+            the power function.
 
     Returns:
         function ceesa(points) -> fitness values for each point.
@@ -54,8 +72,18 @@ def construct_fitness(ep0, ep1, ep2, ep3, ep4, constraint):
                         sum({5,N}, axis=0) => {N,} ** {N,}
     """
     coeff = np.array((ep0, ep1, ep2, ep3, ep4), ndmin=2).T
+    kernel = get_kernel(_ceesa_kernel, backend)
 
-    if constraint == 'crs':
+    if constraint in ('crs', 'drs') and kernel is not None:
+        coeff, drs = coeff[:, 0].copy(), (constraint == 'drs')
+
+        def ceesa(points):
+            """Return the CEESA score for each point in the Swarm."""
+            points = np.asarray(points, dtype=float)
+            s = kernel(points.reshape(-1, points.shape[-1]), coeff, drs)
+            return s if s.size > 1 else s[0]
+
+    elif constraint == 'crs':
 
         def ceesa(points):
             """Return the CRS-CEESA score for each point in the Swarm."""
@@ -78,7 +106,125 @@ def construct_fitness(ep0, ep1, ep2, ep3, ep4, constraint):
     return ceesa
 
 
-def get_constraint_fn(constraint, err=1e-6, thr=1e-7):
+def _ceesa_kernel(points, coeff, drs):
+    """Compiled form of the CEESA closures, for a swarm of shape (N, D)."""
+    npoints = points.shape[0]
+    scores = np.empty(npoints)
+    for ii in range(npoints):
+        rho = points[ii, 5]
+        total = 0.
+        for kk in range(5):
+            total += points[ii, kk] * coeff[kk] ** rho
+        if drs:
+            scores[ii] = total ** (points[ii, 6] / rho)
+        else:
+            scores[ii] = total ** (1 / rho)
+    return scores
+
+
+def get_point_kernels(constraint, coeffs, err=1e-6, thr=1e-7):
+    """Return the compiled CEESA of one exoplanet and its constraints for a
+    single point, as conmax_by_pso takes them for fused=, or None if numba
+    is not installed.
+
+    Arguments:
+        constraint: 'crs' or 'drs'
+            Constraint to satisfy.
+        coeffs: array_like of shape (5,)
+            The coefficients for CEESA.
+        err, thr: float, default 1e-6 and 1e-7
+            See get_constraint_fn.
+
+    Returns:
+        tuple (score, coeffs, violation, limits), where score(point, coeffs)
+        is the CEESA of the point and violation(point, limits) the sum of
+        its row of the constraint matrix.
+    """
+    if constraint not in ('crs', 'drs'):
+        raise ValueError('invalid constraint: ' + constraint)
+    score, violation = jit(_ceesa_point), jit(_violation_point)
+    if score is None or violation is None:
+        return None
+    return (score, np.array(coeffs, dtype=float), violation,
+            np.array([err, thr]))
+
+
+def _ceesa_point(point, coeff):
+    """Compiled form of the CEESA closures for a single point, under CRS for
+    6 coordinates and under DRS for 7."""
+    rho = point[5]
+    total = 0.
+    for kk in range(5):
+        total += point[kk] * coeff[kk] ** rho
+    if point.shape[0] > 6:
+        return total ** (point[6] / rho)
+    return total ** (1 / rho)
+
+
+def _violation_point(point, limits):
+    """Sum of the row of _constraint_matrix of a single point, under CRS for
+    6 coordinates and under DRS for 7."""
+    err, thr = limits[0], limits[1]
+    total, violation = 0., 0.
+    for kk in range(5):
+        total += point[kk]
+        violation += max(-point[kk], 0.) + max(point[kk] - 1, 0.)
+
+    rho = point[5]
+    violation += max(err - rho, 0.) + max(rho - 1, 0.)
+    if point.shape[0] > 6:
+        eta = point[6]
+        violation += max(err - eta, 0.) + max(eta - 1 + err, 0.)
+    return violation + max(total - 1 - thr, 0.) + max(1 - thr - total, 0.)
+
+
+def get_batch_fitness(constraint):
+    """Return the CEESA function for a batch of exoplanets. Unlike
+    construct_fitness, the exoplanet parameters are not bound in a closure
+    but passed as an array broadcast against the swarms.
+
+    Arguments:
+        constraint: 'crs' or 'drs'
+            Constraint to satisfy.
+
+    Returns:
+        function ceesa(points, coeffs) -> fitness values for each point.
+            points -- ndarray of shape (P, N, 6) for crs or (P, N, 7) for drs.
+            coeffs -- ndarray of shape (P, 5), the CEESA coefficients.
+
+    Notes:
+        Broadcasting is done as follows,
+                ({P,N,5} * ({P,1,5} ** {P,N,1})) => {P,N,5}
+                          sum({P,N,5}, axis=2) => {P,N} ** {P,N}
+    """
+    if constraint == 'crs':
+        return _batch_ceesa_crs
+    elif constraint == 'drs':
+        return _batch_ceesa_drs
+    else:
+        raise ValueError('invalid constraint: ' + constraint)
+
+
+def _batch_ceesa_crs(points, coeffs):
+    """Return the CRS-CEESA score for each point in each Swarm."""
+    with np.errstate(all='ignore'):
+        return _batch_ceesa_sum(points, coeffs) ** (1 / points[..., 5])
+
+
+def _batch_ceesa_drs(points, coeffs):
+    """Return the DRS-CEESA score for each point in each Swarm."""
+    with np.errstate(all='ignore'):
+        return _batch_ceesa_sum(points, coeffs) ** \
+            (points[..., 6] / points[..., 5])
+
+
+def _batch_ceesa_sum(points, coeffs):
+    """Return the inner sum of CEESA, sum(x[i] * ep[i] ** rho)."""
+    return (points[..., :5] *
+            (coeffs[:, None, :] ** points[..., 5, None])).sum(axis=2)
+
+
+def get_constraint_fn(constraint, err=1e-6, thr=1e-7, backend='numpy'):
     """Construct the constraint matrix for CEESA for given constraint type.
 
     Arguments:
@@ -88,6 +234,9 @@ def get_constraint_fn(constraint, err=1e-6, thr=1e-7):
             Acceptable error in converting strict inequality to non-strict.
         thr: float, default 1e-7
             Threshold in converting equality constraint to inequality.
+        backend: 'numpy' or 'numba', default 'numpy'
+            'numba' builds the matrix of a swarm (N, D) in one compiled loop,
+            see _constraint_kernel, with the same results.
 
     Returns:
         function check_constraints(points) -> constraint matrix
@@ -118,39 +267,148 @@ def get_constraint_fn(constraint, err=1e-6, thr=1e-7):
             5a. sum(x[i]) <= 1 + del;   g(x[i]) = sum(x[i]) - 1 - del;
             5b. sum(x[i]) >= 1 - del;   g(x[i]) = 1 - del - sum(x[i]);
 
-        These arrays are concatenated and then horizontally stacked with a
-        column vector of 0s. The max of every row corresponds to max(gi(x), 0)
-        and is used to construct the constraint vector.
+        These arrays are concatenated along the last axis and clipped at 0,
+        so that every entry corresponds to max(gi(x), 0). The whole swarm, or
+        a stacked batch of swarms of shape (P, N, D), is evaluated at once.
 
     """
-    if constraint == 'crs':
+    kernel = get_kernel(_constraint_kernel, backend)
+
+    if constraint in ('crs', 'drs') and kernel is not None:
+        drs = (constraint == 'drs')
+
+        def check_constraints(points):
+            """Return the constraint matrix for the points."""
+            points = np.asarray(points, dtype=float)
+            if points.ndim != 2:
+                return _constraint_matrix(points, constraint, err, thr)
+            return kernel(points, drs, err, thr)
+
+    elif constraint == 'crs':
 
         def check_constraints(points):
             """Return the CRS constraint matrix for the points."""
-            return np.apply_along_axis(lambda x: np.max(
-                np.hstack((np.concatenate((
-                    -x[:5], x[:5] - 1,                      # 0 < x[i] < 1
-                    np.array((err - x[5], x[5] - 1,)),      # 0 < rho <= 1
-                    np.array((np.sum(x[:5]) - 1 - thr,      # sum(x) <= 1 + del
-                              1 - thr - np.sum(x[:5]))),    # sum(x) >= 1 - del
-                ))[:, None], np.zeros((14, 1))
-                )), axis=1), axis=1, arr=points)
+            return _constraint_matrix(points, 'crs', err, thr)
 
     elif constraint == 'drs':
 
         def check_constraints(points):
             """Return the DRS constraint matrix for the points."""
-            return np.apply_along_axis(lambda x: np.max(
-                np.hstack((np.concatenate((
-                    -x[:5], x[:5] - 1,                      # 0 < x[i] < 1
-                    err - x[5:],                            # 0 < rho, 0 < eta
-                    np.array((x[5] - 1, x[6] - 1 + err)),   # rho <= 1, eta < 1
-                    np.array((np.sum(x[:5]) - 1 - thr,      # sum(x) >= 1 + del
-                              1 - thr - np.sum(x[:5]))),    # sum(x) <= 1 - del
-                ))[:, None], np.zeros((16, 1))
-                )), axis=1), axis=1, arr=points)
+            return _constraint_matrix(points, 'drs', err, thr)
 
     else:
         raise ValueError('invalid constraint: ' + constraint)
 
     return check_constraints
+
+
+def get_repair_fn(constraint, err=1e-6):
+    """Construct the repair operator for CEESA swarms, which moves every
+    point onto the nearest point satisfying the constraints of
+    get_constraint_fn, so that no move of the swarm is wasted on an
+    infeasible position.
+
+    Arguments:
+        constraint: 'crs' or 'drs'
+            Constraint to satisfy.
+        err: float, default 1e-6
+            Acceptable error in converting strict inequality to non-strict,
+            as in get_constraint_fn.
+
+    Returns:
+        function repair(points) -> points, repairing points in place.
+            points -- ndarray of shape (N, D) or (P, N, D).
+
+    Note:
+        The elasticities x[0:5] are replaced by their Euclidean projection
+        onto the simplex sum(x[i]) = 1, x[i] >= 0, found by sorting, see
+        _project_simplex. rho is clipped to [err, 1] and, for 'drs', eta to
+        [err, 1 - err].
+    """
+    if constraint not in ('crs', 'drs'):
+        raise ValueError('invalid constraint: ' + constraint)
+    drs = (constraint == 'drs')
+
+    def repair(points):
+        """Project the points onto the feasible set, in place."""
+        points[..., :5] = _project_simplex(points[..., :5])
+        np.clip(points[..., 5], err, 1, out=points[..., 5])
+        if drs:
+            np.clip(points[..., 6], err, 1 - err, out=points[..., 6])
+        return points
+
+    return repair
+
+
+def _project_simplex(values):
+    """Return the Euclidean projection of every row of values onto the unit
+    simplex, max(values - theta, 0), where theta is found from the values
+    sorted in decreasing order (Duchi et al., 2008)."""
+    ordered = -np.sort(-values, axis=-1)
+    excess = np.cumsum(ordered, axis=-1) - 1
+    rank = np.arange(1, values.shape[-1] + 1)
+    support = np.sum(ordered * rank > excess, axis=-1, keepdims=True)
+    theta = np.take_along_axis(excess, support - 1, axis=-1) / support
+    return np.maximum(values - theta, 0)
+
+
+def _constraint_matrix(points, constraint, err, thr):
+    """Evaluate max(g(x), 0) for every CEESA constraint g in one pass.
+
+    Arguments:
+        points: ndarray of shape (..., 6) for 'crs' or (..., 7) for 'drs'
+            A single point, a swarm (N, D) or a batch of swarms (P, N, D).
+        constraint: 'crs' or 'drs'
+            Constraint to satisfy.
+        err, thr: float
+            See get_constraint_fn.
+    Returns:
+        ndarray of shape (..., 14) for 'crs' and (..., 16) for 'drs', with
+        the columns in the same order as listed in get_constraint_fn.
+    """
+    points = np.asarray(points, dtype=float)
+    elast = points[..., :5]
+    total = elast.sum(axis=-1, keepdims=True)
+
+    if constraint == 'crs':
+        rho = points[..., 5:6]
+        bounds = (err - rho, rho - 1)                   # 0 < rho <= 1
+    else:
+        rho, eta = points[..., 5:6], points[..., 6:7]
+        bounds = (err - points[..., 5:7],               # 0 < rho, 0 < eta
+                  rho - 1, eta - 1 + err)               # rho <= 1, eta < 1
+
+    conmatrix = np.concatenate((
+        -elast, elast - 1,                              # 0 < x[i] < 1
+        *bounds,
+        total - 1 - thr,                                # sum(x) <= 1 + del
+        1 - thr - total,                                # sum(x) >= 1 - del
+    ), axis=-1)
+    return np.maximum(conmatrix, 0, out=conmatrix)
+
+
+def _constraint_kernel(points, drs, err, thr):
+    """Compiled form of _constraint_matrix, for a swarm of shape (N, D)."""
+    npoints = points.shape[0]
+    conmatrix = np.zeros((npoints, 16 if drs else 14))
+    for ii in range(npoints):
+        total = 0.
+        for kk in range(5):
+            elast = points[ii, kk]
+            total += elast
+            conmatrix[ii, kk] = max(-elast, 0.)
+            conmatrix[ii, kk + 5] = max(elast - 1, 0.)
+
+        rho = points[ii, 5]
+        if drs:
+            eta = points[ii, 6]
+            bounds = (err - rho, err - eta, rho - 1, eta - 1 + err)
+        else:
+            bounds = (err - rho, rho - 1, 0., 0.)
+        nbound = 4 if drs else 2
+        for kk in range(nbound):
+            conmatrix[ii, 10 + kk] = max(bounds[kk], 0.)
+
+        conmatrix[ii, 10 + nbound] = max(total - 1 - thr, 0.)
+        conmatrix[ii, 11 + nbound] = max(1 - thr - total, 0.)
+    return conmatrix
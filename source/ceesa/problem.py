@@ -0,0 +1,59 @@
+from . import ceesa_fn
+from ..problems import Problem
+
+
+class CEESAProblem(Problem):
+    """Maximization of the CEESA of one exoplanet, registered as 'ceesa-crs'
+    and 'ceesa-drs'.
+
+    A point holds the five elasticities, rho and, under DRS, eta, and the
+    coefficients are the five exoplanet parameters. The fitness, with its
+    compiled form, constraints, sampler and repair are those of ceesa_fn.
+
+    Arguments:
+        constraint: 'crs' or 'drs'
+            Returns to scale of the CEESA function.
+        err, thr: float, default 1e-6 and 1e-7
+            See ceesa_fn.get_constraint_fn.
+    """
+
+    ncoeffs = 5
+
+    def __init__(self, constraint, err=1e-6, thr=1e-7):
+        if constraint == 'crs':
+            self.ndim = 6
+            lower, upper = [0] * 5 + [err], [1] * 6
+        elif constraint == 'drs':
+            self.ndim = 7
+            lower, upper = [0] * 5 + [err] * 2, [1] * 6 + [1 - err]
+        else:
+            raise ValueError('invalid constraint: ' + constraint)
+
+        elasticities = [1] * 5 + [0] * (self.ndim - 5)
+        super().__init__(lower, upper, A_eq=[elasticities], b_eq=[1],
+                         thr=thr)
+        self.name = 'ceesa-' + constraint
+        self.constraint = constraint
+        self.err = err
+
+    def fitness(self, points, coeffs):
+        return ceesa_fn.get_batch_fitness(self.constraint)(points, coeffs)
+
+    def bind(self, coeffs, backend='numpy'):
+        return ceesa_fn.construct_fitness(*coeffs, self.constraint,
+                                          backend=backend)
+
+    def get_constraint_fn(self, backend='numpy'):
+        return ceesa_fn.get_constraint_fn(self.constraint, self.err,
+                                          self.thr, backend=backend)
+
+    def get_point_kernels(self, coeffs):
+        return ceesa_fn.get_point_kernels(self.constraint, coeffs, self.err,
+                                          self.thr)
+
+    def sample(self, npoints, rng=None, sampler='random', nswarms=None):
+        return ceesa_fn.initialize_points(npoints, self.constraint, rng=rng,
+                                          sampler=sampler, nswarms=nswarms)
+
+    def get_repair_fn(self):
+        return ceesa_fn.get_repair_fn(self.constraint, self.err)
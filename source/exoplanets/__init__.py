@@ -1 +0,0 @@
-from .load_data import exoplanets
@@ -0,0 +1,6 @@
+from .problem import Problem, PROBLEMS, get_problem, register_problem
+from .engine import Solution, solve_problem, solve_planet, score_problem
+from .engine import replicate_problem, replicate_planet
+from .engine import ERR_TEXT, INTERVAL_HEADERS, REPLICATE_HEADERS
+from .engine import check_options
+from .evaluate import Table, evaluate_table, evaluate_values
@@ -0,0 +1,430 @@
+from collections import namedtuple
+from functools import partial
+
+import numpy as np
+
+from .problem import get_problem
+from ..pso import conmax_by_pso, conmax_by_pso_batch, SwarmConvergeError
+from ..pso import conmax_with_restarts, get_workspace, RunningStats
+from ..pso import summarize
+from ..utils import map_planets, planet_streams
+
+
+# Result of one swarm, as yielded by solve_problem.
+Solution = namedtuple('Solution', [
+    'gbest',              # the global best the swarm converged to
+    'score',              # its fitness
+    'settled',            # iteration from which gbest no longer moved
+    'restarts',           # restarts used, see conmax_with_restarts
+    'score_min',          # range of the score before the swarm settled,
+    'score_max',          # see RunningStats; NaN unless asked for
+])
+
+# Fields of the structured array returned by score_problem, but for the
+# gbest, which has one column per dimension. Failed exoplanets have NaN
+# values and -1 iterations.
+RESULT_FIELDS = [
+    ('Score', 'f8'), ('Iter', 'i8'), ('Restarts', 'i8'),
+    ('ScoreMin', 'f8'), ('ScoreMax', 'f8'), ('Status', 'i1'),
+]
+
+# Headers of the range of the score appended to rows with intervals.
+INTERVAL_HEADERS = ('ScoreMin', 'ScoreMax')
+
+# Headers of the statistics of the score appended to rows with replicates:
+# its mean and standard deviation over the replicates and the confidence
+# interval of the mean, see replicate_problem.
+REPLICATE_HEADERS = ('ScoreMean', 'ScoreStd', 'ScoreLow', 'ScoreHigh')
+
+# Message of the rows of exoplanets whose swarm did not converge.
+ERR_TEXT = '** Convergence failed. **'
+
+
+def check_options(batch, workers, restarts, gendump, kwargs, replicates=0):
+    """Raise ValueError for options of solve_problem and replicate_problem
+    that do not work together, where kwargs are the parameters for the
+    Swarm."""
+    if batch and gendump:
+        raise ValueError('gendump is not supported in batch mode')
+    if batch and workers > 1:
+        raise ValueError('workers is not supported in batch mode')
+    if batch and restarts:
+        raise ValueError('restarts is not supported in batch mode')
+    if batch and kwargs.get('backend', 'numpy') != 'numpy':
+        raise ValueError('backend is not supported in batch mode')
+    if replicates and kwargs.get('backend', 'numpy') != 'numpy':
+        raise ValueError('backend is not supported by replicates')
+
+
+def solve_problem(problem, coeffs, names=None, keys=None, npart=25,
+                  batch=False, workers=1, seed=None, stream_key=(),
+                  restarts=0, restart_policy='grow', max_nfev=None,
+                  sampler='random', repair=False, intervals=False,
+                  gendump=False, **kwargs):
+    """Maximize the fitness of problem for every exoplanet and return an
+    iterator over the outcome of each, in order, yielded as soon as it is
+    available.
+
+    An exoplanet may hold several rows of coefficients, e.g. the interior
+    and surface CDHS, which are solved in turn from its random stream; a
+    row whose swarm does not converge ends the exoplanet.
+
+    Arguments:
+        problem: str or Problem
+            The problem, or its name, see get_problem.
+        coeffs: array_like of shape (P, K) or (P, R, K)
+            The coefficients of every exoplanet, or of its R rows.
+        names: array_like of shape (P,) or None, default None
+            Name of every exoplanet, from which its random stream is
+            derived, see utils.planet_streams; defaults to the position in
+            coeffs. An exoplanet then gets the same results whatever else
+            is solved with it.
+        keys: list of P lists of R str or None, default None
+            Trajectory key of every row, under which its gbest scores are
+            dumped if gendump is set. Defaults to the name.
+        npart: int, default 25
+            Number of particles.
+        batch: bool, default False
+            Whether to optimize every row at once with conmax_by_pso_batch,
+            all first rows first. Workers, restarts, dumps and backends are
+            not supported.
+        workers: int, default 1
+            Number of processes to split the exoplanets across, see
+            utils.map_planets.
+        seed: int or None, default None
+            Root seed from which every exoplanet gets an independent random
+            stream, see utils.planet_streams. If None and workers is 1, the
+            global numpy.random state is used. In batch mode the swarms
+            share one stream, so an exoplanet's results depend on the
+            batch.
+        stream_key: tuple of int, default ()
+            Prefix of the streams, e.g. one per constraint.
+        restarts, restart_policy, max_nfev:
+            Restarts of the swarms that do not converge, see
+            pso.conmax_with_restarts. No restarts if restarts is 0.
+            max_nfev is the budget of every exoplanet: its rows draw on it
+            in turn, each getting what the ones before left over.
+        sampler: 'random', 'sobol' or 'halton', default 'random'
+            How to draw the starting points, see Problem.sample.
+        repair: bool, default False
+            Whether to project the particles onto the feasible set after
+            every move, see Problem.get_repair_fn.
+        intervals: bool, default False
+            Whether to keep the range of the score, see pso.RunningStats.
+        gendump: bool, default False
+            Whether to record the gbest score of every iteration.
+        kwargs:
+            The parameters for the Swarm.
+    Returns:
+        iterator over a 2-tuple (solutions, dumps) per exoplanet, where
+        solutions is the list of the Solution of every row solved, shorter
+        than R if a swarm did not converge, and dumps maps the key of every
+        row to its gbest scores if gendump is set, else None.
+    """
+    problem = get_problem(problem)
+    if repair and problem.get_repair_fn() is None:
+        raise ValueError('{} has no repair'.format(problem))
+    check_options(batch, workers, restarts, gendump, kwargs)
+
+    coeffs = np.asarray(coeffs, dtype=float)
+    if coeffs.ndim == 2:
+        coeffs = coeffs[:, None]
+    nplanet, nrow = coeffs.shape[:2]
+    if nplanet == 0:
+        return iter(())
+
+    options = dict(npart=npart, sampler=sampler, repair=repair,
+                   intervals=intervals, kwargs=kwargs)
+    if batch:
+        rng = None
+        if seed is not None:
+            rng = np.random.default_rng(
+                np.random.SeedSequence(seed, spawn_key=tuple(stream_key)))
+        return _solve_batch(problem, coeffs, rng=rng, **options)
+
+    if names is None:
+        names = np.arange(nplanet).astype(str)
+    if keys is None:
+        keys = [[str(name)] * nrow for name in names]
+
+    restart = None
+    if restarts:
+        restart = dict(restarts=restarts, policy=restart_policy,
+                       max_nfev=max_nfev)
+
+    streams = None
+    if seed is not None or workers > 1:
+        streams = planet_streams(seed, names, key=stream_key)
+
+    return map_planets(
+        solve_planet, list(zip(coeffs, keys)), streams, workers,
+        problem=problem, gendump=gendump, restart=restart, **options)
+
+
+def solve_planet(record, rng, problem, npart, gendump, kwargs, restart=None,
+                 sampler='random', repair=False, intervals=False):
+    """Solve the rows of one exoplanet in turn, where record holds their
+    coefficients and trajectory keys, and return the outcome yielded by
+    solve_problem. If restart holds the options of conmax_with_restarts, a
+    failed swarm is started over, and the rows share its max_nfev budget.
+    Without restarts, every swarm reuses the workspace of this process."""
+    rows, keys = record
+    problem = get_problem(problem)
+    backend = kwargs.get('backend', 'numpy')
+    check = problem.get_constraint_fn(backend)
+    kwargs = dict(kwargs)
+    if restart is not None:
+        restart = dict(restart)
+
+    dumps = {} if gendump else None
+    if intervals:
+        kwargs['stats'] = RunningStats()
+    if repair:
+        kwargs['repair'] = problem.get_repair_fn()
+
+    solutions = []
+    for row, key in zip(rows, keys):
+        fitness = problem.bind(row, backend)
+        if backend == 'numba':
+            kwargs['fused'] = problem.get_point_kernels(row)
+        if gendump:
+            kwargs['dumpfile'] = partial(dumps.__setitem__, key)
+
+        try:
+            if restart is None:
+                start = problem.sample(npart, rng=rng, sampler=sampler)
+                gbest, _, run = conmax_by_pso(
+                    fitness, start, check, rng=rng, full_output=True,
+                    workspace=get_workspace(*start.shape), **kwargs)
+            else:
+                init = partial(problem.sample, sampler=sampler)
+                gbest, _, run = conmax_with_restarts(
+                    fitness, init, check, npart, rng=rng, full_output=True,
+                    **restart, **kwargs)
+                if restart['max_nfev'] is not None:
+                    restart['max_nfev'] -= run['nfev']
+        except SwarmConvergeError:
+            break
+
+        solutions.append(Solution(
+            gbest, fitness(gbest), run['settled'], run.get('restarts', 0),
+            run.get('score_min', np.nan), run.get('score_max', np.nan)))
+    return (solutions, dumps)
+
+
+def _solve_batch(problem, coeffs, npart, rng, sampler, repair, intervals,
+                 kwargs):
+    """Optimize every row of every exoplanet as one batch of swarms and
+    yield the same outcomes as solve_planet."""
+    nplanet, nrow = coeffs.shape[:2]
+    stacked = coeffs.transpose(1, 0, 2).reshape(nrow * nplanet, -1)
+
+    start = problem.sample(npart, rng=rng, sampler=sampler,
+                           nswarms=len(stacked))
+    stats = RunningStats() if intervals else None
+    gbest, _, converged, info = conmax_by_pso_batch(
+        problem.fitness, stacked, start, problem.get_constraint_fn(),
+        rng=rng, full_output=True, stats=stats,
+        repair=problem.get_repair_fn() if repair else None, **kwargs)
+    scores = problem.fitness(gbest[:, None], stacked)[:, 0]
+    low = info.get('score_min', np.full(len(stacked), np.nan))
+    high = info.get('score_max', np.full(len(stacked), np.nan))
+
+    for ii in range(nplanet):
+        solutions = []
+        for jj in range(ii, len(stacked), nplanet):
+            if not converged[jj]:
+                break
+            solutions.append(Solution(gbest[jj], scores[jj],
+                                      info['settled'][jj], 0, low[jj],
+                                      high[jj]))
+        yield (solutions, None)
+
+
+def replicate_problem(problem, coeffs, replicates=50, row_weights=None,
+                      names=None, confidence=.95, full_output=False,
+                      npart=25, workers=1, seed=None, stream_key=(),
+                      sampler='random', repair=False, **kwargs):
+    """Solve every exoplanet with R independent swarms per row and return
+    the spread of their results, e.g. as an uncertainty band for its score.
+
+    Every exoplanet runs its R replicates as one batch, see
+    conmax_by_pso_batch, from its own random stream, so that, as with
+    solve_problem, its results do not depend on the other exoplanets or on
+    workers. A replicate that does not converge on every row is left out of
+    the statistics.
+
+    Arguments:
+        problem: str or Problem
+            The problem, or its name, see get_problem.
+        coeffs: array_like of shape (P, K) or (P, S, K)
+            The coefficients of every exoplanet, or of its S rows.
+        replicates: int, default 50
+            Number R of swarms per row of an exoplanet.
+        row_weights: array_like of shape (S,) or None, default None
+            Weights of the fitness of every row in the score of a replicate,
+            e.g. (.99, .01) for the interior and surface CDHS. Defaults to
+            the mean over the rows.
+        names: array_like of shape (P,) or None, default None
+            Name of every exoplanet, from which its random stream is
+            derived, see solve_problem.
+        confidence: float, default .95
+            Confidence level of the intervals of the mean, see pso.summarize.
+        full_output: bool, default False
+            Whether to also return the raw results of every replicate.
+        npart, workers, seed, stream_key, sampler, repair:
+            see solve_problem. The streams of the replicates are apart from
+            those solve_problem draws for the same stream_key.
+        kwargs:
+            The parameters for conmax_by_pso_batch.
+    Returns:
+        a 3-tuple (score, weights, count), where score and weights are the
+        pso.ReplicateStats of the score, of shape (P,), and of the gbest of
+        every row one after the other, of shape (P, S*D), and count is the
+        (P,) number of replicates that converged. If full_output is True, a
+        4-tuple (score, weights, count, info) where info holds the (P, R)
+        arrays 'fitness' and 'converged', the (P, R, S) array 'settled' and
+        the (P, R, S*D) array 'gbest'.
+    """
+    problem = get_problem(problem)
+    check_options(True, 1, 0, False, kwargs, replicates)
+    if repair and problem.get_repair_fn() is None:
+        raise ValueError('{} has no repair'.format(problem))
+
+    coeffs = np.asarray(coeffs, dtype=float)
+    if coeffs.ndim == 2:
+        coeffs = coeffs[:, None]
+    nplanet, nrow = coeffs.shape[:2]
+    if row_weights is None:
+        row_weights = np.full(nrow, 1 / nrow)
+    if names is None:
+        names = np.arange(nplanet).astype(str)
+
+    streams = None
+    if seed is not None or workers > 1:
+        streams = planet_streams(seed, names, key=(*stream_key, 0))
+
+    fitness = np.full((nplanet, replicates, nrow), np.nan)
+    gbest = np.full((nplanet, replicates, nrow, problem.ndim), np.nan)
+    settled = np.full((nplanet, replicates, nrow), -1)
+    solved = map_planets(
+        replicate_planet, list(coeffs), streams, workers, problem=problem,
+        replicates=replicates, npart=npart, sampler=sampler, repair=repair,
+        kwargs=kwargs)
+    for ii, outcomes in enumerate(solved):
+        for jj, solutions in enumerate(outcomes):
+            for kk, sol in enumerate(solutions):
+                fitness[ii, jj, kk] = sol.score
+                gbest[ii, jj, kk] = sol.gbest
+                settled[ii, jj, kk] = sol.settled
+
+    converged = ~np.isnan(fitness).any(axis=2)
+    fitness = np.where(converged, fitness @ np.asarray(row_weights), np.nan)
+    gbest = np.where(converged[..., None], gbest.reshape(
+        nplanet, replicates, -1), np.nan)
+
+    score = summarize(fitness, confidence)
+    weights = summarize(gbest, confidence)
+    count = converged.sum(axis=1)
+    if not full_output:
+        return score, weights, count
+
+    info = {
+        'fitness': fitness,
+        'gbest': gbest,
+        'settled': settled,
+        'converged': converged,
+    }
+    return score, weights, count, info
+
+
+def replicate_planet(rows, rng, problem, replicates, npart, sampler, repair,
+                     kwargs):
+    """Solve the rows of one exoplanet, of shape (S, K), with replicates
+    swarms each, all as one batch, and return the list of the Solutions of
+    every replicate, as solve_planet does for one swarm."""
+    problem = get_problem(problem)
+    coeffs = np.repeat(rows[None], replicates, axis=0)
+    return [solutions for solutions, _ in _solve_batch(
+        problem, coeffs, npart, rng, sampler, repair, False, kwargs)]
+
+
+def score_problem(problem, coeffs, names=None, classes=None, restarts=0,
+                  intervals=False, progress=None, sink=None, store=None,
+                  **kwargs):
+    """Maximize the fitness of problem for every exoplanet, e.g. a new score
+    registered with register_problem, without any text output.
+
+    Arguments:
+        problem: str or Problem
+            The problem, or its name, see get_problem.
+        coeffs: array_like of shape (P, K)
+            The coefficients of every exoplanet.
+        names, classes: array_like of shape (P,) or None, default None
+            Name and habitability class of every exoplanet, as used in the
+            rows passed to sink and in the keys of store. Names default to
+            the position in coeffs and seed the random streams, see
+            solve_problem.
+        restarts, intervals:
+            see solve_problem.
+        progress: utils.Progress or None, default None
+            Updated once per exoplanet scored.
+        sink: function or None, default None
+            Called as sink(name, values, err) for every exoplanet as soon as
+            it is scored, in order, where values is its row of results as in
+            the CSV files of evaluate_values, or None if it failed with the
+            message err.
+        store: utils.TrajectoryStore or None, default None
+            Where to append the gbest score of every iteration, keyed by
+            exoplanet name.
+        kwargs:
+            How to solve the problem, see solve_problem.
+    Returns:
+        numpy structured array of shape (P,) with the fields 'X0' to 'X<D-1>'
+        of the gbest and those of RESULT_FIELDS, where Status is 1 for the
+        exoplanets whose swarm did not converge.
+    """
+    problem = get_problem(problem)
+    coeffs = np.asarray(coeffs, dtype=float).reshape(-1, problem.ncoeffs)
+    dtype = np.dtype([('X%d' % dim, 'f8') for dim in range(problem.ndim)]
+                     + RESULT_FIELDS)
+
+    nplanet = len(coeffs)
+    if names is None:
+        names = np.arange(nplanet).astype(str)
+    if classes is None:
+        classes = np.full(nplanet, '')
+
+    result = np.zeros(nplanet, dtype=dtype)
+    if nplanet == 0:
+        return result
+
+    solved = solve_problem(problem, coeffs, names=names,
+                           keys=[[name] for name in names],
+                           restarts=restarts, intervals=intervals,
+                           gendump=store is not None, **kwargs)
+    for ii, (name, habc, (solutions, dumps)) in enumerate(
+            zip(names, classes, solved)):
+        for key, trajectory in (dumps or {}).items():
+            store.append(key, trajectory)
+
+        values = None
+        if solutions:
+            sol = solutions[0]
+            result[ii] = (*sol.gbest, sol.score, sol.settled, sol.restarts,
+                          sol.score_min, sol.score_max, 0)
+            values = (name, habc, *np.round(sol.gbest, 4),
+                      np.round(sol.score, 4), sol.settled)
+            if restarts:
+                values += (sol.restarts,)
+            if intervals:
+                values += (sol.score_min, sol.score_max)
+        else:
+            result[ii] = (*[np.nan] * (problem.ndim + 1), -1, -1,
+                          np.nan, np.nan, 1)
+
+        if sink is not None:
+            sink(name, values, None if values is not None else ERR_TEXT)
+        if progress is not None:
+            progress.update()
+    return result
@@ -0,0 +1,306 @@
+from contextlib import nullcontext
+from os import makedirs, path
+
+import numpy as np
+
+from .engine import INTERVAL_HEADERS, REPLICATE_HEADERS, check_options
+from .engine import replicate_problem, score_problem
+from .problem import get_problem
+from ..utils import Progress, ResultWriter, TrajectoryStore
+from ..utils import carry_forward, digest, merge_rows, row_keys
+from ..utils import save_results
+
+
+# Miscellaneous Consts.
+RESUMED = '{} exoplanets already scored, resuming.\n'
+CARRIED = '{new} new, {changed} changed, {unchanged} unchanged and '\
+          '{removed} removed exoplanets.\n'
+
+# Version of the scoring code, stored with the parameters of every run.
+# Bump it whenever a change gives other results for the same parameters,
+# so that resume and incremental never mix rows across versions.
+#   2: the CDHPF raises density and surface temperature to their weights.
+SCORING_VERSION = 2
+
+
+class Table:
+    """Layout of the output table printed while a score is evaluated.
+
+    Arguments:
+        title: str
+            Format string of the header row, given the headers.
+        message: str
+            Format string of the row of an exoplanet, given its values.
+        error: str
+            Format string of the line of an exoplanet that failed, given its
+            name and the message.
+        width: int
+            Width of the table in characters.
+    """
+
+    def __init__(self, title, message, error, width):
+        self.title = title
+        self.message = message
+        self.error = error
+        self.width = width
+
+    def print_header(self, label, headers):
+        """Print the header of the output table."""
+        spaces = (self.width//2 - len(label)//2) * ' '
+        print('\n' + spaces + label.upper())
+        print(spaces + '-'*len(label) + '\n')
+        print(self.title.format(*headers), '-' * self.width, sep='\n')
+
+    def print_error(self, name, err):
+        """Print the error for exoplanet name when convergence fails."""
+        print(self.error.format(name, err))
+
+    def print_results(self, values):
+        """Print the results of the estimation for the current planet."""
+        print(self.message.format(*values))
+
+    def print_footer(self):
+        """Print the end of the output table."""
+        print('-' * self.width + '\n')
+
+
+def evaluate_table(exoplanets, columns, headers, params, score_fn, fpath,
+                   table, label, verbose=True, dump=None, resume=False,
+                   incremental=False, replicate_fn=None):
+    """Score the exoplanets into the result table fpath, writing every row
+    as soon as it is available, and store the complete table as a columnar
+    dataset. This is the loop behind evaluate_cdhs_values,
+    evaluate_ceesa_values and evaluate_values.
+
+    Arguments:
+        exoplanets: pandas.DataFrame
+            The exoplanet parameters to operate on.
+        columns: list of str
+            The columns of exoplanets holding the name, the habitability
+            class and then every input of score_fn, in order.
+        headers: tuple of str
+            Header row of the table.
+        params: dict
+            Parameters of the run, identifying it to resume and incremental,
+            see utils.ResultWriter and utils.row_keys. SCORING_VERSION is
+            added to them.
+        score_fn: function
+            Called as score_fn(*inputs, names=, classes=, progress=, sink=,
+            store=) on the exoplanets left to score, as score_cdhs,
+            score_ceesa and score_problem are; it passes sink the row of
+            every exoplanet in order.
+        fpath: str
+            The CSV file of the table.
+        table: Table
+            Layout of the output table. Failed exoplanets are printed even
+            if not verbose.
+        label: str
+            Title of the output table, e.g. the constraint.
+        verbose: bool, default True
+            Whether to print the output table to stdout.
+        dump: str or None, default None
+            Base path of the utils.TrajectoryStore the gbest scores of every
+            iteration are recorded in, or None for no dump.
+        resume: bool, default False
+            Whether to continue an interrupted run, skipping the exoplanets
+            already written to fpath.
+        incremental: bool, default False
+            Whether to only score the exoplanets that are new or changed
+            since the last complete run with the same parameters, carrying
+            the rows of the others forward, see utils.carry_forward. Not
+            supported in batch mode, whose results depend on the batch.
+        replicate_fn: function or None, default None
+            Called as replicate_fn(*inputs, names=) on every exoplanet
+            scored, one at a time, as replicate_problem is, to append the
+            mean, standard deviation and confidence interval of its score
+            over the replicates, see REPLICATE_HEADERS, to its row before it
+            is written.
+    Returns:
+        the counts of utils.carry_forward if incremental, else None.
+    """
+    if incremental and params.get('batch'):
+        raise ValueError('incremental is not supported in batch mode')
+
+    params = dict(params, version=SCORING_VERSION)
+    total = len(exoplanets)
+    names = exoplanets[columns[0]].to_numpy()
+    classes = exoplanets[columns[1]].to_numpy()
+    inputs = exoplanets[columns[2:]].to_numpy(dtype=float)
+    catalog = digest(exoplanets[columns].itertuples(index=False, name=None))
+
+    store = nullcontext()
+    if dump is not None:
+        makedirs(path.dirname(dump), exist_ok=True)
+        store = TrajectoryStore(dump, 'a' if resume else 'w')
+
+    keys = row_keys(names, inputs, params)
+    carried, report = {}, None
+    if incremental:
+        carried, report = carry_forward(fpath, names, classes, keys)
+
+    with ResultWriter(fpath, headers, params, resume=resume) as writer, store:
+        carried = {ii: row for ii, row in carried.items()
+                   if names[ii] not in writer}
+        todo = [ii for ii, name in enumerate(names)
+                if name not in writer and ii not in carried]
+
+        progress = None
+        if verbose:
+            table.print_header(label, headers)
+            if writer.resumed:
+                print(RESUMED.format(writer.resumed))
+            if incremental:
+                print(CARRIED.format(**report))
+            progress = Progress(total, table.width - 10,
+                                done=total - len(todo))
+
+        planets = exoplanets.iloc[todo]
+        position = {names[ii]: ii for ii in todo}
+
+        def sink(name, values, err):
+            if err is not None:
+                table.print_error(name, err)
+                writer.fail(name)
+                return
+            writer.write(values)
+            if verbose:
+                table.print_results(values)
+
+        sink, flush = merge_rows(sink, carried, position)
+        if replicate_fn is not None:
+            sink = _replicated(sink, replicate_fn, exoplanets, columns,
+                               position)
+
+        inputs = [planets[col].to_numpy() for col in columns[2:]]
+        score_fn(*inputs, names=planets[columns[0]].to_numpy(),
+                 classes=planets[columns[1]].to_numpy(), progress=progress,
+                 sink=sink, store=store if dump is not None else None)
+        flush()
+
+    save_results(fpath, params, catalog, dict(zip(names, keys)))
+    if verbose:
+        table.print_footer()
+    return report
+
+
+def _replicated(sink, replicate_fn, exoplanets, columns, position):
+    """Return sink appending the score statistics of replicate_fn to the
+    row of every exoplanet scored, see evaluate_table."""
+    def replicated(name, values, err):
+        if err is None:
+            planet = exoplanets.iloc[[position[name]]]
+            score = replicate_fn(*(planet[col].to_numpy()
+                                   for col in columns[2:]),
+                                 names=planet[columns[0]].to_numpy())[0]
+            values = (*values, *np.round(
+                (score.mean[0], score.std[0], score.low[0], score.high[0]),
+                4).tolist())
+        sink(name, values, err)
+
+    return replicated
+
+
+def evaluate_values(problem, exoplanets, columns, fname=None, verbose=True,
+                    gendump=False, npart=25, batch=False, workers=1,
+                    seed=None, resume=False, restarts=0,
+                    restart_policy='grow', max_nfev=None, incremental=False,
+                    intervals=False, repair=False, replicates=0,
+                    confidence=.95, **kwargs):
+    """Maximize the fitness of problem for each exoplanet, e.g. a new score
+    registered with register_problem, and store the results in the
+    indicated file, as evaluate_ceesa_values does for CEESA.
+
+    Arguments:
+        problem: str or Problem
+            The problem, or its name, see get_problem.
+        exoplanets: pandas.DataFrame
+            The exoplanet parameters to operate on.
+        columns: list of str
+            The columns of exoplanets holding the name, the habitability
+            class and then the K coefficients of the problem, in order.
+        fname: str or None, default None
+            Where to store the results, in the results directory. Defaults
+            to the name of the problem with '.csv'. Rows have the name and
+            class of the exoplanet, the gbest X0 to X<D-1> and its Score,
+            all rounded to 4 decimals, and the Iter the swarm settled at.
+        verbose: bool, default True
+            Whether to print output to stdout.
+        gendump: bool, default False
+            Whether to record the gbest score of every iteration. They are
+            appended to the trajectory store temp/<name>, see
+            utils.TrajectoryStore, keyed by exoplanet name.
+        npart, batch, workers, seed, restarts, restart_policy, max_nfev,
+        intervals, repair, kwargs:
+            How to solve the problem, see solve_problem. With restarts the
+            rows end with the Restarts used, and with intervals with the
+            ScoreMin and ScoreMax of the score.
+        replicates: int, default 0
+            Number of independent swarms per exoplanet whose score
+            statistics, see replicate_problem, end the rows as the columns
+            REPLICATE_HEADERS. None if 0.
+        confidence: float, default .95
+            Confidence level of the ScoreLow to ScoreHigh interval.
+        resume, incremental:
+            Whether to continue an interrupted run, or to only score the
+            exoplanets that are new or changed, see evaluate_table.
+    Returns:
+        the counts of utils.carry_forward if incremental, else None.
+    """
+    problem = get_problem(problem)
+    check_options(batch, workers, restarts, gendump, kwargs, replicates)
+    if repair and problem.get_repair_fn() is None:
+        raise ValueError('{} has no repair'.format(problem))
+
+    name = problem.name or type(problem).__name__
+    headers = ('Name', 'Cls', *('X%d' % dim for dim in range(problem.ndim)),
+               'Score', 'Iter')
+    restart = None
+    if restarts:
+        headers = headers + ('Restarts',)
+        restart = dict(restarts=restarts, policy=restart_policy,
+                       max_nfev=max_nfev)
+    if intervals:
+        headers = headers + INTERVAL_HEADERS
+    if replicates:
+        headers = headers + REPLICATE_HEADERS
+
+    params = dict(kwargs, score=name, npart=npart, batch=batch, seed=seed,
+                  restart=restart)
+    if intervals:
+        params['intervals'] = True
+    if repair:
+        params['repair'] = True
+    if replicates:
+        params['replicates'] = dict(replicates=replicates,
+                                    confidence=confidence)
+
+    def score_fn(*inputs, **options):
+        return score_problem(
+            problem, np.column_stack(inputs), npart=npart, batch=batch,
+            workers=workers, seed=seed, restarts=restarts,
+            restart_policy=restart_policy, max_nfev=max_nfev,
+            intervals=intervals, repair=repair, **options, **kwargs)
+
+    # One exoplanet at a time, see evaluate_table, in this process while the
+    # workers go on scoring.
+    def replicate_fn(*inputs, names):
+        return replicate_problem(
+            problem, np.column_stack(inputs), replicates=replicates,
+            names=names, confidence=confidence, npart=npart, seed=seed,
+            repair=repair, **kwargs)
+
+    width = 32 + 10 * (problem.ndim + 1) + 7
+    table = Table(
+        '{:25}{:>7.5}' + '{:>10}' * (problem.ndim + 1) + '{:>7}',
+        '{:25}{:>7.5}' + '{:10.4f}' * (problem.ndim + 1) + '{:7}',
+        '{:25}{:^%d}' % (width - 25), width)
+
+    report = evaluate_table(
+        exoplanets, columns, headers, params, score_fn,
+        path.join('results', fname or name + '.csv'), table, name,
+        verbose=verbose, dump=path.join('temp', name) if gendump else None,
+        resume=resume, incremental=incremental,
+        replicate_fn=replicate_fn if replicates else None)
+    if verbose:
+        print('')
+    return report
@@ -0,0 +1,158 @@
+from abc import ABC, abstractmethod
+from functools import partial
+from importlib import import_module
+
+import numpy as np
+
+from ..utils import unit_samples
+
+
+class Problem(ABC):
+    """Constrained maximization solved once per exoplanet, e.g. one of the
+    habitability scores.
+
+    A problem declares its search space: the dimension D of a point, the
+    number K of coefficients every exoplanet brings, the bounds of every
+    coordinate and any linear equality and inequality constraints. It
+    provides a fitness vectorized over a batch of swarms and their
+    per-exoplanet coefficients, and a sampler of starting points. The
+    engine, see engine.py, then gives any problem batching, parallel
+    workers, restarts, samplers, repair and running statistics, and
+    evaluate_values, see evaluate.py, its result tables with resume and
+    incremental runs.
+
+    Subclasses set name, ndim and ncoeffs and implement fitness. The other
+    methods have defaults built from the declarations, which subclasses
+    override with faster or exact forms where they have them.
+
+    Arguments:
+        lower, upper: array_like of shape (D,)
+            Bounds of every coordinate, both included.
+        A_eq, b_eq: array_like of shape (E, D) and (E,), or None
+            Linear equality constraints A_eq @ x = b_eq, met within thr.
+        A_ub, b_ub: array_like of shape (U, D) and (U,), or None
+            Linear inequality constraints A_ub @ x <= b_ub.
+        thr: float, default 1e-7
+            Threshold in converting equality constraint to inequality.
+    """
+
+    name = None
+    ndim = None
+    ncoeffs = None
+
+    def __init__(self, lower, upper, A_eq=None, b_eq=None, A_ub=None,
+                 b_ub=None, thr=1e-7):
+        self.lower = np.asarray(lower, dtype=float)
+        self.upper = np.asarray(upper, dtype=float)
+        self.A_eq = np.zeros((0, self.ndim)) if A_eq is None \
+            else np.asarray(A_eq, dtype=float)
+        self.b_eq = np.zeros(0) if b_eq is None \
+            else np.asarray(b_eq, dtype=float)
+        self.A_ub = np.zeros((0, self.ndim)) if A_ub is None \
+            else np.asarray(A_ub, dtype=float)
+        self.b_ub = np.zeros(0) if b_ub is None \
+            else np.asarray(b_ub, dtype=float)
+        self.thr = thr
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, self.name)
+
+    @abstractmethod
+    def fitness(self, points, coeffs):
+        """Return the fitness of every point of every swarm.
+
+        Arguments:
+            points: ndarray of shape (P, N, D)
+                A swarm per exoplanet.
+            coeffs: ndarray of shape (P, K)
+                The coefficients of every exoplanet.
+        Returns:
+            ndarray of shape (P, N).
+        """
+
+    def bind(self, coeffs, backend='numpy'):
+        """Return the function fitness(points) of one exoplanet with the
+        coefficients coeffs, of shape (K,), for a swarm of shape (N, D) or a
+        single point of shape (D,), as conmax_by_pso expects. backend may
+        select a compiled form where the problem has one."""
+        coeffs = np.asarray(coeffs, dtype=float)[None]
+
+        def fitness(points):
+            points = np.asarray(points, dtype=float)
+            values = self.fitness(points.reshape(1, -1, self.ndim), coeffs)
+            return values.reshape(points.shape[:-1])
+
+        return fitness
+
+    def constraints(self, points):
+        """Return the constraint matrix of points, of shape (..., D): the
+        violation max(g(x), 0) of every bound, inequality and equality,
+        zero where the point is feasible."""
+        points = np.asarray(points, dtype=float)
+        eq = points @ self.A_eq.T - self.b_eq
+        conmatrix = np.concatenate((
+            self.lower - points, points - self.upper,
+            points @ self.A_ub.T - self.b_ub,
+            eq - self.thr, -eq - self.thr,
+        ), axis=-1)
+        return np.maximum(conmatrix, 0, out=conmatrix)
+
+    def get_constraint_fn(self, backend='numpy'):
+        """Return the function constraints(points) for conmax_by_pso and
+        conmax_by_pso_batch."""
+        return self.constraints
+
+    def sample(self, npoints, rng=None, sampler='random', nswarms=None):
+        """Return npoints starting points, or (nswarms, npoints, D) for as
+        many swarms, drawn with sampler, see utils.unit_samples.
+
+        By default the points are spread over the bounds only, so problems
+        with equality or inequality constraints override it to sample their
+        feasible region directly.
+        """
+        return self.lower + (self.upper - self.lower) * \
+            unit_samples(npoints, self.ndim, rng, sampler, nswarms)
+
+    def get_point_kernels(self, coeffs):
+        """Return the compiled fitness and constraints of the exoplanet with
+        the coefficients coeffs for a single point, as conmax_by_pso takes
+        them for fused=, or None if the problem has none. With them the
+        numba backend compiles whole iterations."""
+        return None
+
+    def get_repair_fn(self):
+        """Return the function repair(points) moving points onto the
+        feasible set in place, or None if the problem has none."""
+        return None
+
+
+def _builtin(score, constraint):
+    """Return the built-in problem of score under constraint, importing its
+    package on first use."""
+    module = import_module('..{}.problem'.format(score), __package__)
+    return getattr(module, score.upper() + 'Problem')(constraint)
+
+
+# Registered problems: name -> function returning a new Problem.
+PROBLEMS = {
+    'cdhs-crs': partial(_builtin, 'cdhs', 'crs'),
+    'cdhs-drs': partial(_builtin, 'cdhs', 'drs'),
+    'ceesa-crs': partial(_builtin, 'ceesa', 'crs'),
+    'ceesa-drs': partial(_builtin, 'ceesa', 'drs'),
+}
+
+
+def register_problem(name, factory):
+    """Register factory, a function or class called without arguments that
+    returns a Problem, under name for get_problem."""
+    PROBLEMS[name] = factory
+
+
+def get_problem(problem):
+    """Return the Problem registered under the name problem, or problem
+    itself if it is already a Problem."""
+    if isinstance(problem, Problem):
+        return problem
+    if problem not in PROBLEMS:
+        raise ValueError('invalid problem: ' + str(problem))
+    return PROBLEMS[problem]()
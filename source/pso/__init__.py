@@ -1,2 +1,10 @@
 from .pso import conmax_by_pso
 from .pso import SwarmConvergeError
+from .batch import conmax_by_pso_batch
+from .topology import get_topology
+from .observe import IterationRecord, SwarmMonitor
+from .stopping import StoppingCriterion, get_criterion
+from .restart import conmax_with_restarts
+from .workspace import SwarmWorkspace, get_workspace
+from .ensemble import ReplicateStats, conmax_replicates, summarize
+from .stats import RunningStats
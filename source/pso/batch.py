@@ -0,0 +1,165 @@
+import numpy as np
+
+from .stopping import get_criterion
+from .topology import get_topology
+
+
+# Fraction of finished swarms after which the working arrays are compacted.
+COMPACT_RATIO = .25
+
+
+# Function for batched convergence.
+def conmax_by_pso_batch(fitness, coeffs, start_points, constraints,
+                        friction=.8, learnrate1=.1, learnrate2=.1,
+                        max_velocity=1., max_iter=1000, stable_iter=100,
+                        thresh=1e-8, topology='nearest', rng=None,
+                        full_output=False, stopping=None, stats=None,
+                        repair=None):
+    """Perform constrained maximization for P independent problems at once,
+    holding every swarm in a single (P, N, D) array.
+
+    Each swarm follows exactly the same update rule as conmax_by_pso, but the
+    positions, velocities, local and global bests of all swarms are updated
+    together. Convergence is tracked per swarm; once a quarter of the swarms
+    still being updated have converged they are dropped from the working
+    arrays, so finished problems stop costing compute.
+
+    Arguments:
+        fitness: function fitness(positions, coeffs) -> fitness_values
+            Function to maximize. The function should take as arguments a
+            ndarray of shape (P, N, D) and the coefficient array of shape
+            (P, K) for those P swarms, and return a 2d array of shape (P, N).
+        coeffs: ndarray of shape (P, K)
+            Per-problem coefficients broadcast against the swarms, where K is
+            the number of coefficients the fitness needs.
+        start_points: ndarray of shape (P, N, D)
+            Array of points to begin PSO from for every problem.
+        constraints: function constraints(position) -> penalty_value
+            Function that returns the constraint matrix. The function should
+            take as an argument a ndarray of shape (P, N, D) and return a 3d
+            array of shape (P, N, S), where S is the number of constraints.
+        friction, learnrate1, learnrate2, max_velocity, max_iter, stable_iter,
+        thresh, topology, rng, full_output, stopping, stats, repair:
+            See conmax_by_pso. Topology functions, stopping criteria,
+            running statistics and repair receive the arrays of all running
+            swarms at once.
+    Returns:
+        a 3-tuple (gbest, it, converged), where gbest is the (P, D) array of
+        global bests, it the (P,) array of iterations taken by each swarm and
+        converged a (P,) boolean mask, False for swarms that did not
+        stabilize within max_iter. If full_output is True, a 4-tuple
+        (gbest, it, converged, info) where info holds the (P,) arrays
+        'fitness', 'nfev', 'settled' and 'stopped', and those of stats if
+        given, as described in conmax_by_pso.
+    """
+    rng = np.random if rng is None else rng
+    find_leaders = get_topology(topology, rng)
+    coeffs = np.asarray(coeffs, dtype=float)
+    nprob = start_points.shape[0]
+
+    # Outputs, filled in as swarms finish.
+    result = np.empty((nprob, start_points.shape[2]))
+    result_fit = np.empty(nprob)
+    iters = np.full(nprob, max_iter - 1)
+    settled = np.full(nprob, max_iter)
+    stopped = np.full(nprob, None, dtype=object)
+    converged = np.zeros(nprob, dtype=bool)
+
+    # Working arrays hold only the swarms that are still being updated.
+    index = np.arange(nprob)
+    position = np.array(start_points, dtype=float)
+    velocity = rng.uniform(-max_velocity, max_velocity, position.shape)
+
+    lbest = position.copy()
+    lbest_fit = fitness(lbest, coeffs)
+    gbest_fit = lbest_fit.max(axis=1)
+    nfev = np.full(nprob, start_points.shape[1])
+
+    criterion = get_criterion(stopping, stable_iter, thresh)
+    criterion.start(gbest_fit)
+    summary = {}
+    if stats is not None:
+        stats.start(gbest_fit)
+        summary = {key: np.zeros(nprob, dtype=val.dtype)
+                   for key, val in stats.summary().items()}
+    running = np.ones(nprob, dtype=bool)
+
+    for ii in range(max_iter):
+        nrun = len(index)
+        gbest = lbest[np.arange(nrun), np.argmax(lbest_fit, axis=1)]
+
+        # Determine the velocity gradients, one random draw per swarm.
+        leaders = find_leaders(position, lbest, lbest_fit)
+        dv_g = (learnrate1 * rng.uniform(0, 1, (nrun, 1, 1))
+                * (gbest[:, None] - position))
+        dv_l = (learnrate2 * rng.uniform(0, 1, (nrun, 1, 1))
+                * (np.take_along_axis(lbest, leaders[..., None], axis=1)
+                   - position))
+
+        # Update velocity such that |velocity| <= max_velocity.
+        velocity *= friction
+        velocity += (dv_g + dv_l)
+        np.clip(velocity, -max_velocity, max_velocity, out=velocity)
+
+        # Update the local and global bests.
+        position += velocity
+        if repair is not None:
+            repair(position)
+        conmatrix = constraints(position)
+        fit = fitness(position, coeffs)
+        nfev[index] += position.shape[1]
+        to_update = (fit > lbest_fit)
+        to_update &= (conmatrix.sum(axis=2) < thresh)
+
+        lbest[to_update] = position[to_update]
+        lbest_fit[to_update] = fit[to_update]
+        gbest_fit = lbest_fit.max(axis=1)
+
+        # Termination criteria, per swarm.
+        done = running & criterion.update(ii, gbest_fit, position)
+        if stats is not None:
+            stats.update(ii, gbest_fit, criterion.settled)
+        if done.any():
+            best = np.argmax(lbest_fit[done], axis=1)
+            result[index[done]] = lbest[done, best]
+            result_fit[index[done]] = gbest_fit[done]
+            iters[index[done]] = ii
+            settled[index[done]] = criterion.settled[done]
+            stopped[index[done]] = criterion.reasons()[done]
+            converged[index[done]] = True
+            if stats is not None:
+                for key, val in stats.summary().items():
+                    summary[key][index[done]] = val[done]
+            running &= ~done
+
+            if not running.any():
+                break
+
+            # Compact the working arrays once enough swarms have finished.
+            if (~running).sum() >= COMPACT_RATIO * nrun:
+                index = index[running]
+                position = position[running]
+                velocity = velocity[running]
+                lbest = lbest[running]
+                lbest_fit = lbest_fit[running]
+                gbest_fit = gbest_fit[running]
+                coeffs = coeffs[running]
+                criterion.select(running)
+                if stats is not None:
+                    stats.select(running)
+                running = running[running]
+
+    # Swarms that never stabilized keep their final global best.
+    if running.any():
+        best = np.argmax(lbest_fit[running], axis=1)
+        result[index[running]] = lbest[running, best]
+        result_fit[index[running]] = gbest_fit[running]
+        if stats is not None:
+            for key, val in stats.summary().items():
+                summary[key][index[running]] = val[running]
+
+    if full_output:
+        info = {'fitness': result_fit, 'nfev': nfev, 'settled': settled,
+                'stopped': stopped, **summary}
+        return (result, iters, converged, info)
+    return (result, iters, converged)
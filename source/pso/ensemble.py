@@ -0,0 +1,103 @@
+import warnings
+from collections import namedtuple
+
+import numpy as np
+
+from .batch import conmax_by_pso_batch
+
+
+# Statistics of a quantity over the replicates of every problem.
+ReplicateStats = namedtuple('ReplicateStats', [
+    'mean',               # mean over the converged replicates
+    'std',                # sample standard deviation (ddof=1)
+    'min',                # smallest value
+    'max',                # largest value
+    'low',                # lower bound of the confidence interval of mean
+    'high',               # upper bound of the confidence interval of mean
+])
+
+
+def summarize(values, confidence=.95):
+    """Return the ReplicateStats of values along axis 1, ignoring NaN.
+
+    The confidence interval of the mean is Student's t interval, NaN for
+    problems with fewer than two values.
+
+    Arguments:
+        values: ndarray of shape (P, R, ...)
+            R replicate values of every problem, NaN where missing.
+        confidence: float, default .95
+            Confidence level of the interval.
+    Returns:
+        ReplicateStats of arrays of shape (P, ...).
+    """
+    from scipy.stats import t
+
+    count = np.sum(~np.isnan(values), axis=1)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        mean = np.nanmean(values, axis=1)
+        std = np.nanstd(values, axis=1, ddof=1)
+        vmin = np.nanmin(values, axis=1)
+        vmax = np.nanmax(values, axis=1)
+        half = t.ppf((1 + confidence) / 2, count - 1) * std / np.sqrt(count)
+    return ReplicateStats(mean, std, vmin, vmax, mean - half, mean + half)
+
+
+def conmax_replicates(fitness, coeffs, start_points, constraints,
+                      confidence=.95, full_output=False, **kwargs):
+    """Run R independent replicate swarms for each of P problems, all as one
+    batch of P*R swarms, and summarize their results per problem.
+
+    The spread of the replicates measures how far the optimizer can be
+    trusted on a problem, e.g. as an uncertainty band for the score of an
+    exoplanet. Replicates that do not converge are left out of the
+    statistics.
+
+    Arguments:
+        fitness, constraints:
+            Batched functions as for conmax_by_pso_batch.
+        coeffs: ndarray of shape (P, K)
+            Coefficients of every problem, shared by its replicates.
+        start_points: ndarray of shape (P, R, N, D)
+            Independent starting swarms of every replicate.
+        confidence: float, default .95
+            Confidence level of the intervals, see summarize.
+        full_output: bool, default False
+            Whether to also return the raw results of every replicate.
+        kwargs:
+            The parameters for conmax_by_pso_batch.
+    Returns:
+        a 3-tuple (score, weights, count), where score and weights are the
+        ReplicateStats of the gbest fitness, of shape (P,), and of the gbest,
+        of shape (P, D), and count is the (P,) number of replicates that
+        converged. If full_output is True, a 4-tuple (score, weights, count,
+        info) where info holds the (P, R) arrays 'fitness', 'settled' and
+        'converged' and the (P, R, D) array 'gbest'.
+    """
+    start_points = np.asarray(start_points, dtype=float)
+    nprob, nrep, npart, ndim = start_points.shape
+    coeffs = np.repeat(np.asarray(coeffs, dtype=float), nrep, axis=0)
+
+    gbest, _, converged, run = conmax_by_pso_batch(
+        fitness, coeffs, start_points.reshape(nprob * nrep, npart, ndim),
+        constraints, full_output=True, **kwargs)
+
+    gbest = gbest.reshape(nprob, nrep, ndim)
+    converged = converged.reshape(nprob, nrep)
+    fit = np.where(converged, run['fitness'].reshape(nprob, nrep), np.nan)
+    weights = np.where(converged[..., None], gbest, np.nan)
+
+    score = summarize(fit, confidence)
+    weights = summarize(weights, confidence)
+    count = converged.sum(axis=1)
+    if not full_output:
+        return score, weights, count
+
+    info = {
+        'fitness': fit,
+        'gbest': gbest,
+        'settled': run['settled'].reshape(nprob, nrep),
+        'converged': converged,
+    }
+    return score, weights, count, info
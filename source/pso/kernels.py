@@ -0,0 +1,94 @@
+"""Kernels of the swarm update for conmax_by_pso(backend='numba').
+
+Each kernel is plain Python written for numba's nopython mode, compiled on
+first use by utils.get_kernel. They perform the same floating point
+operations in the same order as the numpy code of conmax_by_pso, so both
+backends give identical swarms. fused_step also runs the compiled fitness
+and constraints of a problem, which agree with numpy up to the rounding of
+pow and of the sum of the constraint matrix.
+"""
+
+
+def fused_update(position, velocity, gbest, lbest, leaders, coef_g, coef_l,
+                 friction, max_velocity):
+    """Update the velocity and position of every particle in place,
+        velocity = clip(friction*velocity + dv_g + dv_l, +-max_velocity)
+        position = position + velocity
+    where dv_g = coef_g * (gbest - position) and
+          dv_l = coef_l * (lbest[leaders] - position),
+    in one pass without temporaries."""
+    npart, ndim = position.shape
+    for ii in range(npart):
+        leader = leaders[ii]
+        for dd in range(ndim):
+            pos = position[ii, dd]
+            dv_g = coef_g * (gbest[dd] - pos)
+            dv_l = coef_l * (lbest[leader, dd] - pos)
+            vel = velocity[ii, dd] * friction + (dv_g + dv_l)
+            if vel > max_velocity:
+                vel = max_velocity
+            elif vel < -max_velocity:
+                vel = -max_velocity
+            velocity[ii, dd] = vel
+            position[ii, dd] = pos + vel
+
+
+def nearest_leaders(position, lbest, leaders):
+    """Write the index of the local best closest to every particle into
+    leaders, as topology.nearest_leaders does for a single swarm."""
+    npart, ndim = position.shape
+    for ii in range(npart):
+        best, arg = -1., 0
+        for jj in range(lbest.shape[0]):
+            sqdist = 0.
+            for dd in range(ndim):
+                diff = position[ii, dd] - lbest[jj, dd]
+                sqdist += diff * diff
+            if best < 0 or sqdist < best:
+                best, arg = sqdist, jj
+        leaders[ii] = arg
+
+
+def fused_step(score, violation):
+    """Return the kernel of one iteration of conmax_by_pso for a problem
+    with the compiled point kernels score and violation, see
+    Problem.get_point_kernels. It runs the update of fused_update, then,
+    for every particle, the constraint check violation(point, limits) <
+    thresh and, for the feasible ones, the fitness score(point, coeffs),
+    keeping any better local best in place. It returns the number of
+    fitness evaluations and of local bests improved.
+
+    The kernels are bound in a closure, so that numba compiles them into
+    the step instead of dispatching on them at every call."""
+    def step(position, velocity, gbest, lbest, lbest_fit, leaders, coef_g,
+             coef_l, friction, max_velocity, coeffs, limits, thresh):
+        npart, ndim = position.shape
+        for ii in range(npart):
+            leader = leaders[ii]
+            for dd in range(ndim):
+                pos = position[ii, dd]
+                dv_g = coef_g * (gbest[dd] - pos)
+                dv_l = coef_l * (lbest[leader, dd] - pos)
+                vel = velocity[ii, dd] * friction + (dv_g + dv_l)
+                if vel > max_velocity:
+                    vel = max_velocity
+                elif vel < -max_velocity:
+                    vel = -max_velocity
+                velocity[ii, dd] = vel
+                position[ii, dd] = pos + vel
+
+        # Local bests only change once every particle has moved, as in
+        # numpy.
+        nfev, improved = 0, 0
+        for ii in range(npart):
+            if violation(position[ii], limits) >= thresh:
+                continue
+            fit = score(position[ii], coeffs)
+            nfev += 1
+            if fit > lbest_fit[ii]:
+                lbest[ii] = position[ii]
+                lbest_fit[ii] = fit
+                improved += 1
+        return nfev, improved
+
+    return step
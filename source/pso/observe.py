@@ -0,0 +1,71 @@
+from collections import namedtuple
+
+import numpy as np
+
+
+# Record passed to the observer of conmax_by_pso after every iteration.
+IterationRecord = namedtuple('IterationRecord', [
+    'iteration',          # index of the iteration, from 0
+    'gbest_fit',          # fitness of the global best after the iteration
+    'lbest_updates',      # number of local bests improved
+    'feasible_fraction',  # fraction of particles satisfying the constraints
+    'mean_velocity',      # mean Euclidean norm of the particle velocities
+    'diameter',           # largest distance between two particles
+    'time_fitness',       # seconds spent evaluating the fitness
+    'time_constraints',   # seconds spent evaluating the constraints
+    'time_update',        # seconds spent on leaders, velocity and position
+])
+
+
+def iteration_record(ii, gbest_fit, updates, feasible, position, velocity,
+                     times):
+    """Build the IterationRecord of one iteration of the swarm."""
+    from scipy.spatial.distance import pdist
+
+    npoints = len(position)
+    return IterationRecord(
+        iteration=ii,
+        gbest_fit=float(gbest_fit),
+        lbest_updates=int(updates),
+        feasible_fraction=feasible / npoints,
+        mean_velocity=float(np.linalg.norm(velocity, axis=1).mean()),
+        diameter=float(pdist(position).max()) if npoints > 1 else 0.,
+        time_fitness=times[0],
+        time_constraints=times[1],
+        time_update=times[2],
+    )
+
+
+class SwarmMonitor:
+    """Observer for conmax_by_pso keeping every IterationRecord of a run.
+
+    Pass an instance as the observer argument; it may be reused for several
+    runs, whose records are appended one after the other.
+
+        >>> monitor = SwarmMonitor()
+        >>> conmax_by_pso(fitness, points, constraints, observer=monitor)
+        >>> monitor.column('gbest_fit'), monitor.totals()
+    """
+
+    def __init__(self):
+        self.records = []
+
+    def __call__(self, record):
+        self.records.append(record)
+
+    def __len__(self):
+        return len(self.records)
+
+    def column(self, field):
+        """Return one field of every record as an ndarray."""
+        index = IterationRecord._fields.index(field)
+        return np.array([record[index] for record in self.records])
+
+    def totals(self):
+        """Return the seconds spent in each step over all the records."""
+        return {field: float(self.column(field).sum())
+                for field in ('time_fitness', 'time_constraints',
+                              'time_update')}
+
+    def clear(self):
+        self.records = []
@@ -1,18 +1,49 @@
+from time import perf_counter
+
 import numpy as np
-from numpy.random import uniform
-from scipy.spatial.distance import cdist
+
+from . import kernels
+from .observe import iteration_record
+from .stopping import get_criterion
+from .topology import get_topology, KDTREE_MIN_PARTICLES
+from ..utils import get_kernel
+
+
+# Compiled kernels.fused_step, by the point kernels and backend they run.
+_fused_steps = {}
 
 
 # Exception raised when Swarm does not converge.
 class SwarmConvergeError(Exception):
-    """Error raised when the swarm does not converge."""
-    pass
+    """Error raised when the swarm does not converge.
+
+    Attributes:
+        gbest: ndarray or None
+            The global best when the swarm gave up.
+        fitness: float or None
+            Its fitness.
+        nfev: int
+            The number of points the fitness was evaluated at.
+        restarts: int
+            The number of restarts tried, see conmax_with_restarts.
+    """
+
+    def __init__(self, message='', gbest=None, fitness=None, nfev=0,
+                 restarts=0):
+        super().__init__(message)
+        self.gbest = gbest
+        self.fitness = fitness
+        self.nfev = nfev
+        self.restarts = restarts
 
 
 # Function for convergence.
 def conmax_by_pso(fitness, start_points, constraints, friction=.8,
                   learnrate1=.1, learnrate2=.1, max_velocity=1.,
-                  max_iter=1000, stable_iter=100, thresh=1e-8, dumpfile=None):
+                  max_iter=1000, stable_iter=100, thresh=1e-8, dumpfile=None,
+                  topology='nearest', rng=None, full_output=False,
+                  observer=None, stopping=None, backend='numpy',
+                  workspace=None, stats=None, repair=None, fused=None):
     """Perform constrained maximization of the given fitness using particle
     swarm optimization.
 
@@ -44,67 +75,253 @@ def conmax_by_pso(fitness, start_points, constraints, friction=.8,
             Number of iterations to wait before Swarm is declared stable.
         thresh: int, default 1e-5
             Threshold within which the Swarm is stable.
-        dumpfile: str or None, default None
-            File to write gbest values per iteration. None if no dump required.
+        dumpfile: str, function or None, default None
+            File to write gbest values per iteration, or a function
+            dumpfile(values) receiving them as an ndarray once the swarm
+            stops, e.g. TrajectoryStore.writer(key). None if no dump
+            required.
+        topology: str or function, default 'nearest'
+            Neighbourhood from which each particle takes its local leader,
+            one of 'nearest', 'ring', 'vonneumann' or 'random', or a function
+            leaders(position, lbest, lbest_fit) -> indices. See topology.py
+            for the cost of each.
+        rng: numpy.random.Generator or None, default None
+            Source of randomness. None uses the global numpy.random state.
+        full_output: bool, default False
+            Whether to also return a dict of run information.
+        observer: function or None, default None
+            Function observer(record) called after every iteration with an
+            IterationRecord of the gbest fitness, lbest updates, feasible
+            fraction, mean velocity, swarm diameter and the time spent in
+            each step, e.g. a SwarmMonitor. Nothing is measured if None.
+        stopping: str, StoppingCriterion or None, default None
+            Rule deciding when the swarm has converged, one of 'stable',
+            'radius', 'improvement', 'patience' or 'combined', or a
+            configured criterion, see stopping.py. None is 'stable': wait
+            until gbest has not moved by thresh for stable_iter iterations.
+        backend: 'numpy' or 'numba', default 'numpy'
+            'numba' fuses the velocity, clamp and position updates, and the
+            'nearest' leader search of small swarms, into compiled loops,
+            see kernels.py. The swarm is the same as with 'numpy'. Given
+            fused, the constraints and fitness are compiled in as well.
+            Falls back to numpy if numba is not installed.
+        workspace: SwarmWorkspace or None, default None
+            Preallocated buffers for swarms of the shape of start_points, in
+            which the update runs in place, see workspace.py. Reuse it across
+            runs to avoid allocating per iteration. None allocates per run.
+        stats: RunningStats or None, default None
+            Running statistics of the gbest fitness to keep, e.g. the range
+            of the score over its last iterations, see stats.py. Their
+            summary is added to the info of full_output.
+        repair: function or None, default None
+            Function repair(position) moving the particles onto the feasible
+            set in place after every move, e.g. ceesa.get_repair_fn, so that
+            every position evaluated satisfies the constraints. Particles
+            projected back onto their lbest are not evaluated again. None
+            leaves infeasible particles where they are.
+        fused: tuple or None, default None
+            Compiled kernels of a single point, (score, coeffs, violation,
+            limits), where score(point, coeffs) is its fitness and
+            violation(point, limits) the sum of its constraint matrix row,
+            see Problem.get_point_kernels. With backend='numba', and neither
+            observer nor repair, every iteration then moves the particles,
+            checks the constraints and evaluates the feasible ones in one
+            compiled loop, see kernels.fused_step. fitness and constraints
+            are still used for the starting points.
     Returns:
         a 2-tuple (swarm, it), where swarm is the converged particle swarm and
-        it are the number of iterations taken to converge.
+        it are the number of iterations taken to converge. If full_output is
+        True, a 3-tuple (swarm, it, info) where info is a dict with keys,
+            'fitness' -- the fitness of the returned swarm.
+            'nfev'    -- the number of points the fitness was evaluated at.
+            'settled' -- the iteration from which gbest no longer moved.
+            'stopped' -- the name of the stopping rule that fired.
+        and, if stats is given, the keys of RunningStats.summary.
+
+    Notes:
+        The fitness of every local best is cached and only new positions that
+        satisfy the constraints are evaluated, so each iteration costs at most
+        N fitness evaluations.
     """
+    rng = np.random if rng is None else rng
+
     # Initial position and velocity.
     position = start_points
-    velocity = uniform(-max_velocity, max_velocity, position.shape)
+    if workspace is None:
+        velocity = rng.uniform(-max_velocity, max_velocity, position.shape)
+    else:
+        workspace.check(position.shape)
+        velocity = workspace.uniform(rng, -max_velocity, max_velocity)
+
+    # In-place update, compiled on the numba backend, or None to update
+    # with numpy temporaries. With the kernels of the problem, the whole
+    # iteration is compiled. The nearest leaders are searched by a compiled
+    # kernel or the workspace where there is one, else by the topology.
+    update = get_kernel(kernels.fused_update, backend)
+    step = None
+    if fused is not None and observer is None and repair is None:
+        step = _fused_step(fused[0], fused[2], backend)
+    nearest = (topology == 'nearest' and
+               len(position) < KDTREE_MIN_PARTICLES)
+    if update is not None and nearest:
+        compiled = get_kernel(kernels.nearest_leaders, backend)
+        leaders = np.empty(len(position), dtype=np.intp) \
+            if workspace is None else workspace.leaders
+
+        def compiled_leaders(position, lbest, lbest_fit):
+            compiled(position, lbest, leaders)
+            return leaders
 
-    # Initial local best for each point and global best.
-    lbest = position.copy()
-    gbest = lbest[np.argmax(fitness(lbest))]
+        find_leaders = compiled_leaders
+    elif workspace is not None and nearest:
+        find_leaders = workspace.nearest_leaders
+    else:
+        find_leaders = get_topology(topology, rng)
+    if update is None and workspace is not None:
+        update = workspace.update
+
+    # Initial local best for each point and global best, with their fitness.
+    if workspace is None:
+        lbest = position.copy()
+        lbest_fit = np.array(fitness(lbest), dtype=float, ndmin=1)
+    else:
+        lbest, lbest_fit = workspace.lbest, workspace.lbest_fit
+        np.copyto(lbest, position)
+        lbest_fit[:] = fitness(lbest)
+    nfev = len(lbest)
+
+    best = np.argmax(lbest_fit)
+    gbest, gbest_fit = lbest[best], lbest_fit[best]
 
     if dumpfile is not None:
-        dumpdata = []
+        dumpdata = np.empty(max_iter) if workspace is None \
+            else workspace.dump_buffer(max_iter)
 
-    stable_count = 0
+    criterion = get_criterion(stopping, stable_iter, thresh)
+    criterion.start(gbest_fit)
+    if stats is not None:
+        stats.start(gbest_fit)
+    converged = False
+    observe = observer is not None
 
     for ii in range(max_iter):
-        # Store old for threshold comparison.
-        gbest_fit = fitness(gbest)
+        if observe:
+            t_start = perf_counter()
+
         if dumpfile is not None:
-            dumpdata.append(gbest_fit)
+            dumpdata[ii] = gbest_fit
 
         # Determine the velocity gradients.
-        leaders = np.argmin(cdist(position, lbest, 'sqeuclidean'), axis=1)
-        dv_g = learnrate1 * uniform(0, 1) * (gbest - position)
-        dv_l = learnrate2 * uniform(0, 1) * (lbest[leaders] - position)
-
-        # Update velocity such that |velocity| <= max_velocity.
-        velocity *= friction
-        velocity += (dv_g + dv_l)
-        chk = (np.abs(velocity) > max_velocity)
-        velocity[chk] = np.sign(velocity[chk]) * max_velocity
-
-        # Update the local and global bests.
-        position += velocity
-        conmatrix = constraints(position)
-        to_update = (fitness(position) > fitness(lbest))
-        to_update &= (conmatrix.sum(axis=1) < thresh)
-
-        if to_update.any():
-            lbest[to_update] = position[to_update]
-            gbest = lbest[np.argmax(fitness(lbest))]
+        leaders = find_leaders(position, lbest, lbest_fit)
+        if step is not None:
+            coef_g = learnrate1 * rng.uniform(0, 1)
+            coef_l = learnrate2 * rng.uniform(0, 1)
+            evaluated, improved = step(
+                position, velocity, gbest, lbest, lbest_fit, leaders, coef_g,
+                coef_l, friction, max_velocity, fused[1], fused[3], thresh)
+            nfev += evaluated
+            if improved:
+                best = np.argmax(lbest_fit)
+                gbest, gbest_fit = lbest[best], lbest_fit[best]
+        else:
+            if update is not None:
+                coef_g = learnrate1 * rng.uniform(0, 1)
+                coef_l = learnrate2 * rng.uniform(0, 1)
+                update(position, velocity, gbest, lbest, leaders, coef_g,
+                       coef_l, friction, max_velocity)
+            else:
+                dv_g = learnrate1 * rng.uniform(0, 1) * (gbest - position)
+                dv_l = learnrate2 * rng.uniform(0, 1) * \
+                    (lbest[leaders] - position)
+
+                # Update velocity such that |velocity| <= max_velocity.
+                velocity *= friction
+                velocity += (dv_g + dv_l)
+                chk = (np.abs(velocity) > max_velocity)
+                velocity[chk] = np.sign(velocity[chk]) * max_velocity
+                position += velocity
+            if repair is not None:
+                repair(position)
+
+            # Update the local and global bests, evaluating feasible
+            # points only.
+            if observe:
+                t_moved = perf_counter()
+
+            conmatrix = constraints(position)
+            to_update = np.flatnonzero(conmatrix.sum(axis=1) < thresh)
+            feasible = to_update.size
+            if repair is not None:
+                # Particles projected back onto their lbest cannot beat it.
+                to_update = to_update[(position[to_update]
+                                       != lbest[to_update]).any(axis=1)]
+            if observe:
+                t_checked = perf_counter()
+
+            if to_update.size:
+                fit = np.array(fitness(position[to_update]), dtype=float,
+                               ndmin=1)
+                nfev += to_update.size
+                better = (fit > lbest_fit[to_update])
+                to_update, fit = to_update[better], fit[better]
+            if observe:
+                t_evaluated = perf_counter()
+
+            if to_update.size:
+                lbest[to_update] = position[to_update]
+                lbest_fit[to_update] = fit
+                best = np.argmax(lbest_fit)
+                gbest, gbest_fit = lbest[best], lbest_fit[best]
+
+            if observe:
+                times = (t_evaluated - t_checked, t_checked - t_moved,
+                         t_moved - t_start + perf_counter() - t_evaluated)
+                observer(iteration_record(ii, gbest_fit, to_update.size,
+                                          feasible, position, velocity,
+                                          times))
 
         # Termination criteria.
-        if np.abs(gbest_fit - fitness(gbest)) < thresh:
-            stable_count += 1
-            if stable_count == stable_iter:
-                break
-        else:
-            stable_count = 0
+        stop = criterion.update(ii, gbest_fit, position)
+        if stats is not None:
+            stats.update(ii, gbest_fit, criterion.settled)
+        if stop:
+            converged = True
+            break
 
-    if dumpfile is not None:
+    # Nothing returned may share memory with the workspace.
+    if workspace is not None:
+        gbest = gbest.copy()
+        if dumpfile is not None:
+            dumpdata = dumpdata[:ii + 1].copy()
+
+    if callable(dumpfile):
+        dumpfile(dumpdata[:ii + 1])
+    elif dumpfile is not None:
         with open(dumpfile, 'w') as dfptr:
-            for line in dumpdata:
+            for line in dumpdata[:ii + 1]:
                 dfptr.write(str(line) + '\n')
 
-    if stable_count != stable_iter:
+    if not converged:
         raise SwarmConvergeError(
-            'no convergence. stable_count=' + str(stable_count))
+            'no convergence. settled=' + str(criterion.settled),
+            gbest=gbest, fitness=gbest_fit, nfev=nfev)
+
+    if full_output:
+        info = {'fitness': gbest_fit, 'nfev': nfev,
+                'settled': int(criterion.settled),
+                'stopped': criterion.reasons()[()]}
+        if stats is not None:
+            info.update((key, val.item())
+                        for key, val in stats.summary().items())
+        return (gbest, ii, info)
+    return (gbest, ii)
+
 
-    return (gbest, ii)
\ No newline at end of file
+def _fused_step(score, violation, backend):
+    """Return the compiled kernels.fused_step of the point kernels score and
+    violation, compiling it once per process, or None to run on numpy."""
+    key = (score, violation, backend)
+    if key not in _fused_steps:
+        _fused_steps[key] = get_kernel(
+            kernels.fused_step(score, violation), backend, cache=False)
+    return _fused_steps[key]
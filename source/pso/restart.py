@@ -0,0 +1,97 @@
+from .pso import conmax_by_pso, SwarmConvergeError
+
+
+# Ways of starting over once a swarm fails to converge.
+RESTART_POLICIES = ('grow', 'reseed')
+
+
+def conmax_with_restarts(fitness, initializer, constraints, npart=25,
+                         restarts=2, policy='grow', growth=2., spread=.1,
+                         max_nfev=None, rng=None, full_output=False,
+                         **kwargs):
+    """Run conmax_by_pso, starting over when the swarm does not converge.
+
+    The first attempt is exactly conmax_by_pso from initializer(npart). Each
+    time an attempt raises SwarmConvergeError, a new swarm is started
+    according to policy,
+        'grow'   -- a fresh swarm growth times as large as the last one.
+        'reseed' -- a swarm of the same size drawn around the last gbest,
+                    each particle spread of the way from gbest towards a
+                    fresh feasible point. Feasibility is kept as long as the
+                    constraint set is convex, which holds for CDHS and CEESA.
+    The evaluations of all attempts count towards max_nfev; an attempt is
+    cut short with a smaller max_iter so that the budget is never exceeded.
+
+    Arguments:
+        fitness, constraints:
+            See conmax_by_pso.
+        initializer: function initializer(npoints, rng=rng) -> points
+            Draws feasible starting points, e.g. a partial of
+            cdhs.initialize_points with the constraint bound.
+        npart: int, default 25
+            Size of the first swarm.
+        restarts: int, default 2
+            Maximum number of restarts after the first attempt.
+        policy: 'grow' or 'reseed', default 'grow'
+            How to start over, see above.
+        growth: float, default 2.0
+            Factor the swarm grows by on every 'grow' restart.
+        spread: float, default 0.1
+            Fraction of the way to a fresh point a 'reseed' particle lies.
+        max_nfev: int or None, default None
+            Budget of fitness evaluations over all attempts. None for no
+            budget other than max_iter per attempt.
+        rng, full_output:
+            See conmax_by_pso.
+        kwargs:
+            The other parameters of conmax_by_pso.
+    Returns:
+        as conmax_by_pso. The info dict of full_output counts 'nfev' over all
+        attempts and adds 'restarts', the number of restarts used.
+    Raises:
+        SwarmConvergeError if no attempt converged within the restarts or
+        the budget. Its restarts attribute holds the restarts tried.
+    """
+    if policy not in RESTART_POLICIES:
+        raise ValueError('invalid restart policy: ' + str(policy))
+
+    max_iter = kwargs.pop('max_iter', 1000)
+    start = initializer(npart, rng=rng)
+    nfev, failure = 0, None
+
+    for attempt in range(restarts + 1):
+        # Every iteration evaluates at most one point per particle.
+        iters = max_iter
+        if max_nfev is not None:
+            iters = min(max_iter, (max_nfev - nfev) // len(start) - 1)
+            if iters < 1:
+                break
+
+        try:
+            gbest, it, info = conmax_by_pso(
+                fitness, start, constraints, max_iter=iters, rng=rng,
+                full_output=True, **kwargs)
+        except SwarmConvergeError as err:
+            nfev += err.nfev
+            failure, tried = err, attempt
+            if policy == 'grow':
+                start = initializer(int(round(len(start) * growth)),
+                                    rng=rng)
+            else:
+                fresh = initializer(len(start), rng=rng)
+                start = err.gbest + spread * (fresh - err.gbest)
+            continue
+
+        nfev += info['nfev']
+        info.update(nfev=nfev, restarts=attempt)
+        if full_output:
+            return (gbest, it, info)
+        return (gbest, it)
+
+    if failure is None:
+        raise SwarmConvergeError('evaluation budget below the swarm size',
+                                 nfev=nfev)
+    raise SwarmConvergeError(
+        'no convergence after {} restarts'.format(tried),
+        gbest=failure.gbest, fitness=failure.fitness, nfev=nfev,
+        restarts=tried)
@@ -0,0 +1,89 @@
+import numpy as np
+
+
+class RunningStats:
+    """Statistics of the global best fitness of a swarm, kept as it runs in
+    memory that does not grow with the number of iterations, so that score
+    intervals need no trajectory dump.
+
+    Like a StoppingCriterion, it works on a single swarm, where gbest_fit is
+    a scalar, as well as on a batch of P swarms, where every statistic has
+    shape (P,). It keeps,
+        - the smallest and largest gbest fitness over the last window values
+          up to the iteration at which the swarm settled, the range that
+          coalesce_results.py used to read from the trajectory dumps;
+        - the mean and variance of the gbest fitness over the whole run,
+          by Welford's algorithm;
+        - the last iteration at which gbest improved at all.
+
+    Pass an instance as the stats argument of conmax_by_pso or
+    conmax_by_pso_batch, which add its summary to their info dict.
+
+    Arguments:
+        window: int, default 50
+            Number of gbest values, ending at the one the swarm settled on,
+            the range spans.
+    """
+
+    _state = ('prev', 'count', 'mean', 'm2', 'improved', 'low', 'high',
+              'history')
+
+    def __init__(self, window=50):
+        self.window = window
+
+    def start(self, gbest_fit):
+        """Reset the statistics for a new run from the initial gbest."""
+        self.prev = np.array(gbest_fit, dtype=float)
+        self.count = np.ones(self.prev.shape, dtype=int)
+        self.mean = self.prev.copy()
+        self.m2 = np.zeros(self.prev.shape)
+        self.improved = np.full(self.prev.shape, -1)
+        self.low = self.prev.copy()
+        self.high = self.prev.copy()
+        self.history = np.repeat(self.prev[..., None], self.window, axis=-1)
+
+    def update(self, ii, gbest_fit, settled):
+        """Record the gbest fitness after iteration ii.
+
+        Arguments:
+            ii: int
+                Index of the iteration, from 0.
+            gbest_fit: float or ndarray of shape (P,)
+                Global best fitness after the iteration.
+            settled: int or ndarray of shape (P,)
+                Iteration from which gbest no longer moved, as given by the
+                settled attribute of the stopping criterion.
+        """
+        fit = np.array(gbest_fit, dtype=float)
+        self.history[..., (ii + 1) % self.window] = fit
+
+        self.count += 1
+        delta = fit - self.mean
+        self.mean = self.mean + delta / self.count
+        self.m2 = self.m2 + delta * (fit - self.mean)
+
+        self.improved = np.where(fit > self.prev, ii, self.improved)
+        self.prev = fit
+
+        # The window ends here whenever the swarm settles on this iteration.
+        now = (np.asarray(settled) == ii + 1)
+        if now.any():
+            self.low = np.where(now, self.history.min(axis=-1), self.low)
+            self.high = np.where(now, self.history.max(axis=-1), self.high)
+
+    @property
+    def variance(self):
+        """Sample variance (ddof=1) of the gbest fitness over the run."""
+        return self.m2 / np.maximum(self.count - 1, 1)
+
+    def summary(self):
+        """Return the statistics as a dict with keys 'score_min',
+        'score_max', 'score_mean', 'score_var' and 'improved'."""
+        return {'score_min': self.low, 'score_max': self.high,
+                'score_mean': self.mean, 'score_var': self.variance,
+                'improved': self.improved}
+
+    def select(self, keep):
+        """Keep the statistics of the swarms in the mask keep only."""
+        for attr in self._state:
+            setattr(self, attr, getattr(self, attr)[keep])
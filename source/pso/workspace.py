@@ -0,0 +1,93 @@
+import numpy as np
+
+
+class SwarmWorkspace:
+    """Preallocated buffers for every run of conmax_by_pso on swarms of one
+    shape (N, D).
+
+    Passed as the workspace argument, the velocity, local bests, velocity
+    gradients, leader search and gbest dump of the run live in these buffers
+    and the update is done with out= and in-place operations, so the engine
+    itself allocates nothing per iteration. The workspace is reused across
+    runs, e.g. consecutive exoplanets, with the same (N, D); the result of a
+    run does not share memory with it. Only the fitness and constraint
+    functions still return new arrays.
+
+    Arguments:
+        npart: int
+            Number of particles N.
+        ndim: int
+            Dimension D of every particle.
+        max_iter: int, default 1000
+            Length of the gbest dump buffer. Longer runs allocate their own.
+    """
+
+    def __init__(self, npart, ndim, max_iter=1000):
+        self.shape = (npart, ndim)
+        self.velocity = np.empty(self.shape)
+        self.lbest = np.empty(self.shape)
+        self.lbest_fit = np.empty(npart)
+        self.dv_g = np.empty(self.shape)
+        self.dv_l = np.empty(self.shape)
+        self.sqdist = np.empty((npart, npart))
+        self.leaders = np.empty(npart, dtype=np.intp)
+        self.dump = np.empty(max_iter)
+
+    def check(self, shape):
+        """Raise ValueError unless the workspace fits swarms of shape."""
+        if tuple(shape) != self.shape:
+            raise ValueError('workspace for swarms of shape {} used for {}'
+                             .format(self.shape, tuple(shape)))
+
+    def uniform(self, rng, low, high):
+        """Fill the velocity buffer as rng.uniform(low, high, shape) would,
+        without allocating when rng is a Generator."""
+        if isinstance(rng, np.random.Generator):
+            rng.random(out=self.velocity)
+            self.velocity *= (high - low)
+            self.velocity += low
+        else:
+            self.velocity[...] = rng.uniform(low, high, self.shape)
+        return self.velocity
+
+    def dump_buffer(self, max_iter):
+        """Return a buffer for the gbest fitness of max_iter iterations."""
+        if max_iter > len(self.dump):
+            self.dump = np.empty(max_iter)
+        return self.dump
+
+    def nearest_leaders(self, position, lbest, lbest_fit):
+        """topology.nearest_leaders for a single swarm, in the buffers."""
+        from scipy.spatial.distance import cdist
+
+        cdist(position, lbest, 'sqeuclidean', out=self.sqdist)
+        return np.argmin(self.sqdist, axis=1, out=self.leaders)
+
+    def update(self, position, velocity, gbest, lbest, leaders, coef_g,
+               coef_l, friction, max_velocity):
+        """Update the velocity and position of every particle in place, with
+        the same operations as conmax_by_pso, see kernels.fused_update."""
+        dv_g, dv_l = self.dv_g, self.dv_l
+        np.subtract(gbest, position, out=dv_g)
+        dv_g *= coef_g
+        np.take(lbest, leaders, axis=0, out=dv_l)
+        dv_l -= position
+        dv_l *= coef_l
+
+        velocity *= friction
+        dv_g += dv_l
+        velocity += dv_g
+        np.clip(velocity, -max_velocity, max_velocity, out=velocity)
+        position += velocity
+
+
+# Workspaces of the current process, by swarm shape.
+_workspaces = {}
+
+
+def get_workspace(npart, ndim):
+    """Return the workspace of this process for swarms of shape (npart,
+    ndim), creating it on first use."""
+    if (npart, ndim) not in _workspaces:
+        _workspaces[npart, ndim] = SwarmWorkspace(npart, ndim)
+    return _workspaces[npart, ndim]
@@ -0,0 +1,3 @@
+from .sweep import parameter_grid
+from .sweep import parameter_samples
+from .sweep import run_sweep
@@ -0,0 +1,256 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import product
+
+import numpy as np
+
+from ..cdhs import cdhs
+from ..ceesa import ceesa
+from ..problems import INTERVAL_HEADERS, get_problem, score_problem
+
+
+# Scoring function, catalog columns and result headers of the problems of
+# the scores, whose rows are not those of problems.score_problem. Any other
+# registered problem is swept with score_problem.
+SCORES = {
+    'cdhs-crs': (cdhs.score_cdhs, cdhs.COLUMNS, cdhs.HEADERS),
+    'cdhs-drs': (cdhs.score_cdhs, cdhs.COLUMNS, cdhs.HEADERS),
+    'ceesa-crs': (ceesa.score_ceesa, ceesa.COLUMNS, ceesa.HEADERS),
+    'ceesa-drs': (ceesa.score_ceesa, ceesa.COLUMNS, ceesa.HEADERS),
+}
+
+# Parameters a sweep may vary, with the type they are cast to.
+PARAMS = {
+    'npart': int,
+    'friction': float,
+    'learnrate1': float,
+    'learnrate2': float,
+    'max_velocity': float,
+    'max_iter': int,
+    'stable_iter': int,
+    'thresh': float,
+}
+
+# Default number of planets per task.
+SHARD_SIZE = 100
+
+
+# Catalog records of the current process, set once per worker.
+_catalog = {}
+
+
+def parameter_grid(spec):
+    """Return every combination of the given parameter values.
+
+    Arguments:
+        spec: dict
+            Maps a parameter name to the list of values it takes.
+    Returns:
+        list of dicts, one configuration each, in row-major order of spec.
+    """
+    _check_params(spec)
+    names = list(spec)
+    return [{name: PARAMS[name](value) for name, value in zip(names, values)}
+            for values in product(*(spec[name] for name in names))]
+
+
+def parameter_samples(spec, count, seed=None):
+    """Return configurations drawn at random from the given ranges.
+
+    Arguments:
+        spec: dict
+            Maps a parameter name to a (low, high) range, sampled uniformly
+            (integer parameters include high), or to a list of choices.
+        count: int
+            Number of configurations.
+        seed: int or None, default None
+            Seed of the sampler.
+    Returns:
+        list of dicts, one configuration each.
+    """
+    _check_params(spec)
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for name, values in spec.items():
+        if isinstance(values, tuple):
+            low, high = values
+            if PARAMS[name] is int:
+                columns[name] = rng.integers(low, high, count, endpoint=True)
+            else:
+                columns[name] = rng.uniform(low, high, count)
+        else:
+            columns[name] = rng.choice(values, count)
+    return [{name: PARAMS[name](columns[name][ii]) for name in spec}
+            for ii in range(count)]
+
+
+def _check_params(spec):
+    """Raise ValueError for parameters that cannot be swept."""
+    for name in spec:
+        if name not in PARAMS:
+            raise ValueError('invalid parameter: ' + name)
+
+
+def run_sweep(exoplanets, score, configs, base=None, workers=1, seed=None,
+              shard_size=SHARD_SIZE, fname=None, verbose=True, restarts=0,
+              restart_policy='grow', max_nfev=None, sampler='random',
+              repair=False, intervals=False, columns=None):
+    """Score the catalog under every configuration, scheduling one task per
+    (configuration, constraint, shard of planets) across a process pool.
+
+    The catalog is sent to every worker once, when the pool starts, and is
+    shared by all the tasks that worker runs. Every configuration uses the
+    same per-planet random streams, so configurations are compared on common
+    random numbers and the table does not depend on workers or shard_size.
+
+    Arguments:
+        exoplanets: pandas.DataFrame
+            The exoplanet parameters, as for evaluate_cdhs_values.
+        score: 'cdhs', 'ceesa', str or Problem
+            Score to evaluate under CRS and DRS, or a problem, or the name
+            of one, e.g. registered with register_problem, see get_problem,
+            whose rows are those of evaluate_values.
+        configs: list of dicts
+            Parameter configurations, see parameter_grid and
+            parameter_samples.
+        base: dict or None, default None
+            Parameters shared by every configuration, overridden by them.
+        workers: int, default 1
+            Number of worker processes. 1 runs in the current process.
+        seed: int or None, default None
+            Root seed for the per-planet random streams.
+        shard_size: int, default SHARD_SIZE
+            Number of planets per task.
+        fname: str or None, default None
+            CSV file to write the table to, if any.
+        verbose: bool, default True
+            Whether to print progress to stdout.
+        restarts, restart_policy, max_nfev, sampler:
+            How every swarm is started and restarted, as for score_cdhs,
+            score_ceesa and score_problem. With restarts, the table gets a
+            Restarts column.
+        repair, intervals: bool, default False
+            As for score_ceesa and score_problem; the CDHS supports neither.
+            With intervals, the table gets the ScoreMin and ScoreMax
+            columns.
+        columns: list of str or None, default None
+            The columns of exoplanets holding the name, the habitability
+            class and the coefficients of a problem, as for
+            evaluate_values. Those of the score for 'cdhs' and 'ceesa'.
+    Returns:
+        pandas.DataFrame with one row per (configuration, constraint, planet)
+        and columns Config, the swept parameters, Constraint, Converged and
+        the result headers of the score. The Constraint of a problem is its
+        name. Rows of planets that did not converge hold NaN results.
+    """
+    if score == 'cdhs' and (repair or intervals):
+        raise ValueError('repair and intervals are not supported by cdhs')
+    if score in ('cdhs', 'ceesa'):
+        problems = [score + '-crs', score + '-drs']
+        constraints = ['crs', 'drs']
+        _, columns, headers = SCORES[problems[0]]
+    else:
+        problem = get_problem(score)
+        if columns is None:
+            raise ValueError('columns are required to sweep a problem')
+        if repair and problem.get_repair_fn() is None:
+            raise ValueError('{} has no repair'.format(problem))
+        problems, constraints = [problem], [problem.name]
+        headers = ('Name', 'Cls',
+                   *('X%d' % dim for dim in range(problem.ndim)),
+                   'Score', 'Iter')
+
+    options = dict(sampler=sampler, restarts=restarts,
+                   restart_policy=restart_policy, max_nfev=max_nfev)
+    if restarts:
+        headers = headers + ('Restarts',)
+    if repair:
+        options['repair'] = True
+    if intervals:
+        headers = headers + INTERVAL_HEADERS
+        options['intervals'] = True
+
+    base = dict(base or {})
+    records = list(exoplanets[columns].itertuples(index=False, name=None))
+    total = len(records)
+    entropy = np.random.SeedSequence(seed).entropy
+
+    tasks = [(problem, cfg, {**base, **config}, options, len(headers),
+              cidx, constraint, lo, min(lo + shard_size, total), entropy)
+             for cfg, config in enumerate(configs)
+             for cidx, (problem, constraint) in enumerate(zip(problems,
+                                                              constraints))
+             for lo in range(0, total, shard_size)]
+
+    if workers <= 1:
+        _init_worker(records)
+        done = map(_sweep_task, tasks)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers,
+                                   initializer=_init_worker,
+                                   initargs=(records,))
+        done = pool.map(_sweep_task, tasks)
+
+    rows = []
+    try:
+        for it, (task, outcomes) in enumerate(zip(tasks, done)):
+            cfg, constraint = task[1], task[6]
+            for converged, values in outcomes:
+                rows.append((cfg, *configs[cfg].values(), constraint,
+                             converged, *values))
+            if verbose:
+                print('Sweep: {:>6}/{} tasks'.format(it + 1, len(tasks)),
+                      end='\r')
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    if verbose:
+        print('')
+
+    import pandas as pd
+
+    names = list(configs[0]) if configs else []
+    table = pd.DataFrame(rows, columns=['Config', *names, 'Constraint',
+                                        'Converged', *headers])
+    if fname is not None:
+        table.to_csv(fname, index=False)
+    return table
+
+
+def _init_worker(records):
+    """Keep the catalog records in the worker for every task it runs."""
+    _catalog['records'] = records
+
+
+def _sweep_task(task):
+    """Score one shard of the catalog under one configuration and return a
+    list of (converged, values) pairs, with NaN values for failed planets."""
+    problem, _, config, options, width, cidx, constraint, lo, hi, \
+        entropy = task
+    records = _catalog['records'][lo:hi]
+    if isinstance(problem, str) and problem in SCORES:
+        score_fn = partial(SCORES[problem][0], constraint=constraint)
+    else:
+        score_fn = partial(_score_problem, problem, stream_key=(cidx,))
+
+    rows = []
+    names, classes, *inputs = (np.array(col) for col in zip(*records))
+    score_fn(*inputs, names=names, classes=classes, seed=entropy,
+             sink=lambda name, values, err: rows.append(values),
+             **options, **config)
+
+    outcomes = []
+    for record, values in zip(records, rows):
+        converged = values is not None
+        if not converged:
+            values = record[:2] + (np.nan,) * (width - 2)
+        outcomes.append((converged, values))
+    return outcomes
+
+
+def _score_problem(problem, *inputs, **kwargs):
+    """Call score_problem with the coefficients given as columns, as
+    score_cdhs and score_ceesa take them."""
+    return score_problem(problem, np.column_stack(inputs), **kwargs)
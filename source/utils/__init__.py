@@ -1,3 +1,12 @@
 from .utils import ERR
 from .utils import _round
 from .utils import _uniform
+from .parallel import map_planets
+from .parallel import planet_streams
+from .checkpoint import ResultWriter, ResumeError
+from .trajectory import TrajectoryStore
+from .jit import BACKENDS, get_kernel, jit
+from .progress import Progress
+from .results import digest, load_results, save_results
+from .results import carry_forward, merge_rows, row_keys
+from .sampling import SAMPLERS, unit_samples
@@ -0,0 +1,144 @@
+import csv
+import json
+import os
+import time
+
+
+# Rows written between two checkpoints of the manifest.
+CHECKPOINT_EVERY = 50
+
+
+class ResumeError(ValueError):
+    """Raised when a run cannot be resumed from the rows already written, so
+    that they are not overwritten by starting over."""
+
+
+class ResultWriter:
+    """Stream result rows to a CSV file as soon as they are available and keep
+    a checkpoint manifest next to it, so an interrupted run can be resumed.
+
+    The manifest, stored at fpath + '.ckpt.json', records the parameters of
+    the run, the number of rows written, the planets that failed and whether
+    the run completed. Every row is flushed to disk when written; the CSV is
+    the source of truth for which planets are done.
+
+    Arguments:
+        fpath: str
+            The CSV file to write.
+        headers: tuple
+            The header row. The first column must hold the planet name.
+        params: dict
+            Parameters identifying the run. A run is only resumed if they
+            match those in the manifest.
+        resume: bool, default False
+            Whether to keep the rows of a previous run with the same params
+            instead of starting over. ResumeError is raised, and the file
+            left untouched, if fpath holds rows of a run with other params
+            or headers, or without a manifest.
+        every: int, default CHECKPOINT_EVERY
+            Number of rows between two checkpoints.
+    """
+
+    def __init__(self, fpath, headers, params, resume=False,
+                 every=CHECKPOINT_EVERY):
+        self.fpath = fpath
+        self.manifest = fpath + '.ckpt.json'
+        self.headers = list(headers)
+        self.params = json.loads(json.dumps(params, default=repr))
+        self.every = every
+
+        self.done = set()
+        self.failed = []
+        self.rows = 0
+
+        if resume and self._load():
+            self._file = open(fpath, 'a', newline='')
+        else:
+            self._file = open(fpath, 'w', newline='')
+            csv.writer(self._file).writerow(self.headers)
+            self._file.flush()
+
+        self._writer = csv.writer(self._file)
+        self.resumed = len(self.done)
+        self._since = 0
+        self.checkpoint()
+
+    def _load(self):
+        """Load the rows of a previous run with the same parameters. Returns
+        False if there is nothing to resume from, and raises ResumeError if
+        there are rows that cannot be resumed."""
+        if not os.path.isfile(self.fpath):
+            return False
+        if not os.path.isfile(self.manifest):
+            raise ResumeError('cannot resume {}: no checkpoint manifest'
+                              .format(self.fpath))
+        with open(self.manifest) as mfile:
+            manifest = json.load(mfile)
+        if manifest.get('params') != self.params:
+            raise ResumeError('cannot resume {}: it was written with other '
+                              'parameters'.format(self.fpath))
+
+        # Keep only complete lines; a crash may have cut the last one short.
+        with open(self.fpath, 'rb') as rfile:
+            content = rfile.read()
+        content = content[:content.rfind(b'\n') + 1]
+
+        lines = content.decode().splitlines()
+        rows = list(csv.reader(lines))
+        if rows and rows[0] != self.headers:
+            raise ResumeError('cannot resume {}: it has other columns'
+                              .format(self.fpath))
+        if not rows:
+            return False
+
+        with open(self.fpath, 'wb') as rfile:
+            rfile.write(content)
+        self.done = {row[0] for row in rows[1:]}
+        self.rows = len(rows) - 1
+        return True
+
+    def __contains__(self, name):
+        return name in self.done
+
+    def write(self, values):
+        """Write the row of results for one planet."""
+        self._writer.writerow(values)
+        self._file.flush()
+        self.done.add(values[0])
+        self.rows += 1
+
+        self._since += 1
+        if self._since >= self.every:
+            self.checkpoint()
+
+    def fail(self, name):
+        """Record a planet that could not be scored."""
+        self.failed.append(name)
+
+    def checkpoint(self, complete=False):
+        """Atomically rewrite the manifest with the current progress."""
+        os.fsync(self._file.fileno())
+        manifest = {
+            'params': self.params,
+            'rows': self.rows,
+            'failed': self.failed,
+            'complete': complete,
+            'updated': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+        tmpname = self.manifest + '.tmp'
+        with open(tmpname, 'w') as mfile:
+            json.dump(manifest, mfile, indent=1)
+        os.replace(tmpname, self.manifest)
+        self._since = 0
+
+    def close(self, complete=True):
+        """Write the final checkpoint and close the file."""
+        if not self._file.closed:
+            self.checkpoint(complete)
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(complete=exc_type is None)
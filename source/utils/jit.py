@@ -0,0 +1,50 @@
+import warnings
+
+
+# Array backends a computation may run on.
+BACKENDS = ('numpy', 'numba')
+
+# Kernels compiled so far, by the plain Python function they came from.
+_compiled = {}
+
+
+def jit(fn, cache=True):
+    """Return fn compiled by numba in nopython mode, or None if numba is not
+    installed. numba is imported, and fn compiled, on first use only.
+    Floating point errors give inf and nan as in numpy instead of raising.
+    The machine code is cached on disk unless cache is False, e.g. for
+    closures over other kernels."""
+    if fn not in _compiled:
+        try:
+            import numba
+        except ImportError:
+            _compiled[fn] = None
+        else:
+            _compiled[fn] = numba.njit(cache=cache, error_model='numpy')(fn)
+    return _compiled[fn]
+
+
+def get_kernel(fn, backend='numpy', cache=True):
+    """Return the compiled kernel of fn for backend, or None to run on numpy.
+
+    Arguments:
+        fn: function
+            Plain Python kernel, written for numba's nopython mode.
+        backend: 'numpy' or 'numba', default 'numpy'
+            Backend asked for. 'numba' falls back to numpy, with a warning,
+            when numba is not installed.
+        cache: bool, default True
+            See jit.
+    Returns:
+        the compiled function, or None.
+    """
+    if backend not in BACKENDS:
+        raise ValueError('invalid backend: ' + str(backend))
+    if backend == 'numpy':
+        return None
+
+    kernel = jit(fn, cache)
+    if kernel is None:
+        warnings.warn('numba is not installed, falling back to numpy',
+                      RuntimeWarning, stacklevel=3)
+    return kernel
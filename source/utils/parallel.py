@@ -0,0 +1,86 @@
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+
+
+# Number of shards handed to every worker, for load balancing.
+SHARDS_PER_WORKER = 4
+
+
+def planet_streams(seed, names, key=()):
+    """Return independent random streams, one per planet, derived from a root
+    seed. The stream of a planet depends only on seed, key and the planet's
+    name, never on its position in the catalog or how the catalog is split,
+    so scoring any subset of a catalog gives the same results.
+
+    Arguments:
+        seed: int or None
+            Root seed. None draws fresh entropy from the OS.
+        names: sequence of str
+            Name of every planet.
+        key: tuple of int, default ()
+            Prefix distinguishing independent passes over the same catalog,
+            e.g. one per constraint.
+    Returns:
+        list of numpy.random.SeedSequence, one per name.
+    """
+    entropy = np.random.SeedSequence(seed).entropy
+    return [np.random.SeedSequence(entropy, spawn_key=tuple(key) + (
+                int.from_bytes(hashlib.sha1(str(name).encode()).digest()[:8],
+                               'little'),))
+            for name in names]
+
+
+def map_planets(score_fn, records, streams=None, workers=1, **params):
+    """Apply score_fn to every planet record, optionally across a pool of
+    worker processes, and yield the results in catalog order.
+
+    Arguments:
+        score_fn: function score_fn(record, rng, **params) -> result
+            Module-level function scoring one planet. It must catch its own
+            per-planet failures and report them in its result.
+        records: list
+            One picklable record per planet.
+        streams: list of numpy.random.SeedSequence or None, default None
+            One stream per record, see planet_streams. None uses the global
+            numpy.random state, which is only allowed with a single worker.
+        workers: int, default 1
+            Number of worker processes. 1 scores in the current process.
+        params:
+            Picklable keyword arguments passed on to score_fn.
+    Yields:
+        the result of score_fn for every record, in order.
+    """
+    if streams is None:
+        if workers > 1:
+            raise ValueError('random streams are required with workers > 1')
+        streams = [None] * len(records)
+
+    if workers <= 1:
+        for record, stream in zip(records, streams):
+            yield score_fn(record, _generator(stream), **params)
+        return
+
+    nshard = min(len(records), workers * SHARDS_PER_WORKER)
+    bounds = np.linspace(0, len(records), nshard + 1).astype(int)
+    shards = [slice(lo, hi) for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for results in pool.map(_score_shard, repeat(score_fn),
+                                [records[sh] for sh in shards],
+                                [streams[sh] for sh in shards],
+                                repeat(params)):
+            yield from results
+
+
+def _score_shard(score_fn, records, streams, params):
+    """Score a contiguous shard of planets, each with its own generator."""
+    return [score_fn(record, _generator(stream), **params)
+            for record, stream in zip(records, streams)]
+
+
+def _generator(stream):
+    """Return a Generator for the stream, or None for the global state."""
+    return None if stream is None else np.random.default_rng(stream)
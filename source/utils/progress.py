@@ -0,0 +1,47 @@
+import sys
+from time import monotonic
+
+
+class Progress:
+    """Progress bar redrawn at most once every interval seconds, however
+    often it is updated, so that reporting stays out of the scoring loop.
+
+    Arguments:
+        total: int
+            Number of items to process.
+        width: int, default 50
+            Width of the bar in characters.
+        interval: float, default .1
+            Minimum time in seconds between two redraws. The bar is always
+            redrawn when the last item is done.
+        done: int, default 0
+            Number of items already processed, e.g. by a resumed run.
+        stream: file or None, default None
+            Where to draw the bar. None is the current sys.stdout.
+    """
+
+    BAR = '[{:{width}}]  ({:>3}%)'
+
+    def __init__(self, total, width=50, interval=.1, done=0, stream=None):
+        self.total = total
+        self.width = width
+        self.interval = interval
+        self.done = done
+        self.stream = stream
+        self._last = None
+
+    def update(self, count=1):
+        """Record count more items as processed, redrawing if due."""
+        self.done += count
+        now = monotonic()
+        if (self._last is None or now - self._last >= self.interval
+                or self.done >= self.total):
+            self._last = now
+            self.draw()
+
+    def draw(self):
+        """Draw the bar over the current line."""
+        total = max(self.total, 1)
+        print(self.BAR.format('=' * (self.done * self.width // total),
+                              self.done * 100 // total, width=self.width),
+              end='\r', file=self.stream or sys.stdout, flush=True)
@@ -0,0 +1,266 @@
+import csv
+import hashlib
+import json
+import os
+import shutil
+import time
+from collections import deque
+
+import numpy as np
+
+
+# Directory of the result tables.
+RESULTS = 'results'
+
+
+def save_results(fpath, params=None, catalog=None, keys=None):
+    """Convert the result table fpath, a CSV file written by ResultWriter,
+    to a columnar dataset next to it, and return the path of the dataset.
+
+    The dataset for 'results/ceesa_crs.csv' is the directory
+    'results/ceesa_crs/', holding one .npy file per column and meta.json,
+    which records the headers, the number of rows, the parameters of the
+    run, the digest of the catalog it scored and the size and modification
+    time of the CSV it was built from. Integer and float columns are stored
+    as int64 and float64, any other column as a unicode string array. The
+    directory is replaced atomically.
+
+    Arguments:
+        fpath: str
+            The CSV file, with a header row.
+        params: dict or None, default None
+            Parameters of the run, e.g. those of the swarm and the seed.
+        catalog: str or None, default None
+            Digest of the scored catalog, see digest.
+        keys: dict or None, default None
+            Key of every planet by name, see row_keys, stored as an extra
+            column Key for carry_forward. Planets without one get ''.
+    Returns:
+        str, the directory of the dataset.
+    """
+    headers, rows, columns = _read_table(fpath)
+    if keys is not None:
+        columns['Key'] = np.array([keys.get(row[0], '') for row in rows],
+                                  dtype=str)
+
+    stat = os.stat(fpath)
+    meta = {
+        'headers': headers,
+        'columns': list(columns),
+        'rows': len(rows),
+        'params': json.loads(json.dumps(params, default=repr)),
+        'catalog': catalog,
+        'source': {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns},
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+    dpath = os.path.splitext(fpath)[0]
+    tmpdir = '{}.tmp-{}'.format(dpath, os.getpid())
+    os.makedirs(tmpdir, exist_ok=True)
+    for name, column in columns.items():
+        np.save(os.path.join(tmpdir, name + '.npy'), column)
+    with open(os.path.join(tmpdir, 'meta.json'), 'w') as mfile:
+        json.dump(meta, mfile, indent=1)
+
+    shutil.rmtree(dpath, ignore_errors=True)
+    os.replace(tmpdir, dpath)
+    return dpath
+
+
+def load_results(name, columns=None, root=RESULTS, as_frame=True,
+                 rebuild=False):
+    """Load a result table from its columnar dataset, memory-mapping only
+    the columns asked for.
+
+    If the dataset is missing, or older than the CSV table it was built
+    from, the table is parsed from root/name.csv in memory instead, and the
+    dataset is left to the runs writing the table, unless rebuild.
+
+    Arguments:
+        name: str
+            Name of the table, e.g. 'ceesa_crs' or 'ceesa_crs_app'.
+        columns: list of str or None, default None
+            Columns to load, in order. None loads every column of the CSV;
+            the Key column, if any, must be asked for.
+        root: str, default RESULTS
+            Directory of the tables.
+        as_frame: bool, default True
+            Whether to return a pandas.DataFrame, with the metadata of the
+            dataset in its attrs['meta'], or a dict of read-only arrays.
+        rebuild: bool, default False
+            Whether to rebuild a missing or stale dataset from the CSV
+            table, see save_results, so that later loads skip parsing it.
+            Only the metadata of the CSV is kept, without the parameters and
+            keys of the run that wrote it.
+    Returns:
+        pandas.DataFrame or dict of numpy.ndarray.
+    """
+    dpath = os.path.join(root, name)
+    meta = _fresh_meta(dpath, dpath + '.csv')
+    if meta is None and rebuild:
+        save_results(dpath + '.csv')
+        meta = _fresh_meta(dpath, dpath + '.csv')
+
+    if meta is not None:
+        if columns is None:
+            columns = meta['headers']
+        data = _load_columns(dpath, meta, columns)
+    else:
+        headers, rows, data = _read_table(dpath + '.csv')
+        meta = {'headers': headers, 'columns': headers, 'rows': len(rows)}
+        if columns is None:
+            columns = headers
+        missing = set(columns) - set(headers)
+        if missing:
+            raise KeyError('no columns {} in {}'.format(sorted(missing),
+                                                        dpath + '.csv'))
+        data = {col: data[col] for col in columns}
+    if not as_frame:
+        return data
+
+    import pandas as pd
+    frame = pd.DataFrame(data, columns=columns, copy=False)
+    frame.attrs['meta'] = meta
+    return frame
+
+
+def row_keys(names, rows, params):
+    """Return the key of every planet, given its name and its row of inputs,
+    e.g. the parameters of the planets in a catalog, under the parameters of
+    a run: the SHA-1 hex digest of the name, the inputs as floats and
+    params. Two planets get the same key exactly when they would be scored
+    the same way, the name included since it seeds the planet's random
+    stream, see planet_streams."""
+    config = json.dumps(params, sort_keys=True, default=repr)
+    return [hashlib.sha1((json.dumps([str(name)]
+                                     + [float(val) for val in row])
+                          + config).encode()).hexdigest()
+            for name, row in zip(names, rows)]
+
+
+def carry_forward(fpath, names, classes, keys):
+    """Match the planets of a new run against the dataset of the previous
+    run writing the table fpath, see save_results.
+
+    A planet whose key is found in the dataset is unchanged: its previous
+    row is carried forward under its current class. Any other
+    planet is changed if the dataset has a row with its name, and new if
+    not. Planets only in the dataset are removed. Without a keyed dataset,
+    every planet is new.
+
+    Arguments:
+        fpath: str
+            The CSV file of the table.
+        names, classes, keys: sequence of shape (P,)
+            Name, class and key of every planet of the new run.
+    Returns:
+        (carried, counts) where carried maps the index of every unchanged
+        planet to its row of results, and counts is a dict with the number
+        of 'new', 'changed', 'unchanged' and 'removed' planets.
+    """
+    dpath = os.path.splitext(fpath)[0]
+    try:
+        with open(os.path.join(dpath, 'meta.json')) as mfile:
+            meta = json.load(mfile)
+        data = _load_columns(dpath, meta, meta['headers'] + ['Key'])
+    except (OSError, ValueError, KeyError):
+        data = None
+
+    previous, old_names = {}, set()
+    if data is not None:
+        rows = zip(*(data[col].tolist() for col in meta['headers']))
+        previous = dict(zip(data['Key'].tolist(), rows))
+        old_names = set(data[meta['headers'][0]].tolist())
+
+    carried = {}
+    counts = dict(new=0, changed=0, unchanged=0, removed=0)
+    for ii, (name, habc, key) in enumerate(zip(names, classes, keys)):
+        if key in previous:
+            carried[ii] = (name, habc, *previous[key][2:])
+            counts['unchanged'] += 1
+        elif name in old_names:
+            counts['changed'] += 1
+        else:
+            counts['new'] += 1
+    counts['removed'] = len(old_names - set(names))
+    return carried, counts
+
+
+def merge_rows(sink, carried, position):
+    """Return (merged, flush), where merged is sink also passing on the
+    carried rows of carry_forward, each just before the first scored planet
+    that follows it in the catalog, and flush(), called once scoring is
+    done, passes on the carried rows left. position maps the name of every
+    scored planet to its index in the catalog."""
+    pending = deque(sorted(carried))
+
+    def flush(upto=None):
+        while pending and (upto is None or pending[0] < upto):
+            row = carried[pending.popleft()]
+            sink(row[0], row, None)
+
+    def merged(name, values, err):
+        flush(position[name])
+        sink(name, values, err)
+
+    return merged, flush
+
+
+def digest(rows):
+    """Return the SHA-1 hex digest of rows of names and numbers, e.g. the
+    records of a catalog, independent of numpy and pandas scalar types."""
+    sha = hashlib.sha1()
+    for row in rows:
+        sha.update(json.dumps([str(val) if isinstance(val, str)
+                               else float(val) for val in row]).encode())
+    return sha.hexdigest()
+
+
+def _load_columns(dpath, meta, columns):
+    """Memory-map the columns of the dataset dpath."""
+    missing = set(columns) - set(meta.get('columns', meta['headers']))
+    if missing:
+        raise KeyError('no columns {} in {}'.format(sorted(missing), dpath))
+    return {col: np.load(os.path.join(dpath, col + '.npy'),
+                         mmap_mode='r').view(np.ndarray)
+            for col in columns}
+
+
+def _fresh_meta(dpath, fpath):
+    """Return the metadata of the dataset dpath, or None if it is missing or
+    does not match the CSV fpath it was built from."""
+    try:
+        with open(os.path.join(dpath, 'meta.json')) as mfile:
+            meta = json.load(mfile)
+    except (OSError, ValueError):
+        return None
+    if os.path.isfile(fpath):
+        stat = os.stat(fpath)
+        if meta['source'] != {'size': stat.st_size,
+                              'mtime_ns': stat.st_mtime_ns}:
+            return None
+    return meta
+
+
+def _read_table(fpath):
+    """Parse the CSV fpath, with a header row, into (headers, rows,
+    columns), rows being the rows of strings after the header and columns
+    mapping every header to its values, see _parse_column."""
+    with open(fpath, newline='') as cfile:
+        rows = list(csv.reader(cfile))
+    headers, rows = rows[0], rows[1:]
+    columns = dict(zip(headers, zip(*rows) if rows else
+                       [()] * len(headers)))
+    return headers, rows, {name: _parse_column(col)
+                           for name, col in columns.items()}
+
+
+def _parse_column(values):
+    """Return the CSV values of one column as an int64, float64 or unicode
+    array, whichever holds them all."""
+    for dtype in (np.int64, np.float64):
+        try:
+            return np.array(values, dtype=dtype)
+        except ValueError:
+            pass
+    return np.array(values, dtype=str)
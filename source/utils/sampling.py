@@ -0,0 +1,52 @@
+import warnings
+
+import numpy as np
+
+
+# Ways of drawing the starting points of a swarm.
+SAMPLERS = ('random', 'sobol', 'halton')
+
+
+def unit_samples(npoints, ndim, rng=None, sampler='random', nswarms=None):
+    """Draw npoints points of the unit hypercube [0, 1)^ndim, from which the
+    initializers map the starting points of the swarms onto the feasible
+    region, without rejection.
+
+    Arguments:
+        npoints: int
+            Number of points to draw.
+        ndim: int
+            Dimension of every point.
+        rng: numpy.random.Generator or None, default None
+            Source of randomness. None uses the global numpy.random state.
+        sampler: 'random', 'sobol' or 'halton', default 'random'
+            'random' draws independent uniform points. 'sobol' and 'halton'
+            draw a scrambled low-discrepancy sequence of scipy.stats.qmc,
+            which covers the region more evenly; the scrambling is seeded
+            from rng.
+        nswarms: int or None, default None
+            Number of swarms of npoints points to draw at once. Every swarm
+            gets a sequence of its own, scrambled independently, so that
+            each is as even as a single swarm.
+    Returns:
+        numpy.ndarray of shape (npoints, ndim), or (nswarms, npoints, ndim)
+        if nswarms is given.
+    """
+    shape = (npoints, ndim) if nswarms is None else (nswarms, npoints, ndim)
+    if sampler == 'random':
+        rng = np.random if rng is None else rng
+        return rng.uniform(0, 1, shape)
+    if sampler not in SAMPLERS:
+        raise ValueError('invalid sampler: ' + str(sampler))
+
+    from scipy.stats import qmc
+
+    engine = qmc.Sobol if sampler == 'sobol' else qmc.Halton
+    samples = np.empty((nswarms or 1, npoints, ndim))
+    with warnings.catch_warnings():
+        # Sobol warns when npoints is not a power of 2.
+        warnings.simplefilter('ignore', UserWarning)
+        for swarm in samples:
+            seed = np.random.randint(2 ** 31) if rng is None else rng
+            swarm[:] = engine(ndim, scramble=True, seed=seed).random(npoints)
+    return samples.reshape(shape)
@@ -0,0 +1,118 @@
+import os
+
+import numpy as np
+
+
+class TrajectoryStore:
+    """Append-only binary store of per-planet trajectories, such as the gbest
+    fitness of every iteration of a swarm.
+
+    A store at base path 'temp/ceesa_crs' consists of two files,
+        temp/ceesa_crs.bin -- every trajectory as raw float64, back to back.
+        temp/ceesa_crs.idx -- one 'key<TAB>offset<TAB>length' line each.
+    Both are only ever appended to. If a key is stored more than once, the
+    last trajectory wins. Reading memory-maps the data file, so a trajectory
+    is a zero-copy slice of it.
+
+    Arguments:
+        base: str
+            Base path of the store, without extension.
+        mode: 'r', 'a' or 'w', default 'r'
+            Read only, append to an existing store, or start a new one.
+    """
+
+    dtype = np.dtype(np.float64)
+
+    def __init__(self, base, mode='r'):
+        if mode not in ('r', 'a', 'w'):
+            raise ValueError('invalid mode: ' + mode)
+
+        self.datafile = base + '.bin'
+        self.indexfile = base + '.idx'
+        self.mode = mode
+        self.index = {}
+        self._size = 0
+        self._data = None
+
+        if mode == 'w' or not os.path.isfile(self.indexfile):
+            if mode == 'r':
+                raise FileNotFoundError(self.indexfile)
+            open(self.datafile, 'wb').close()
+            open(self.indexfile, 'w').close()
+        else:
+            self._load_index()
+            if mode == 'a':
+                self._truncate()
+
+        if mode != 'r':
+            self._dfile = open(self.datafile, 'ab')
+            self._ifile = open(self.indexfile, 'a')
+
+    def _load_index(self):
+        """Read the index, ignoring an entry cut short by a crash."""
+        with open(self.indexfile) as ifile:
+            for line in ifile:
+                fields = line.rstrip('\n').split('\t')
+                if len(fields) != 3 or not line.endswith('\n'):
+                    continue
+                key, offset, length = fields
+                self.index[key] = (int(offset), int(length))
+                self._size = max(self._size, int(offset) + int(length))
+
+    def _truncate(self):
+        """Drop anything written after the last complete index entry, so
+        that appending resumes at a consistent offset."""
+        with open(self.indexfile, 'rb+') as ifile:
+            content = ifile.read()
+            ifile.truncate(content.rfind(b'\n') + 1)
+        with open(self.datafile, 'rb+') as dfile:
+            dfile.truncate(self._size * self.dtype.itemsize)
+
+    def append(self, key, values):
+        """Append the trajectory for key."""
+        if self.mode == 'r':
+            raise IOError('store opened read only')
+        values = np.ascontiguousarray(values, dtype=self.dtype)
+        self._dfile.write(values.tobytes())
+        self._dfile.flush()
+        self._ifile.write('{}\t{}\t{}\n'.format(key, self._size, values.size))
+        self._ifile.flush()
+
+        self.index[key] = (self._size, values.size)
+        self._size += values.size
+        self._data = None
+
+    def writer(self, key):
+        """Return a function that appends its argument under key."""
+        return lambda values: self.append(key, values)
+
+    def __getitem__(self, key):
+        """Return the trajectory for key as a read-only view of the store."""
+        offset, length = self.index[key]
+        if self._data is None:
+            if not self._size:
+                return np.empty(0, dtype=self.dtype)
+            self._data = np.memmap(self.datafile, dtype=self.dtype, mode='r',
+                                   shape=(self._size,))
+        return self._data[offset:offset + length]
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def keys(self):
+        return self.index.keys()
+
+    def close(self):
+        """Close the files of a writable store."""
+        if self.mode != 'r':
+            self._dfile.close()
+            self._ifile.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()